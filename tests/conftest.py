@@ -16,19 +16,21 @@ TOYS_DIR = os.path.join(ROOT_DIR, 'toys')
 
 
 # ── Module loader ──────────────────────────────────────────────────
-def _load_toy_module(toy_name):
+def _load_toy_module(toy_name, filename='app.py'):
     """
-    Load toys/<toy_name>/app.py via importlib.
+    Load toys/<toy_name>/<filename> (app.py by default) via importlib.
 
-    Each module gets a unique name (toy_<name>) to avoid collisions,
-    since all toy apps share the filename 'app.py'.  toys/ is added
-    to sys.path so that ``from common.flask_app import ...`` resolves.
+    Each module gets a unique name (toy_<name>, or toy_<name>_<stem> for
+    other files) to avoid collisions, since all toy apps share the
+    filename 'app.py'.  toys/ is added to sys.path so that
+    ``from common.flask_app import ...`` resolves.
     """
-    module_key = f"toy_{toy_name}"
+    stem = os.path.splitext(filename)[0]
+    module_key = f"toy_{toy_name}" if stem == 'app' else f"toy_{toy_name}_{stem}"
     if module_key in sys.modules:
         return sys.modules[module_key]
 
-    app_path = os.path.join(TOYS_DIR, toy_name, 'app.py')
+    app_path = os.path.join(TOYS_DIR, toy_name, filename)
     if TOYS_DIR not in sys.path:
         sys.path.insert(0, TOYS_DIR)
 
@@ -39,6 +41,13 @@ def _load_toy_module(toy_name):
     return module
 
 
+def _load_common_module(name):
+    """Import toys/common/<name>.py as ``common.<name>`` (toys/ on sys.path)."""
+    if TOYS_DIR not in sys.path:
+        sys.path.insert(0, TOYS_DIR)
+    return importlib.import_module(f"common.{name}")
+
+
 # ── Session-scoped module fixtures (loaded once) ───────────────────
 
 @pytest.fixture(scope="session")
@@ -61,11 +70,31 @@ def chi_square_module():
     return _load_toy_module("chi_square")
 
 
+@pytest.fixture(scope="session")
+def chi_square_batch_module():
+    return _load_toy_module("chi_square", "batch.py")
+
+
 @pytest.fixture(scope="session")
 def pearson_correlation_module():
     return _load_toy_module("pearson_correlation")
 
 
+@pytest.fixture(scope="session")
+def coalesce_module():
+    return _load_common_module("coalesce")
+
+
+@pytest.fixture(scope="session")
+def moments_module():
+    return _load_common_module("moments")
+
+
+@pytest.fixture(scope="session")
+def downsample_module():
+    return _load_common_module("downsample")
+
+
 # ── Function-scoped client fixtures (reset state each test) ────────
 
 @pytest.fixture
@@ -108,10 +137,14 @@ def chi_client(chi_square_module):
 
 @pytest.fixture
 def pearson_client(pearson_correlation_module):
-    """Flask test client for pearson_correlation (stateless)."""
+    """Flask test client for pearson_correlation.  Resets _point_stores, caches and uploads."""
+    pearson_correlation_module._point_stores.clear()
+    pearson_correlation_module._bands_cache.clear()
     pearson_correlation_module.app.config['TESTING'] = True
     with pearson_correlation_module.app.test_client() as client:
         yield client
+    pearson_correlation_module._point_stores.clear()
+    pearson_correlation_module._cleanup_uploads()
 
 
 @pytest.fixture(scope="session")
@@ -126,8 +159,9 @@ def test_selector_module():
 
 @pytest.fixture
 def biased_sampling_client(biased_sampling_module):
-    """Flask test client for biased_sampling (stateless)."""
+    """Flask test client for biased_sampling (empty scenario cache)."""
     biased_sampling_module.app.config['TESTING'] = True
+    biased_sampling_module._clear_scenario_cache()
     with biased_sampling_module.app.test_client() as client:
         yield client
 
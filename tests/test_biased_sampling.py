@@ -1,4 +1,5 @@
 """Tests for the biased_sampling Flask backend."""
+import pytest
 
 
 # --- Index ---
@@ -44,8 +45,8 @@ def test_generate_restriction_of_range(biased_sampling_client):
     assert data['success'] is True
     assert 'population' in data
     assert 'sample' in data
-    assert len(data['population']['points']) >= 250
-    assert len(data['sample']['points']) < len(data['population']['points'])
+    assert len(data['population']['points']['x']) >= 250
+    assert len(data['sample']['points']['x']) < len(data['population']['points']['x'])
     assert data['population']['stats']['r'] is not None
     assert data['sample']['stats']['r'] is not None
     assert data['population']['groups'] is None
@@ -58,8 +59,8 @@ def test_generate_truncation_bias(biased_sampling_client):
     assert resp.status_code == 200
     data = resp.get_json()
     assert data['success'] is True
-    assert len(data['population']['points']) >= 250
-    assert len(data['sample']['points']) < len(data['population']['points'])
+    assert len(data['population']['points']['x']) >= 250
+    assert len(data['sample']['points']['x']) < len(data['population']['points']['x'])
 
 
 def test_generate_simpsons_paradox(biased_sampling_client):
@@ -70,7 +71,7 @@ def test_generate_simpsons_paradox(biased_sampling_client):
     data = resp.get_json()
     assert data['success'] is True
     assert data['population']['groups'] is not None
-    assert len(data['population']['groups']) == len(data['population']['points'])
+    assert len(data['population']['groups']) == len(data['population']['points']['x'])
     groups = set(data['population']['groups'])
     assert 'young' in groups
     assert 'old' in groups
@@ -88,6 +89,74 @@ def test_generate_with_seed_reproducible(biased_sampling_client):
     data2 = resp2.get_json()
     assert data1['population']['points'] == data2['population']['points']
     assert data1['sample']['points'] == data2['sample']['points']
+    assert data1['cached'] is False
+    assert data2['cached'] is True
+
+
+def test_generate_without_seed_is_not_cached(biased_sampling_client, biased_sampling_module):
+    for _ in range(2):
+        data = biased_sampling_client.post('/api/generate', json={
+            'scenario_id': 'truncation_bias',
+        }).get_json()
+        assert data['cached'] is False
+    assert len(biased_sampling_module._scenario_cache) == 0
+
+
+def test_generate_population_size_and_columns(biased_sampling_client):
+    data = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'simpsons_paradox', 'seed': 5, 'n': 1001,
+    }).get_json()
+    points = data['population']['points']
+    assert data['population']['stats']['n'] == 1001
+    assert len(points['x']) == len(points['y']) == len(data['population']['groups']) == 1001
+    assert all(round(v, 2) == v for v in points['x'][:50])
+    other_n = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'simpsons_paradox', 'seed': 5, 'n': 1000,
+    }).get_json()
+    assert other_n['cached'] is False
+
+
+def test_generate_population_size_out_of_range(biased_sampling_client):
+    resp = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'truncation_bias', 'n': 10,
+    })
+    assert resp.status_code == 400
+    assert "'n'" in resp.get_json()['error']
+
+
+def test_generate_rejects_display_all_for_large_population(biased_sampling_client,
+                                                          biased_sampling_module):
+    n = biased_sampling_module.DISPLAY_MAX_BUDGET + 1
+    resp = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'truncation_bias', 'seed': 1, 'n': n,
+    })
+    assert resp.status_code == 400
+    assert 'display' in resp.get_json()['error']
+    assert len(biased_sampling_module._scenario_cache) == 0
+
+
+def test_scenario_cache_evicts_by_total_points(biased_sampling_module, monkeypatch):
+    monkeypatch.setattr(biased_sampling_module, 'SCENARIO_CACHE_MAX_POINTS', 1000)
+    cache = biased_sampling_module._scenario_cache
+    biased_sampling_module._clear_scenario_cache()
+    for seed in range(4):
+        biased_sampling_module._scenario_data('truncation_bias', seed)
+    assert list(cache) == [('truncation_bias', s, 300) for s in (1, 2, 3)]
+    _, cached = biased_sampling_module._scenario_data('truncation_bias', 1)
+    assert cached is True
+    biased_sampling_module._scenario_data('truncation_bias', 4, 600)
+    assert list(cache) == [('truncation_bias', 1, 300), ('truncation_bias', 4, 600)]
+    assert biased_sampling_module._scenario_cache_points == 900
+    biased_sampling_module._clear_scenario_cache()
+
+
+def test_scenario_data_stores_mask_and_codes(biased_sampling_module):
+    import numpy as np
+    scenario, _ = biased_sampling_module._scenario_data('simpsons_paradox', 3, 1000)
+    assert scenario['codes'].dtype == np.int8
+    assert scenario['mask'].dtype == bool
+    assert 'groups' not in scenario and 'x_sample' not in scenario
+    assert scenario['sample_stats']['n'] == int(scenario['mask'].sum())
 
 
 def test_generate_returns_scenario_metadata(biased_sampling_client):
@@ -201,3 +270,205 @@ def test_simpsons_paradox_reverses_direction(biased_sampling_client):
     # Population should be negative overall, sample positive within elderly
     assert pop_r < 0, f"Population r should be negative, got {pop_r}"
     assert sample_r > 0, f"Sample r should be positive, got {sample_r}"
+
+
+# --- /api/generate: redukcja punktow ---
+
+def test_generate_display_thin_keeps_full_stats(biased_sampling_client):
+    full = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'simpsons_paradox', 'seed': 3,
+    }).get_json()
+    thin = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'simpsons_paradox', 'seed': 3, 'display': 'thin', 'point_budget': 100,
+    }).get_json()
+    assert thin['population']['stats'] == full['population']['stats']
+    assert len(thin['population']['points']['x']) <= 100
+    assert len(thin['population']['groups']) == len(thin['population']['points']['x'])
+    assert thin['population']['display']['n_total'] == 300
+    assert 'display' not in full['population']
+
+
+def test_generate_display_grid_shares_ranges(biased_sampling_client):
+    data = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'truncation_bias', 'seed': 1, 'display': 'grid', 'point_budget': 100,
+    }).get_json()
+    pop = data['population']['display']
+    sample = data['sample']['display']
+    assert data['population']['points'] is None
+    assert pop['x_edges'] == sample['x_edges']
+    assert sum(map(sum, pop['counts'])) == 300
+    assert sum(map(sum, sample['counts'])) == data['sample']['stats']['n']
+
+
+def test_generate_display_invalid_mode(biased_sampling_client):
+    resp = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'truncation_bias', 'display': 'hexagons',
+    })
+    assert resp.status_code == 400
+
+
+# --- /api/select ---
+
+def test_select_rectangle_matches_compute_on_points(biased_sampling_client, biased_sampling_module):
+    gen = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'truncation_bias', 'seed': 11,
+    }).get_json()
+    resp = biased_sampling_client.post('/api/select', json={
+        'scenario_id': 'truncation_bias', 'seed': 11,
+        'selection': {'type': 'rectangle', 'x': [20, 5], 'y': [30, 80]},
+    })
+    data = resp.get_json()
+    assert data['success'] is True
+    assert data['cached'] is True
+    assert data['n_total'] == 300
+
+    scenario, _ = biased_sampling_module._scenario_data('truncation_bias', 11)
+    x, y = scenario['x_pop'], scenario['y_pop']
+    mask = (x >= 5) & (x <= 20) & (y >= 30) & (y <= 80)
+    assert data['n'] == int(mask.sum())
+    assert data['r'] == biased_sampling_module._compute_stats(x[mask], y[mask])['r']
+    assert len(gen['population']['points']['x']) == 300
+
+
+def test_points_in_polygon_matches_brute_force(biased_sampling_module):
+    import numpy as np
+    rng = np.random.default_rng(2)
+    x = rng.uniform(-2, 2, 2000)
+    y = rng.uniform(-2, 2, 2000)
+    # Wielokat wklesly (litera L)
+    px = np.array([0.0, 1.5, 1.5, 0.5, 0.5, 0.0])
+    py = np.array([0.0, 0.0, 0.5, 0.5, 1.5, 1.5])
+    mask = biased_sampling_module._points_in_polygon(x, y, px, py)
+    expected = (((x > 0) & (x < 1.5) & (y > 0) & (y < 0.5))
+                | ((x > 0) & (x < 0.5) & (y > 0) & (y < 1.5)))
+    assert np.array_equal(mask, expected)
+
+
+def test_select_threshold_and_sample_target(biased_sampling_client):
+    data = biased_sampling_client.post('/api/select', json={
+        'scenario_id': 'restriction_of_range', 'seed': 4, 'target': 'sample',
+        'selection': {'type': 'threshold', 'axis': 'y', 'min': 5},
+    }).get_json()
+    assert data['success'] is True
+    assert data['n'] <= data['n_total'] < 300
+
+
+@pytest.mark.parametrize('payload, message', [
+    ({'scenario_id': 'truncation_bias', 'selection': {'type': 'rectangle', 'x': [0, 1], 'y': [0, 1]}},
+     "'seed'"),
+    ({'scenario_id': 'truncation_bias', 'seed': 1, 'selection': {'type': 'circle'}}, 'Typ'),
+    ({'scenario_id': 'truncation_bias', 'seed': 1,
+      'selection': {'type': 'lasso', 'x': [0, 1], 'y': [0, 1]}}, "'x'"),
+    ({'scenario_id': 'truncation_bias', 'seed': 1,
+      'selection': {'type': 'threshold', 'axis': 'x'}}, 'granicy'),
+    ({'scenario_id': 'truncation_bias', 'seed': 1, 'target': 'both',
+      'selection': {'type': 'threshold', 'axis': 'x', 'min': 1}}, "'target'"),
+])
+def test_select_invalid_input(biased_sampling_client, payload, message):
+    resp = biased_sampling_client.post('/api/select', json=payload)
+    assert resp.status_code == 400
+    assert message in resp.get_json()['error']
+
+
+# --- /api/replicate ---
+
+def test_replicate_reports_bias_and_throughput(biased_sampling_client):
+    data = biased_sampling_client.post('/api/replicate', json={
+        'scenario_id': 'simpsons_paradox', 'replications': 200, 'seed': 0,
+    }).get_json()
+    assert data['success'] is True
+    assert data['n_valid'] == 200
+    assert data['population_r']['mean'] < 0 < data['sample_r']['mean']
+    assert data['sign_flip_rate'] > 0.9
+    assert data['bias']['rmse'] >= abs(data['bias']['mean'])
+    assert sum(data['histogram']['sample']) == 200
+    assert data['throughput']['replications_per_s'] > 0
+
+
+def test_replication_chunks_match_single_batch(biased_sampling_module, monkeypatch):
+    full = biased_sampling_module._replication_study('truncation_bias', 50, 100, seed=3)
+    monkeypatch.setattr(biased_sampling_module, 'REPLICATION_CHUNK_ELEMENTS', 700)
+    chunked = biased_sampling_module._replication_study('truncation_bias', 50, 100, seed=3)
+    assert chunked['population_r'] == full['population_r']
+    assert chunked['sample_r'] == full['sample_r']
+
+
+def test_batch_r_matches_corrcoef(biased_sampling_module):
+    import numpy as np
+    rng = np.random.default_rng(8)
+    x, y, _, mask = biased_sampling_module._generate_batch('restriction_of_range', rng, 4, 200)
+    r = biased_sampling_module._batch_r(x, y, mask)
+    for i in range(4):
+        expected = np.corrcoef(x[i][mask[i]], y[i][mask[i]])[0, 1]
+        assert abs(r[i] - expected) < 1e-12
+
+
+@pytest.mark.parametrize('payload', [
+    {'scenario_id': 'truncation_bias', 'replications': 5},
+    {'scenario_id': 'truncation_bias', 'replications': 10000, 'n': 100000},
+    {'scenario_id': 'nope'},
+])
+def test_replicate_invalid_input(biased_sampling_client, payload):
+    resp = biased_sampling_client.post('/api/replicate', json=payload)
+    assert resp.status_code == 400
+    assert resp.get_json()['success'] is False
+
+
+# --- Specyfikacje scenariuszy ---
+
+def test_every_scenario_has_spec(biased_sampling_module):
+    assert set(biased_sampling_module.SCENARIO_SPECS) == set(biased_sampling_module.SCENARIOS)
+
+
+def test_generate_batch_follows_spec(biased_sampling_module):
+    import numpy as np
+    x, y, codes, mask = biased_sampling_module._generate_batch(
+        'simpsons_paradox', np.random.default_rng(0), 2, 301)
+    assert x.shape == y.shape == mask.shape == (2, 301)
+    assert np.bincount(codes).tolist() == [150, 151]
+    assert (x >= 0).all() and (x <= 20).all() and (y >= 40).all() and (y <= 120).all()
+    assert np.array_equal(mask[0], codes == 1)
+
+
+def test_group_stats_match_per_group_compute(biased_sampling_client, biased_sampling_module):
+    import numpy as np
+    data = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'simpsons_paradox', 'seed': 9, 'n': 5000, 'display': 'grid',
+    }).get_json()
+    group_stats = data['population']['group_stats']
+    scenario, _ = biased_sampling_module._scenario_data('simpsons_paradox', 9, 5000)
+    for name in ('young', 'old'):
+        sel = scenario['names'][scenario['codes']] == name
+        expected = biased_sampling_module._compute_stats(scenario['x_pop'][sel], scenario['y_pop'][sel])
+        assert group_stats[name]['n'] == expected['n']
+        assert group_stats[name]['r'] == expected['r']
+        assert np.isclose(group_stats[name]['slope'], expected['slope'], atol=1e-4)
+    assert group_stats['old']['r'] > 0 > data['population']['stats']['r']
+
+
+def test_generate_large_population_with_grid(biased_sampling_client):
+    data = biased_sampling_client.post('/api/generate', json={
+        'scenario_id': 'truncation_bias', 'seed': 2, 'n': 1000000,
+        'display': 'grid', 'point_budget': 400,
+    }).get_json()
+    assert data['success'] is True
+    assert data['population']['stats']['n'] == 1000000
+    assert data['population']['group_stats'] is None
+
+
+def test_generate_hexbin_payload_independent_of_population(biased_sampling_client):
+    sizes = []
+    for n in (10000, 1000000):
+        data = biased_sampling_client.post('/api/generate', json={
+            'scenario_id': 'simpsons_paradox', 'seed': 1, 'n': n,
+            'display': 'hexbin', 'point_budget': 500,
+        }).get_json()
+        pop = data['population']['display']
+        sample = data['sample']['display']
+        assert data['population']['points'] is None
+        assert pop['mode'] == sample['mode'] == 'hexbin'
+        assert sum(pop['counts']) == n
+        assert sum(sample['counts']) == data['sample']['stats']['n']
+        assert pop['hex_width'] == sample['hex_width']
+        sizes.append(len(pop['counts']))
+    assert max(sizes) <= 500
@@ -81,6 +81,17 @@ def test_compute_alpha_out_of_range(chi_client):
     assert resp.get_json()['success'] is False
 
 
+def test_generate_from_percentages_clamps_negative(chi_client):
+    resp = chi_client.post('/api/generate-from-percentages', json={
+        'row_percentages': [[-10, 60, 40], [30, 30, 40]],
+        'n': 200,
+    })
+    assert resp.status_code == 200
+    table = resp.get_json()['table']
+    assert table[0][0] == 0
+    assert sum(map(sum, table)) == 200
+
+
 def test_generate_from_percentages_happy_path(chi_client):
     resp = chi_client.post('/api/generate-from-percentages', json={
         'row_percentages': [[40, 35, 25], [35, 35, 30]],
@@ -93,3 +104,354 @@ def test_generate_from_percentages_happy_path(chi_client):
     assert data['success'] is True
     assert 'table' in data
     assert 'chi_square' in data
+
+
+def test_compute_large_expected_has_no_monte_carlo(chi_client):
+    resp = chi_client.post('/api/compute', json={
+        'table': [[10, 20], [30, 40]],
+    })
+    assert resp.get_json()['monte_carlo'] is None
+
+
+def test_compute_small_expected_adds_monte_carlo(chi_client):
+    resp = chi_client.post('/api/compute', json={
+        'table': [[3, 1], [1, 3]],
+        'mc_simulations': 5000,
+        'seed': 1,
+    })
+    assert resp.status_code == 200
+    mc = resp.get_json()['monte_carlo']
+    assert mc['n_simulations'] == 5000
+    assert mc['ci_lower'] <= mc['p_value'] <= mc['ci_upper']
+    # Dokladny test Fishera (dwustronny) dla tej tabeli: p = 0.4857
+    assert abs(mc['p_value'] - 0.4857) < 0.03
+
+
+def test_monte_carlo_reproducible_with_seed(chi_square_module):
+    import numpy as np
+    table = np.array([[2, 0, 3], [1, 4, 0]], dtype=float)
+    stat = 7.0
+    a = chi_square_module._monte_carlo_p_value(table, stat, 20000, seed=7, time_budget=None)
+    b = chi_square_module._monte_carlo_p_value(table, stat, 20000, seed=7, time_budget=None)
+    assert a['p_value'] == b['p_value']
+    assert a['truncated'] is False
+
+
+def test_monte_carlo_independent_of_workers(chi_square_module):
+    import numpy as np
+    table = np.array([[2, 0, 3], [1, 4, 0]], dtype=float)
+    a = chi_square_module._monte_carlo_p_value(table, 7.0, 20000, seed=3, time_budget=None)
+    b = chi_square_module._monte_carlo_p_value(table, 7.0, 20000, seed=3, time_budget=None,
+                                               workers=2)
+    assert a['p_value'] == b['p_value']
+    assert a['n_simulations'] == b['n_simulations'] == 20000
+
+
+def test_monte_carlo_large_sparse_table_respects_budget(chi_square_module):
+    import numpy as np
+    rng = np.random.default_rng(0)
+    table = rng.poisson(0.5, (100, 100)).astype(float) + 1
+    stat = float(chi_square_module._chi_square_kernel(table)['pearson'])
+    mc = chi_square_module._monte_carlo_p_value(table, stat, 10000, seed=1, time_budget=0.05)
+    assert mc['truncated'] is True
+    assert 0 < mc['n_simulations'] < 10000
+    # Pierwsza paczka jest mala, wiec limit nie jest przekraczany o cala paczke
+    assert mc['elapsed_ms'] < 150
+
+
+def test_compute_invalid_simulations(chi_client):
+    resp = chi_client.post('/api/compute', json={
+        'table': [[3, 1], [1, 3]],
+        'mc_simulations': -5,
+    })
+    assert resp.status_code == 400
+
+
+def test_null_distribution_happy_path(chi_client):
+    resp = chi_client.post('/api/null-distribution', json={
+        'table': [[10, 20], [30, 40]],
+        'simulations': 2000,
+        'seed': 3,
+    })
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['success'] is True
+    assert data['df'] == 1
+    assert data['n_simulations'] == 2000
+    assert len(data['histogram']['edges']) == len(data['histogram']['density']) + 1
+    assert len(data['pdf']['x']) == len(data['pdf']['y'])
+    # Srednia chi2(df) = df
+    assert abs(data['simulated_mean'] - 1) < 0.2
+
+
+def test_null_distribution_cached_by_seed(chi_client, chi_square_module):
+    chi_square_module._null_cache.clear()
+    body = {'table': [[5, 7, 9], [8, 6, 4]], 'simulations': 1000, 'seed': 11}
+    first = chi_client.post('/api/null-distribution', json=body).get_json()
+    assert len(chi_square_module._null_cache) == 1
+    second = chi_client.post('/api/null-distribution',
+                             json={**body, 'overlay': False}).get_json()
+    assert len(chi_square_module._null_cache) == 1
+    assert 'pdf' not in second
+    assert first['histogram'] == second['histogram']
+
+
+def test_null_distribution_stream_reports_progress(chi_client):
+    import json
+    resp = chi_client.post('/api/null-distribution', json={
+        'table': [[10, 20], [30, 40]],
+        'simulations': 12000,
+        'seed': 5,
+        'stream': True,
+    })
+    lines = [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+    progress = [l['progress'] for l in lines if 'progress' in l]
+    assert progress[-1] == 1.0
+    assert len(progress) > 1
+    assert lines[-1]['success'] is True
+
+
+def test_null_distribution_stream_reports_error_line(chi_client, chi_square_module,
+                                                    monkeypatch):
+    import json
+
+    def failing(*args):
+        yield 5000, chi_square_module.np.zeros(5000)
+        raise RuntimeError("boom")
+
+    chi_square_module._null_cache.clear()
+    monkeypatch.setattr(chi_square_module, '_iter_null_statistics', failing)
+    resp = chi_client.post('/api/null-distribution', json={
+        'table': [[10, 20], [30, 40]], 'simulations': 12000, 'seed': 5, 'stream': True,
+    })
+    lines = [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+    assert 'progress' in lines[0]
+    assert lines[-1] == {'success': False, 'error': 'Nieoczekiwany błąd serwera'}
+
+
+def test_null_histogram_normalized_by_all_simulations(chi_square_module):
+    import numpy as np
+    simulated = np.sort(np.random.default_rng(0).chisquare(1, 5000))
+    simulated[-20:] = 1000.0
+    hist = chi_square_module._summarize_null_distribution(simulated, 1, 2.0, False)['histogram']
+    area = np.sum(np.array(hist['density']) * np.diff(hist['edges']))
+    assert hist['share_beyond'] > 0
+    assert abs(area + hist['share_beyond'] - 1) < 1e-4
+
+
+def test_power_curve_shape(chi_client):
+    resp = chi_client.post('/api/power', json={
+        'row_percentages': [[75, 25], [30, 70]],
+        'row_split': [0.5, 0.5],
+        'n_values': [20, 100, 400],
+        'alphas': [0.01, 0.05],
+        'simulations': 500,
+        'seed': 1,
+    })
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['n_values'] == [20, 100, 400]
+    assert len(data['power']) == 2
+    assert len(data['power'][0]) == 3
+    # Moc rosnie z n i z alpha
+    assert data['power'][1][0] < data['power'][1][2]
+    assert data['power'][0][2] <= data['power'][1][2] + 0.05
+    assert data['power'][1][2] > 0.95
+
+
+def test_power_no_effect_equals_alpha(chi_client):
+    resp = chi_client.post('/api/power', json={
+        'row_percentages': [[60, 40], [60, 40]],
+        'n_values': [500],
+        'alphas': [0.05],
+        'simulations': 2000,
+        'seed': 2,
+    })
+    data = resp.get_json()
+    assert data['effect_size_w'] == 0
+    assert data['power'][0][0] < 0.1
+    assert data['required_n'] == [None]
+
+
+def test_power_invalid_grid(chi_client):
+    resp = chi_client.post('/api/power', json={
+        'row_percentages': [[60, 40], [50, 50]],
+        'n_values': [5],
+    })
+    assert resp.status_code == 400
+
+
+def test_generate_largest_remainder_preserves_totals(chi_square_module):
+    import numpy as np
+    pcts = np.array([[33.3, 33.3, 33.4], [10, 20, 70], [1, 1, 98]])
+    table = chi_square_module._table_from_percentages(
+        1001, pcts, np.array([0.2, 0.3, 0.5]))
+    assert table.sum() == 1001
+    assert table.sum(axis=1).tolist() == [200, 300, 501]
+    assert np.all(table >= 0)
+
+
+def test_compute_big_table_omits_cells(chi_client):
+    import numpy as np
+    table = np.random.default_rng(0).integers(20, 60, size=(30, 25)).tolist()
+    resp = chi_client.post('/api/compute', json={'table': table})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['df'] == 29 * 24
+    assert data['cells_included'] is False
+    assert 'expected' not in data
+
+    resp = chi_client.post('/api/compute', json={'table': table, 'include_cells': True})
+    data = resp.get_json()
+    assert len(data['expected']) == 30
+
+
+def test_include_cells_rejects_non_boolean(chi_client):
+    for flag in ('false', '0', 1):
+        resp = chi_client.post('/api/compute', json={'table': [[3, 5], [6, 2]],
+                                                     'include_cells': flag})
+        assert resp.status_code == 400
+        assert 'include_cells' in resp.get_json()['error']
+    data = chi_client.post('/api/compute', json={'table': [[3, 5], [6, 2]],
+                                                 'include_cells': False}).get_json()
+    assert data['cells_included'] is False
+
+    resp = _upload(chi_client, 'a,b\nx,p\ny,q\nx,q\n', include_cells='maybe')
+    assert resp.status_code == 400
+
+
+def test_generate_large_sample(chi_client):
+    resp = chi_client.post('/api/generate-from-percentages', json={
+        'row_percentages': [[40, 35, 25], [35, 35, 30]],
+        'n': 500000,
+        'row_split': [0.6, 0.4],
+    })
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert sum(map(sum, data['table'])) == 500000
+
+
+def _upload(client, text, **form):
+    import io
+    form['file'] = (io.BytesIO(text.encode('utf-8')), 'data.csv')
+    return client.post('/api/upload-raw', data=form, content_type='multipart/form-data')
+
+
+def test_upload_raw_builds_crosstab(chi_client, chi_square_module):
+    chi_square_module.CSV_CHUNK_ROWS, old = 7, chi_square_module.CSV_CHUNK_ROWS
+    try:
+        lines = ['plec,ocena']
+        lines += ['K,tak'] * 12 + ['M,nie'] * 9 + ['K,nie'] * 5 + ['M,tak'] * 4 + [',tak']
+        resp = _upload(chi_client, '\n'.join(lines) + '\n')
+    finally:
+        chi_square_module.CSV_CHUNK_ROWS = old
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['variables'] == ['plec', 'ocena']
+    assert data['row_labels'] == ['K', 'M']
+    assert data['col_labels'] == ['nie', 'tak']
+    assert data['table'] == [[5, 12], [9, 4]]
+    assert data['n_observations'] == 30
+    assert data['skipped_rows'] == 1
+
+
+def test_upload_raw_skips_blank_rows(chi_client, chi_square_module):
+    chi_square_module.CSV_CHUNK_ROWS, old = 3, chi_square_module.CSV_CHUNK_ROWS
+    try:
+        text = 'plec,ocena\r\nK,tak\r\n\r\nM,nie\r\n\r\n\r\n\r\nK,nie\r\nM,tak\r\n\r\n'
+        resp = _upload(chi_client, text)
+    finally:
+        chi_square_module.CSV_CHUNK_ROWS = old
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['table'] == [[1, 1], [1, 1]]
+    assert data['n_observations'] == 4
+    assert data['skipped_rows'] == 5
+
+
+def test_upload_raw_single_category(chi_client):
+    resp = _upload(chi_client, 'a,x\na,y\na,x\n', header='false')
+    assert resp.status_code == 400
+    assert resp.get_json()['success'] is False
+
+
+def test_upload_raw_missing_file(chi_client):
+    resp = chi_client.post('/api/upload-raw', data={}, content_type='multipart/form-data')
+    assert resp.status_code == 400
+
+
+def test_batch_cli_ndjson(chi_square_batch_module, tmp_path, capsys):
+    import json
+    src = tmp_path / 'tables.ndjson'
+    src.write_text(
+        json.dumps({'id': 'a', 'table': [[10, 20], [30, 40]]}) + '\n'
+        + json.dumps({'id': 'b', 'table': [[1, 2]]}) + '\n'
+        + '\n'
+        + json.dumps({'id': 'c', 'table': [[10, 20, 30], [40, 50, 60]], 'alpha': 0.1}) + '\n',
+        encoding='utf-8')
+    out = tmp_path / 'out.ndjson'
+    code = chi_square_batch_module.main([str(src), '-o', str(out)])
+    results = [json.loads(l) for l in out.read_text(encoding='utf-8').splitlines()]
+    assert code == 1
+    assert [r['id'] for r in results] == ['a', 'b', 'c']
+    assert [r['success'] for r in results] == [True, False, True]
+    assert results[2]['df'] == 2
+    assert 'tabel/s' in capsys.readouterr().err
+
+
+def test_batch_cli_long_csv_matches_api(chi_square_batch_module, chi_client, tmp_path):
+    import json
+    src = tmp_path / 'tables.csv'
+    src.write_text('id,row,col,count\n'
+                   't1,K,tak,10\nt1,K,nie,20\nt1,M,tak,30\nt1,M,nie,40\n',
+                   encoding='utf-8')
+    out = tmp_path / 'out.ndjson'
+    assert chi_square_batch_module.main([str(src), '-o', str(out)]) == 0
+    result = json.loads(out.read_text(encoding='utf-8'))
+    api = chi_client.post('/api/compute', json={'table': [[10, 20], [30, 40]]}).get_json()
+    assert result['chi_square'] == api['chi_square']
+    assert result['p_value'] == api['p_value']
+
+
+def test_batch_does_not_register_app_module(chi_square_batch_module):
+    import os
+    import sys
+    app = sys.modules.get('app')
+    assert app is None or os.path.dirname(app.__file__) != os.path.dirname(
+        chi_square_batch_module.__file__)
+    assert chi_square_batch_module._app.__name__ == 'chi_square_app'
+
+
+def test_kernel_matches_scipy(chi_square_module):
+    import numpy as np
+    from scipy import stats
+    rng = np.random.default_rng(4)
+    for shape in [(2, 2), (3, 5), (12, 7)]:
+        table = rng.integers(0, 40, size=shape).astype(float) + 1
+        table[0, 0] = 0
+        k = chi_square_module._chi_square_kernel(table)
+        chi2, _, dof, expected = stats.chi2_contingency(table, correction=False)
+        g, _, _, _ = stats.chi2_contingency(table, correction=False, lambda_='log-likelihood')
+        assert k['df'] == dof
+        np.testing.assert_allclose(k['expected'], expected, rtol=1e-12)
+        np.testing.assert_allclose(k['pearson'], chi2, rtol=1e-10)
+        np.testing.assert_allclose(k['g_stat'], g, rtol=1e-10)
+        if dof == 1:
+            yates, _, _, _ = stats.chi2_contingency(table)
+            np.testing.assert_allclose(k['yates'], yates, rtol=1e-10)
+        else:
+            assert k['yates'] is None
+
+
+def test_compute_returns_residuals_and_g(chi_client):
+    from scipy import stats
+    table = [[10, 20], [30, 40]]
+    data = chi_client.post('/api/compute', json={'table': table}).get_json()
+    chi2, p, _, _ = stats.chi2_contingency(table)
+    assert abs(data['chi_square'] - chi2) < 1e-4
+    assert abs(data['p_value'] - p) < 1e-10
+    assert data['yates_correction'] is True
+    assert data['g_statistic'] > 0
+    # Dla 2x2 reszty skorygowane maja rowny modul we wszystkich komorkach
+    adj = [abs(v) for row in data['adj_residuals'] for v in row]
+    assert max(adj) - min(adj) < 1e-3
@@ -0,0 +1,149 @@
+"""Tests for shared helpers in toys/common."""
+import threading
+
+import numpy as np
+import pytest
+from scipy import stats
+
+
+def test_coalescer_without_client_id_always_computes(coalesce_module):
+    coalescer = coalesce_module.LatestWinsCoalescer()
+    assert coalescer.run(None, 'compute', lambda: 42) == 42
+
+
+def test_coalescer_latest_wins(coalesce_module):
+    registered = [threading.Event() for _ in range(3)]
+
+    class SignallingCoalescer(coalesce_module.LatestWinsCoalescer):
+        # Sygnalizuje zarejestrowanie kolejnego zapytania (bez odpytywania stanu)
+        def _register(self, slot):
+            token, entry = super()._register(slot)
+            registered[token - 1].set()
+            return token, entry
+
+    coalescer = SignallingCoalescer(max_concurrent=1)
+    started = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'first'
+
+    def call(name, func):
+        results[name] = coalescer.run('client-a', 'compute', func)
+
+    t1 = threading.Thread(target=call, args=('first', slow))
+    t1.start()
+    assert started.wait(5)
+    # Dwa kolejne zapytania czekaja, az pierwsze sie skonczy
+    t2 = threading.Thread(target=call, args=('second', lambda: 'second'))
+    t2.start()
+    assert registered[1].wait(5)
+    t3 = threading.Thread(target=call, args=('third', lambda: 'third'))
+    t3.start()
+    assert registered[2].wait(5)
+    release.set()
+    for t in (t1, t2, t3):
+        t.join(5)
+        assert not t.is_alive()
+
+    assert results['first'] == 'first'
+    assert results['second'] is coalesce_module.SUPERSEDED
+    assert results['third'] == 'third'
+    assert coalescer.superseded_count == 1
+    assert coalescer._clients == {}
+
+
+def test_coalescer_clients_are_independent(coalesce_module):
+    coalescer = coalesce_module.LatestWinsCoalescer()
+    assert coalescer.run('a', 'compute', lambda: 1) == 1
+    assert coalescer.run('b', 'compute', lambda: 2) == 2
+    assert coalescer.run('a', 'compute', lambda: 3) == 3
+
+
+@pytest.mark.parametrize('n, rho', [(3, 0.9), (30, 0.0), (500, -0.6), (20000, 0.3)])
+def test_correlation_stats_matches_scipy(moments_module, n, rho):
+    rng = np.random.default_rng(n)
+    x = rng.normal(10, 3, n)
+    y = rho * (x - 10) + rng.normal(50, 2, n)
+    ours = moments_module.correlation_stats(x, y)
+    r, p = stats.pearsonr(x, y)
+    fit = stats.linregress(x, y)
+    assert ours['r'] == pytest.approx(r, rel=1e-12, abs=1e-12)
+    assert ours['p_value'] == pytest.approx(p, rel=1e-9, abs=1e-300)
+    assert ours['slope'] == pytest.approx(fit.slope, rel=1e-12, abs=1e-12)
+    assert ours['intercept'] == pytest.approx(fit.intercept, rel=1e-12)
+    assert ours['std_err'] == pytest.approx(fit.stderr, rel=1e-10)
+
+
+def test_correlation_stats_degenerate(moments_module):
+    out = moments_module.correlation_stats(np.array([1.0, 2.0, 3.0]), np.array([5.0, 5.0, 5.0]))
+    assert out['r'] is None and out['slope'] is None
+    assert moments_module.correlation_stats(np.array([1.0, 2.0]), np.array([1.0, 3.0]))['r'] is None
+
+
+def test_stats_from_sums_matches_centered(moments_module):
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=100)
+    y = x + rng.normal(size=100)
+    shift_x, shift_y = 0.3, -0.2
+    dx, dy = x - shift_x, y - shift_y
+    st = moments_module.stats_from_sums(100, dx.sum(), dy.sum(), dx @ dx, dy @ dy, dx @ dy)
+    ref = moments_module.correlation_stats(x, y)
+    assert st['r'] == pytest.approx(ref['r'], rel=1e-12)
+    assert st['slope'] == pytest.approx(ref['slope'], rel=1e-12)
+
+
+def test_grid_counts_single_bincount_matches_histogram2d(downsample_module):
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 10, 5000)
+    y = rng.uniform(-5, 5, 5000)
+    grid = downsample_module.grid_counts(x, y, 8, (0, 10), (-5, 5))
+    ref, _, _ = np.histogram2d(y, x, bins=8, range=[(-5, 5), (0, 10)])
+    assert np.array_equal(np.array(grid['counts']), ref)
+    assert len(grid['x_edges']) == 9
+
+
+def test_thin_indices_respects_budget_and_keeps_extremes(downsample_module):
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=50000)
+    y = 0.5 * x + rng.normal(size=50000)
+    x[123], y[456] = 25.0, -30.0
+    idx = downsample_module.thin_indices(x, y, 1000)
+    assert len(idx) <= 1000
+    assert len(np.unique(idx)) == len(idx)
+    for must in (123, 456, int(np.argmax(y)), int(np.argmin(x))):
+        assert must in idx
+
+
+def test_thin_indices_small_input_unchanged(downsample_module):
+    x = np.arange(20.0)
+    assert np.array_equal(downsample_module.thin_indices(x, x, 100), np.arange(20))
+
+
+def test_hexbin_counts_assign_points_to_nearest_center(downsample_module):
+    rng = np.random.default_rng(10)
+    x = rng.normal(size=3000)
+    y = rng.normal(size=3000)
+    hexes = downsample_module.hexbin_counts(x, y, 6)
+    assert sum(hexes['counts']) == 3000
+
+    # Wszystkie srodki obu siatek; najblizszy w metryce szesciokatnej (waga 3 w osi y)
+    nx = hexes['gridsize']
+    ny = downsample_module._hex_rows(nx)
+    u = (x - x.min()) / hexes['hex_width']
+    v = (y - y.min()) / hexes['hex_height']
+    centers = np.array([(i, j) for j in range(ny + 1) for i in range(nx + 1)]
+                       + [(i + 0.5, j + 0.5) for j in range(ny) for i in range(nx)])
+    nearest = ((u[:, None] - centers[:, 0]) ** 2
+               + 3 * (v[:, None] - centers[:, 1]) ** 2).argmin(axis=1)
+    expected = np.bincount(nearest, minlength=len(centers))
+    assert sorted(expected[expected > 0].tolist()) == sorted(hexes['counts'])
+
+
+def test_hex_gridsize_respects_budget(downsample_module):
+    for budget in (10, 100, 1500, 50000):
+        nx = downsample_module.hex_gridsize_for_budget(budget)
+        assert downsample_module._hex_cells(nx, downsample_module._hex_rows(nx)) <= budget
@@ -1,6 +1,8 @@
 """Tests for the pearson_correlation Flask backend."""
 import math
 
+import pytest
+
 
 def test_index_returns_200(pearson_client):
     resp = pearson_client.get('/')
@@ -19,7 +21,7 @@ def test_compute_positive_correlation(pearson_client):
     assert 'slope' in data
     assert 'intercept' in data
     assert 'point_details' in data
-    assert len(data['point_details']) == 3
+    assert len(data['point_details']['x']) == 3
 
 
 def test_compute_negative_correlation(pearson_client):
@@ -56,7 +58,7 @@ def test_compute_too_few_points(pearson_client):
 
 
 def test_compute_too_many_points(pearson_client):
-    points = [{'x': i, 'y': i * 2} for i in range(101)]
+    points = {'x': list(range(100001)), 'y': list(range(100001))}
     resp = pearson_client.post('/api/compute', json={'points': points})
     assert resp.status_code == 400
     assert resp.get_json()['success'] is False
@@ -89,3 +91,607 @@ def test_generate_invalid_type(pearson_client):
     })
     assert resp.status_code == 400
     assert resp.get_json()['success'] is False
+
+
+def test_compute_with_client_id_header(pearson_client):
+    resp = pearson_client.post('/api/compute', json={
+        'points': [{'x': 1, 'y': 2}, {'x': 2, 'y': 4}, {'x': 3, 'y': 7}],
+    }, headers={'X-Client-Id': 'abc'})
+    assert resp.status_code == 200
+    assert resp.get_json()['success'] is True
+
+
+STORE_HEADERS = {'X-Client-Id': 'store-test'}
+
+
+def test_point_store_matches_full_compute(pearson_client):
+    points = [{'x': 1, 'y': 2}, {'x': 2, 'y': 3.5}, {'x': 4, 'y': 3}]
+    resp = pearson_client.post('/api/points/reset', json={'points': points[:2]},
+                               headers=STORE_HEADERS)
+    data = resp.get_json()
+    assert data['success'] is True
+    assert data['ready'] is False
+
+    data = pearson_client.post('/api/points/add', json=points[2],
+                              headers=STORE_HEADERS).get_json()
+    assert data['ready'] is True
+    assert data['n'] == 3
+    full = pearson_client.post('/api/compute', json={'points': points}).get_json()
+    for key in ('r', 'slope', 'intercept', 'std_err', 'mean_x', 'mean_y'):
+        assert math.isclose(data[key], full[key], abs_tol=1e-6)
+    assert math.isclose(data['p_value'], full['p_value'], rel_tol=1e-6)
+
+
+def test_point_store_move_and_remove(pearson_client):
+    pearson_client.post('/api/points/reset', json={
+        'points': [{'x': 1, 'y': 1}, {'x': 2, 'y': 2}, {'x': 3, 'y': 3}, {'x': 4, 'y': 0}],
+    }, headers=STORE_HEADERS)
+    data = pearson_client.post('/api/points/move',
+                               json={'index': 3, 'x': 4, 'y': 4},
+                               headers=STORE_HEADERS).get_json()
+    assert math.isclose(data['r'], 1.0, abs_tol=1e-9)
+    data = pearson_client.post('/api/points/remove', json={'index': 0},
+                               headers=STORE_HEADERS).get_json()
+    assert data['n'] == 3
+    assert math.isclose(data['slope'], 1.0, abs_tol=1e-9)
+    state = pearson_client.get('/api/points', headers=STORE_HEADERS).get_json()
+    assert state['points'] == [{'x': 2, 'y': 2}, {'x': 3, 'y': 3}, {'x': 4, 'y': 4}]
+
+
+def test_point_store_invalid_index(pearson_client):
+    resp = pearson_client.post('/api/points/remove', json={'index': 5},
+                               headers=STORE_HEADERS)
+    assert resp.status_code == 400
+    assert resp.get_json()['success'] is False
+
+
+def test_point_store_requires_client_id(pearson_client):
+    for resp in (pearson_client.post('/api/points/add', json={'x': 1, 'y': 2}),
+                 pearson_client.get('/api/points'),
+                 pearson_client.get('/api/points/details')):
+        assert resp.status_code == 400
+        assert 'X-Client-Id' in resp.get_json()['error']
+
+
+def test_point_store_details_match_full_compute(pearson_client):
+    import numpy as np
+
+    points = [{'x': 1, 'y': 2}, {'x': 2, 'y': 3.5}, {'x': 4, 'y': 3}, {'x': 5, 'y': 6}]
+    pearson_client.post('/api/points/reset', json={'points': points}, headers=STORE_HEADERS)
+    data = pearson_client.get('/api/points/details?n_grid=5&x_min=0&x_max=6',
+                              headers=STORE_HEADERS).get_json()
+    full = pearson_client.post('/api/compute', json={
+        'points': points, 'details': 'all', 'influence': True,
+        'bands': {'n_grid': 5, 'x_min': 0, 'x_max': 6},
+    }).get_json()
+    assert data['success'] is True
+    assert data['n'] == 4
+    assert data['point_details'] == full['point_details']
+    assert data['influence'] == full['influence']
+    for key in ('fit', 'ci_lower', 'pi_upper'):
+        assert np.allclose(data['bands'][key], full['bands'][key])
+
+
+def test_point_store_drift_stays_small(pearson_correlation_module):
+    import numpy as np
+    rng = np.random.default_rng(0)
+    store = pearson_correlation_module.PointStore()
+    store.reset(rng.normal(1e4, 1, 50), rng.normal(-1e4, 1, 50))
+    for _ in range(1000):
+        i = int(rng.integers(0, 50))
+        store.move(i, float(rng.normal(1e4, 1)), float(rng.normal(-1e4, 1)))
+    summary = store.summary()
+    r_exact = np.corrcoef(store.xs, store.ys)[0, 1]
+    assert abs(summary['r'] - r_exact) < 1e-6
+
+
+def test_compute_columnar_matches_dict_form(pearson_client):
+    xs = [1, 2, 3, 4, 5]
+    ys = [2.1, 3.9, 6.2, 8.1, 9.7]
+    columnar = pearson_client.post('/api/compute', json={
+        'points': {'x': xs, 'y': ys},
+    }).get_json()
+    dicts = pearson_client.post('/api/compute', json={
+        'points': [{'x': x, 'y': y} for x, y in zip(xs, ys)],
+    }).get_json()
+    assert columnar['success'] is True
+    assert columnar['r'] == dicts['r']
+    assert columnar['slope'] == dicts['slope']
+
+
+def test_compute_columnar_error_names_point(pearson_client):
+    resp = pearson_client.post('/api/compute', json={
+        'points': {'x': [1, 2, 'abc', 4], 'y': [1, 2, 3, 4]},
+    })
+    assert resp.status_code == 400
+    assert resp.get_json()['error'].startswith('Punkt 3:')
+
+    resp = pearson_client.post('/api/compute', json={
+        'points': [{'x': 1, 'y': 1}, {'x': 2, 'y': None}, {'x': 3, 'y': 3}],
+    })
+    assert resp.get_json()['error'].startswith('Punkt 2:')
+
+    resp = pearson_client.post('/api/compute', json={
+        'points': [{'x': 1, 'y': 1}, {'x': 2, 'y': 2}, {'y': 3}],
+    })
+    assert resp.get_json()['error'] == "Punkt 3: wymagane pola 'x' i 'y'"
+
+
+def test_compute_columnar_length_mismatch(pearson_client):
+    resp = pearson_client.post('/api/compute', json={
+        'points': {'x': [1, 2, 3], 'y': [1, 2]},
+    })
+    assert resp.status_code == 400
+
+
+def test_compute_large_columnar_payload(pearson_client):
+    import numpy as np
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=20000)
+    y = 0.5 * x + rng.normal(size=20000)
+    resp = pearson_client.post('/api/compute', json={
+        'points': {'x': x.tolist(), 'y': y.tolist()},
+    })
+    assert resp.status_code == 200
+    assert abs(resp.get_json()['r'] - np.corrcoef(x, y)[0, 1]) < 1e-6
+
+
+def test_compute_details_modes(pearson_client):
+    points = {'x': list(range(250)), 'y': [i % 7 for i in range(250)]}
+    data = pearson_client.post('/api/compute', json={'points': points}).get_json()
+    assert data['details'] == {'mode': 'first_k', 'offset': 0, 'count': 100, 'total': 250}
+    assert len(data['point_details']['dx']) == 100
+
+    data = pearson_client.post('/api/compute', json={
+        'points': points, 'details_k': 100, 'details_offset': 200,
+    }).get_json()
+    assert data['details']['count'] == 50
+    assert data['point_details']['x'][0] == 200
+
+    data = pearson_client.post('/api/compute', json={'points': points, 'details': 'none'}).get_json()
+    assert data['point_details'] is None
+
+    data = pearson_client.post('/api/compute', json={'points': points, 'details': 'all'}).get_json()
+    assert len(data['point_details']['product']) == 250
+
+
+def test_compute_details_invalid_mode(pearson_client):
+    resp = pearson_client.post('/api/compute', json={
+        'points': [{'x': 1, 'y': 2}, {'x': 2, 'y': 4}, {'x': 3, 'y': 7}],
+        'details': 'some',
+    })
+    assert resp.status_code == 400
+
+
+def test_sanitize_columns_replaces_non_finite(pearson_correlation_module):
+    import numpy as np
+    out = pearson_correlation_module._sanitize_columns({
+        'a': np.array([1.0, np.nan]), 'b': np.array([np.inf, 2.0]),
+    })
+    assert out == {'a': [1.0, None], 'b': [None, 2.0]}
+
+
+def test_bootstrap_interval_contains_r(pearson_client):
+    points = {'x': [1, 2, 3, 4, 5, 6, 7, 8], 'y': [2, 1, 4, 3, 6, 5, 8, 9]}
+    resp = pearson_client.post('/api/bootstrap', json={
+        'points': points, 'n_resamples': 2000, 'seed': 7,
+    })
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['success'] is True
+    assert data['percentile']['lower'] < data['r'] < data['percentile']['upper']
+    assert data['bca']['lower'] < data['bca']['upper'] <= 1
+    assert sum(data['histogram']['counts']) == data['n_valid']
+
+
+def test_bootstrap_reproducible_with_seed(pearson_correlation_module):
+    import numpy as np
+    mod = pearson_correlation_module
+    rng = np.random.default_rng(3)
+    x = rng.normal(size=50)
+    y = x + rng.normal(size=50)
+    a = mod._bootstrap_correlation(x, y, 3000, seed=11, workers=1)
+    b = mod._bootstrap_correlation(x, y, 3000, seed=11, workers=1)
+    assert a == b
+
+
+def test_bootstrap_bca_matches_scipy(pearson_correlation_module):
+    import numpy as np
+    from scipy import stats
+    rng = np.random.default_rng(5)
+    x = rng.normal(size=30)
+    y = 0.6 * x + rng.normal(size=30)
+    ours = pearson_correlation_module._bootstrap_correlation(x, y, 20000, seed=1)
+    ref = stats.bootstrap(
+        (x, y), lambda a, b, axis=-1: stats.pearsonr(a, b, axis=axis)[0],
+        paired=True, vectorized=True, n_resamples=20000, method='BCa', random_state=1,
+    ).confidence_interval
+    assert abs(ours['bca']['lower'] - ref.low) < 0.02
+    assert abs(ours['bca']['upper'] - ref.high) < 0.02
+
+
+def test_bootstrap_invalid_resamples(pearson_client):
+    resp = pearson_client.post('/api/bootstrap', json={
+        'points': [{'x': 1, 'y': 2}, {'x': 2, 'y': 4}, {'x': 3, 'y': 7}],
+        'n_resamples': 5,
+    })
+    assert resp.status_code == 400
+
+
+def test_bootstrap_rejects_too_much_work(pearson_client):
+    n = 30000
+    resp = pearson_client.post('/api/bootstrap', json={
+        'points': {'x': list(range(n)), 'y': [i % 7 for i in range(n)]},
+        'n_resamples': 10000,
+    })
+    assert resp.status_code == 400
+    assert 'nie moze przekraczac' in resp.get_json()['error']
+
+
+def test_permutation_exact_matches_scipy(pearson_correlation_module):
+    import numpy as np
+    from scipy import stats
+    x = np.arange(6.0)
+    y = np.array([1.0, 3.0, 2.0, 5.0, 4.0, 6.0])
+    result = pearson_correlation_module._permutation_test(x, y, 0)
+    ref = stats.permutation_test((y,), lambda a: stats.pearsonr(x, a)[0],
+                                 permutation_type='pairings')
+    assert result['method'] == 'exact'
+    assert result['n_permutations'] == 720
+    assert result['p_value'] == pytest.approx(ref.pvalue)
+    assert sum(result['histogram']['counts']) == 720
+
+
+def test_compute_with_permutations(pearson_client):
+    x = [float(i) for i in range(20)]
+    y = [(i * 7) % 11 + 0.5 * i for i in range(20)]
+    resp = pearson_client.post('/api/compute', json={
+        'points': {'x': x, 'y': y}, 'permutations': 5000, 'seed': 1,
+    })
+    data = resp.get_json()
+    perm = data['permutation']
+    assert perm['method'] == 'monte_carlo'
+    assert perm['observed_r'] == pytest.approx(data['r'], abs=1e-6)
+    assert abs(perm['p_value'] - data['p_value']) < 0.02
+    assert 'permutation' not in pearson_client.post(
+        '/api/compute', json={'points': {'x': x, 'y': y}}).get_json()
+
+
+def test_compute_permutations_out_of_range(pearson_client):
+    resp = pearson_client.post('/api/compute', json={
+        'points': [{'x': 1, 'y': 2}, {'x': 2, 'y': 4}, {'x': 3, 'y': 7}],
+        'permutations': 10 ** 7,
+    })
+    assert resp.status_code == 400
+
+
+def test_compute_permutations_too_much_work(pearson_client):
+    n = 2000
+    resp = pearson_client.post('/api/compute', json={
+        'points': {'x': list(range(n)), 'y': [i % 7 for i in range(n)]},
+        'permutations': 200000,
+    })
+    assert resp.status_code == 400
+    assert 'nie moze przekraczac' in resp.get_json()['error']
+
+
+def test_influence_matches_refits(pearson_correlation_module):
+    import numpy as np
+    from scipy import stats
+    rng = np.random.default_rng(0)
+    x = np.append(rng.normal(5, 1, 20), 15)
+    y = np.append(rng.normal(5, 1, 20), 15)
+    diag = pearson_correlation_module._influence_diagnostics(x, y)
+
+    n = len(x)
+    X = np.column_stack([np.ones(n), x])
+    beta = np.linalg.lstsq(X, y, rcond=None)[0]
+    s2 = np.sum((y - X @ beta) ** 2) / (n - 2)
+    for i in [0, 7, n - 1]:
+        xi, yi = np.delete(x, i), np.delete(y, i)
+        fit = stats.linregress(xi, yi)
+        assert diag['loo_r'][i] == pytest.approx(fit.rvalue, abs=1e-10)
+        assert diag['loo_slope'][i] == pytest.approx(fit.slope, abs=1e-10)
+        shift = X @ (beta - [fit.intercept, fit.slope])
+        assert diag['cooks_d'][i] == pytest.approx(shift @ shift / (2 * s2), rel=1e-8)
+    assert np.argmax(np.abs(diag['delta_r'])) == n - 1
+
+
+def test_compute_influence_flags_outlier(pearson_client):
+    x = [4.1, 5.2, 6.0, 4.8, 5.5, 4.4, 5.9, 5.1, 4.7, 5.3, 15.0]
+    y = [5.3, 4.2, 5.1, 5.9, 4.6, 4.9, 5.4, 4.1, 5.6, 5.0, 15.0]
+    data = pearson_client.post('/api/compute', json={
+        'points': {'x': x, 'y': y}, 'influence': True,
+    }).get_json()
+    infl = data['influence']
+    assert infl['most_influential'] == 10
+    assert infl['n_high_cooks_d'] >= 1
+    assert len(infl['columns']['cooks_d']) == 11
+    assert infl['columns']['dfbetas_slope'][10] is not None
+
+
+def _upload(client, content, **form):
+    import io
+    form['file'] = (io.BytesIO(content), 'data.csv')
+    return client.post('/api/upload', data=form, content_type='multipart/form-data')
+
+
+def test_upload_matches_in_memory_stats(pearson_client, pearson_correlation_module, monkeypatch):
+    import numpy as np
+    from scipy import stats
+    monkeypatch.setattr(pearson_correlation_module, 'UPLOAD_CHUNK_ROWS', 1000)
+    rng = np.random.default_rng(2)
+    x = rng.normal(1e6, 1, 5500)
+    y = 0.5 * (x - 1e6) + rng.normal(size=5500)
+    lines = ['x,y'] + [f'{a!r},{b!r}' for a, b in zip(x.tolist(), y.tolist())]
+    data = _upload(pearson_client, '\n'.join(lines).encode(), sample_size='300', seed='1').get_json()
+    assert data['success'] is True
+    assert data['n'] == 5500
+    assert data['r'] == pytest.approx(stats.pearsonr(x, y)[0], abs=1e-6)
+    assert data['slope'] == pytest.approx(stats.linregress(x, y).slope, abs=1e-6)
+    assert data['variables'] == ['x', 'y']
+    assert len(data['sample']['x']) == 300
+    assert set(data['sample']['x']) <= set(x.tolist())
+
+    again = pearson_client.get(f"/api/upload/{data['dataset_id']}?sample_size=50").get_json()
+    assert again['r'] == data['r']
+    assert len(again['sample']['y']) == 50
+
+
+def test_upload_skips_missing_and_reports_bad_row(pearson_client):
+    data = _upload(pearson_client, b'a;b\n1;2\n2;\n3;5\n4;4\n5;nan\n', delimiter=';').get_json()
+    assert data['n'] == 3
+    assert data['skipped_rows'] == 2
+
+    resp = _upload(pearson_client, b'x,y\n1,2\n2,abc\n3,4\n')
+    assert resp.status_code == 400
+    assert 'Rekord 2' in resp.get_json()['error']
+
+
+def test_upload_error_reports_record_number(pearson_correlation_module):
+    # Pole w cudzyslowie na dwoch liniach i pusta linia - numer rekordu, nie linii
+    lines = ['"1\n', '",2\n', '\n', '2,3\n', '4,x\n']
+    with pytest.raises(ValueError, match='Rekord 12:'):
+        pearson_correlation_module._parse_csv_chunk(lines, ',', 10)
+
+
+def test_upload_unknown_dataset(pearson_client):
+    resp = pearson_client.get('/api/upload/nope')
+    assert resp.status_code == 400
+
+
+def test_reservoir_update_is_uniform(pearson_correlation_module):
+    import numpy as np
+    rng = np.random.default_rng(0)
+    hits = np.zeros(100)
+    for _ in range(400):
+        reservoir = np.empty((10, 2))
+        seen = 0
+        for start in range(0, 100, 30):
+            chunk = np.arange(start, min(start + 30, 100), dtype=float).repeat(2).reshape(-1, 2)
+            seen = pearson_correlation_module._reservoir_update(reservoir, seen, chunk, rng)
+        assert len(np.unique(reservoir[:, 0])) == 10
+        hits[reservoir[:, 0].astype(int)] += 1
+    # Kazdy element powinien trafic do probki ~40 razy (10/100 * 400)
+    assert hits[:30].mean() == pytest.approx(40, abs=8)
+    assert hits[70:].mean() == pytest.approx(40, abs=8)
+
+
+def test_upload_hash_lines_are_records(pearson_client, pearson_correlation_module):
+    resp = _upload(pearson_client, b'x,y\n1,2\n# c\n2,3\n3,5\n')
+    assert resp.status_code == 400
+    assert 'Rekord 2' in resp.get_json()['error']
+    # Obie sciezki parsera traktuja '#' tak samo
+    with pytest.raises(ValueError, match='Rekord 2:'):
+        pearson_correlation_module._parse_csv_chunk(['1,2\n', '#3,4\n'], ',', 1)
+
+
+def test_reservoir_update_keeps_last_duplicate(pearson_correlation_module):
+    import numpy as np
+
+    class FixedDraws:
+        def integers(self, low, high):
+            return np.array([1, 0, 1, 5, 1, 0])[:len(high)]
+
+    reservoir = np.zeros((3, 2))
+    chunk = np.arange(10.0, 16.0).repeat(2).reshape(-1, 2)
+    seen = pearson_correlation_module._reservoir_update(reservoir, 3, chunk, FixedDraws())
+    assert seen == 9
+    # Pozycja 1: ostatni z elementow 10, 12, 14; pozycja 0: 15; 13 poza probka
+    assert reservoir[:, 0].tolist() == [15.0, 14.0, 0.0]
+
+
+def test_compute_display_thin_and_grid(pearson_client):
+    import numpy as np
+    rng = np.random.default_rng(4)
+    x = rng.normal(size=20000)
+    y = x + rng.normal(size=20000)
+    points = {'x': x.tolist(), 'y': y.tolist()}
+    full = pearson_client.post('/api/compute', json={'points': points, 'details': 'none'}).get_json()
+    assert 'display' not in full
+
+    thin = pearson_client.post('/api/compute', json={
+        'points': points, 'details': 'none', 'display': 'thin', 'point_budget': 500,
+    }).get_json()
+    assert thin['r'] == full['r']
+    assert thin['display']['n_total'] == 20000
+    assert len(thin['display']['indices']) <= 500
+
+    grid = pearson_client.post('/api/compute', json={
+        'points': points, 'details': 'none', 'display': 'grid', 'point_budget': 400,
+    }).get_json()['display']
+    assert len(grid['counts']) == 20
+    assert sum(map(sum, grid['counts'])) == 20000
+
+
+def test_compute_display_invalid_budget(pearson_client):
+    resp = pearson_client.post('/api/compute', json={
+        'points': [{'x': 1, 'y': 2}, {'x': 2, 'y': 4}, {'x': 3, 'y': 7}],
+        'display': 'thin', 'point_budget': 1,
+    })
+    assert resp.status_code == 400
+
+
+def _reference_bands(x, y, grid, confidence=0.95):
+    import numpy as np
+    from scipy import stats
+    fit = stats.linregress(x, y)
+    n = len(x)
+    resid = y - (fit.intercept + fit.slope * x)
+    s = np.sqrt(resid @ resid / (n - 2))
+    t = stats.t.ppf((1 + confidence) / 2, n - 2)
+    lever = 1 / n + (grid - x.mean()) ** 2 / np.sum((x - x.mean()) ** 2)
+    yhat = fit.intercept + fit.slope * grid
+    return yhat - t * s * np.sqrt(lever), yhat + t * s * np.sqrt(1 + lever)
+
+
+def test_compute_bands_match_reference_and_cache(pearson_client):
+    import numpy as np
+    x = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    y = np.array([2.0, 1.0, 4.0, 3.0, 7.0, 6.0])
+    body = {'points': {'x': x.tolist(), 'y': y.tolist()},
+            'bands': {'n_grid': 5, 'x_min': 0, 'x_max': 8, 'confidence': 0.9}}
+    bands = pearson_client.post('/api/compute', json=body).get_json()['bands']
+    ci_lower, pi_upper = _reference_bands(x, y, np.linspace(0, 8, 5), 0.9)
+    assert np.allclose(bands['ci_lower'], ci_lower)
+    assert np.allclose(bands['pi_upper'], pi_upper)
+    assert bands['cached'] is False
+    assert pearson_client.post('/api/compute', json=body).get_json()['bands']['cached'] is True
+
+
+def test_point_store_bands_cached_per_version(pearson_client):
+    import numpy as np
+    headers = {'X-Client-Id': 'bands'}
+    x = np.array([1e6 + 1, 1e6 + 2, 1e6 + 3, 1e6 + 4, 1e6 + 5])
+    y = np.array([3.0, 5.0, 4.0, 8.0, 9.0])
+    pearson_client.post('/api/points/reset', json={'points': {'x': x.tolist(), 'y': y.tolist()}},
+                        headers=headers)
+    url = f'/api/points/bands?n_grid=4&x_min={1e6}&x_max={1e6 + 6}'
+    first = pearson_client.get(url, headers=headers).get_json()
+    _, pi_upper = _reference_bands(x, y, np.linspace(1e6, 1e6 + 6, 4))
+    assert np.allclose(first['pi_upper'], pi_upper, atol=1e-6)
+    assert first['cached'] is False
+    assert pearson_client.get(url, headers=headers).get_json()['cached'] is True
+
+    pearson_client.post('/api/points/add', json={'x': 1e6 + 6, 'y': 2.0}, headers=headers)
+    moved = pearson_client.get(url, headers=headers).get_json()
+    assert moved['cached'] is False
+    assert moved['version'] == first['version'] + 1
+
+
+def test_point_store_bands_needs_points(pearson_client):
+    resp = pearson_client.get('/api/points/bands', headers={'X-Client-Id': 'empty'})
+    assert resp.status_code == 400
+
+
+def test_rank_correlations_match_scipy(pearson_correlation_module):
+    import numpy as np
+    from scipy import stats
+    rng = np.random.default_rng(3)
+    for n, decimals in [(7, 6), (60, 6), (500, 0)]:
+        x = np.round(rng.normal(size=n), decimals)
+        y = np.round(x + rng.normal(size=n), decimals)
+        res = pearson_correlation_module._rank_correlations(x, y)
+        rho, p_rho = stats.spearmanr(x, y)
+        tau, p_tau = stats.kendalltau(x, y, method='asymptotic')
+        assert math.isclose(res['spearman']['rho'], rho, abs_tol=1e-6)
+        assert math.isclose(res['spearman']['p_value'], p_rho, rel_tol=1e-9, abs_tol=1e-300)
+        assert math.isclose(res['kendall']['tau'], tau, abs_tol=1e-6)
+        assert math.isclose(res['kendall']['p_value'], p_tau, rel_tol=1e-9, abs_tol=1e-300)
+
+
+def test_count_inversions_matches_brute_force(pearson_correlation_module):
+    import numpy as np
+    rng = np.random.default_rng(4)
+    for n in [0, 1, 2, 5, 33, 100]:
+        a = rng.integers(0, max(n // 3, 1), size=n)
+        brute = sum(int(a[i] > a[j]) for i in range(n) for j in range(i + 1, n))
+        assert pearson_correlation_module._count_inversions(a) == brute
+
+
+def test_compute_returns_rank_correlations(pearson_client):
+    points = [{'x': 1, 'y': 1}, {'x': 2, 'y': 4}, {'x': 3, 'y': 9}, {'x': 4, 'y': 100}]
+    data = pearson_client.post('/api/compute', json={'points': points}).get_json()
+    assert data['spearman']['rho'] == 1.0
+    assert data['kendall']['tau'] == 1.0
+    assert data['r'] < 1.0
+
+
+def test_point_store_details_are_paginated(pearson_client):
+    n = 250
+    pearson_client.post('/api/points/reset', json={'points': {
+        'x': list(range(n)), 'y': [(i * 7) % 13 for i in range(n)]}}, headers=STORE_HEADERS)
+    data = pearson_client.get('/api/points/details', headers=STORE_HEADERS).get_json()
+    assert data['details'] == {'mode': 'first_k', 'offset': 0, 'count': 100, 'total': n}
+    assert len(data['point_details']['x']) == len(data['influence']['columns']['loo_r']) == 100
+
+    page = pearson_client.get('/api/points/details?details_k=20&details_offset=240',
+                              headers=STORE_HEADERS).get_json()
+    assert page['point_details']['x'] == list(range(240, 250))
+    none = pearson_client.get('/api/points/details?details=none',
+                              headers=STORE_HEADERS).get_json()
+    assert none['point_details'] is None
+    resp = pearson_client.get('/api/points/details?details=bogus', headers=STORE_HEADERS)
+    assert resp.status_code == 400
+
+
+def test_point_store_ranks_served_by_details(pearson_client, pearson_correlation_module):
+    import numpy as np
+    rng = np.random.default_rng(5)
+    x, y = np.round(rng.normal(size=(2, 40)), 1)
+    pearson_client.post('/api/points/reset', json={'points': {'x': x[:-1].tolist(),
+                                                              'y': y[:-1].tolist()}},
+                        headers=STORE_HEADERS)
+    data = pearson_client.post('/api/points/add', json={'x': x[-1], 'y': y[-1]},
+                               headers=STORE_HEADERS).get_json()
+    # Zmiana zbioru nie przechodzi po wszystkich punktach
+    assert 'spearman' not in data and 'kendall' not in data
+    details = pearson_client.get('/api/points/details', headers=STORE_HEADERS).get_json()
+    expected = pearson_correlation_module._rank_correlations(x, y)
+    assert details['spearman'] == expected['spearman']
+    assert details['kendall'] == expected['kendall']
+
+
+def test_matrix_matches_pairwise(pearson_client):
+    import numpy as np
+    from scipy import stats
+    rng = np.random.default_rng(6)
+    a = rng.normal(size=50)
+    columns = {'a': a, 'b': -a + 0.1 * rng.normal(size=50), 'c': rng.normal(size=50),
+               'd': a + 0.2 * rng.normal(size=50)}
+    resp = pearson_client.post('/api/matrix', json={
+        'columns': {k: v.tolist() for k, v in columns.items()}, 'cluster': 'average'})
+    data = resp.get_json()
+    assert data['success'] is True
+    assert data['names'] == ['a', 'b', 'c', 'd']
+    assert (data['n'], data['p']) == (50, 4)
+    ref = stats.pearsonr(columns['a'], columns['c'])
+    assert math.isclose(data['r'][0][2], ref.statistic, abs_tol=1e-6)
+    assert math.isclose(data['p_values'][2][0], ref.pvalue, rel_tol=1e-9)
+    assert data['r'][1][1] == 1.0
+    # a, b, d sa silnie (takze ujemnie) skorelowane - c laduje na brzegu kolejnosci
+    assert sorted(data['order']) == [0, 1, 2, 3]
+    assert data['order'].index(2) in (0, 3)
+
+
+def test_matrix_chunking_does_not_change_result(pearson_correlation_module):
+    import numpy as np
+    rng = np.random.default_rng(7)
+    data = rng.normal(size=(5, 1000)) + 100
+    r_chunked, p_chunked = pearson_correlation_module._correlation_matrix(data, chunk_rows=64)
+    assert np.allclose(r_chunked, np.corrcoef(data), atol=1e-12)
+    r_single, _ = pearson_correlation_module._correlation_matrix(data, chunk_rows=10 ** 6)
+    assert np.allclose(r_chunked, r_single, atol=1e-12)
+
+
+@pytest.mark.parametrize('payload, message', [
+    ({'columns': {'a': [1, 2, 3]}}, 'kolumn'),
+    ({'columns': {'a': [1, 2, 3], 'b': [1, 2]}}, 'dlugosc'),
+    ({'columns': {'a': [1, 2, 3], 'b': [1, 'x', 2]}}, "Kolumna 'b'"),
+    ({'columns': {'a': [1, 2, 3], 'b': [5, 5, 5]}}, 'zerowa wariancje'),
+    ({'columns': {'a': [1, 2, 3], 'b': [1, 3, 2]}, 'cluster': 'ward'}, 'grupowania'),
+])
+def test_matrix_invalid_input(pearson_client, payload, message):
+    resp = pearson_client.post('/api/matrix', json=payload)
+    assert resp.status_code == 400
+    assert message in resp.get_json()['error']
@@ -7,12 +7,17 @@ do blednych wnioskow statystycznych.
 """
 
 from flask import Flask, render_template, jsonify, request
+from collections import OrderedDict
 import numpy as np
-from scipy import stats
 import os
 import sys
+import threading
+import time
 
+from common.downsample import (bins_for_budget, grid_counts, hex_gridsize_for_budget,
+                               hexbin_counts, thin_indices)
 from common.flask_app import register_common_static
+from common.moments import correlation_stats, regression_from_moments
 
 
 def get_bundle_dir():
@@ -31,6 +36,34 @@ app = Flask(__name__,
 register_common_static(app, bundle_dir if getattr(sys, 'frozen', False) else None)
 
 
+# Redukcja punktow na wykresie (statystyki zawsze z pelnych danych)
+DISPLAY_MODES = ('all', 'thin', 'grid', 'hexbin')
+DISPLAY_DEFAULT_BUDGET = 2000
+DISPLAY_MAX_BUDGET = 50000
+
+# Wielkosc populacji i pamiec podreczna wygenerowanych scenariuszy
+POPULATION_DEFAULT = 300
+POPULATION_MIN = 30
+POPULATION_MAX = 1000000
+SCENARIO_CACHE_MAX_POINTS = 5000000    # suma n populacji w pamieci (~18 B na punkt)
+
+# Zaznaczanie regionu po stronie serwera
+SELECTION_TYPES = ('rectangle', 'lasso', 'threshold')
+SELECTION_MAX_VERTICES = 2000
+SELECTION_TARGETS = ('population', 'sample')
+
+# Badanie replikacyjne: R par populacja/proba naraz
+REPLICATION_DEFAULT = 1000
+REPLICATION_MAX = 10000
+REPLICATION_MAX_ELEMENTS = 100000000    # R * n - limit pracy jednego zapytania
+REPLICATION_CHUNK_ELEMENTS = 2000000    # tyle punktow (R_chunk * n) w pamieci naraz
+REPLICATION_HIST_BINS = 40
+
+_scenario_cache = OrderedDict()     # (scenario_id, seed, n) -> dane i statystyki
+_scenario_cache_points = 0          # suma n populacji w _scenario_cache
+_scenario_cache_lock = threading.Lock()
+
+
 # ── Definicje scenariuszy ─────────────────────────────────────────
 
 SCENARIOS = {
@@ -168,8 +201,14 @@ def _compute_stats(x, y):
             'n': n,
         }
 
-    r_val, p_val = stats.pearsonr(x, y)
-    slope, intercept, _, _, _ = stats.linregress(x, y)
+    # Jedno przejscie po danych zamiast pearsonr + linregress
+    return _stats_response(correlation_stats(x, y), n)
+
+
+def _stats_response(st, n):
+    """Zaokragla wynik correlation_stats / regression_from_moments do odpowiedzi API."""
+    r_val, p_val = st['r'], st['p_value']
+    slope, intercept = st['slope'], st['intercept']
 
     return {
         'r': round(safe_float(r_val), 4) if safe_float(r_val) is not None else 0,
@@ -180,166 +219,480 @@ def _compute_stats(x, y):
     }
 
 
-def _points_to_list(x, y):
-    """Konwertuje numpy arrays na liste slownikow [{x, y}, ...]."""
-    return [
-        {'x': round(float(xi), 2), 'y': round(float(yi), 2)}
-        for xi, yi in zip(x, y)
-    ]
+def _points_to_columns(x, y):
+    """Konwertuje numpy arrays na kolumny {x: [...], y: [...]} zaokraglone wektorowo."""
+    return {'x': np.round(x, 2).tolist(), 'y': np.round(y, 2).tolist()}
 
 
-# ── Generatory scenariuszy ────────────────────────────────────────
-
-def _generate_restriction_of_range(seed=None):
-    """
-    Scenariusz: ograniczenie zakresu.
-    Populacja: dochod vs szczescie, r~0.65.
-    Bias: tylko osoby o wysokich dochodach (x > 75. percentyl).
+def _validate_display_params(data):
     """
-    rng = np.random.default_rng(seed)
-    n = 300
+    Waliduje parametry redukcji punktow: display, point_budget.
 
-    # Populacja: dochod (20-120 tys) vs szczescie (1-10)
-    # Target r ~ 0.65: sd_x=20, sd_y=1.5, cov = 0.65*20*1.5 = 19.5
-    mean = [60, 5.5]
-    cov = [[400, 19.5], [19.5, 2.25]]
-    data = rng.multivariate_normal(mean, cov, size=n)
+    Returns:
+        tuple: (mode, budget)
+    """
+    mode = data.get('display', 'all')
+    if mode not in DISPLAY_MODES:
+        raise ValueError(f"Parametr 'display' musi byc jednym z: {', '.join(DISPLAY_MODES)}")
+    budget = int(data.get('point_budget', DISPLAY_DEFAULT_BUDGET))
+    if budget < 10 or budget > DISPLAY_MAX_BUDGET:
+        raise ValueError(f"point_budget musi byc miedzy 10 a {DISPLAY_MAX_BUDGET}")
+    return mode, budget
 
-    x_pop = np.clip(data[:, 0], 15, 130)
-    y_pop = np.clip(data[:, 1], 1, 10)
 
-    # Bias: tylko wysokie dochody (top 25%)
-    threshold = np.percentile(x_pop, 75)
-    mask = x_pop >= threshold
+def _display_points(x, y, mode, budget, groups=None, ranges=None):
+    """
+    Punkty do wykresu wg trybu redukcji.
 
-    if np.sum(mask) < 3:
-        mask[:10] = True
+    Args:
+        mode: 'all' (wszystkie), 'thin' (przerzedzenie do budget punktow),
+              'grid' (liczebnosci w siatce zamiast punktow),
+              'hexbin' (liczebnosci w szesciokatach zamiast punktow)
+        groups: numery grup punktow (przerzedzane razem z punktami)
+        ranges: ((x_min, x_max), (y_min, y_max)) siatki - wspolne dla populacji i proby
 
-    x_sample = x_pop[mask]
-    y_sample = y_pop[mask]
+    Returns:
+        tuple: (points, groups, display) - display None dla trybu 'all'
+    """
+    if mode == 'all':
+        return _points_to_columns(x, y), groups, None
+    if mode == 'grid':
+        x_range, y_range = ranges if ranges is not None else (None, None)
+        density = grid_counts(x, y, bins_for_budget(budget), x_range, y_range)
+        return None, None, dict(mode='grid', n_total=len(x), **density)
+    if mode == 'hexbin':
+        x_range, y_range = ranges if ranges is not None else (None, None)
+        density = hexbin_counts(x, y, hex_gridsize_for_budget(budget), x_range, y_range)
+        return None, None, dict(mode='hexbin', n_total=len(x), **density)
+
+    idx = thin_indices(x, y, budget)
+    if groups is not None:
+        groups = groups[idx]
+    display = {'mode': 'thin', 'n_total': len(x), 'n_shown': len(idx)}
+    return _points_to_columns(x[idx], y[idx]), groups, display
+
+
+def _assemble_result(scenario_id, data, display='all', point_budget=DISPLAY_DEFAULT_BUDGET):
+    """
+    Sklada odpowiedz /api/generate: statystyki z pelnych danych, punkty wg trybu.
 
-    scenario = SCENARIOS['restriction_of_range']
-    return {
+    Args:
+        data: wynik _scenario_data (populacja, maska proby + statystyki)
+    """
+    scenario = SCENARIOS[scenario_id]
+    x_pop, y_pop, mask = data['x_pop'], data['y_pop'], data['mask']
+    ranges = ((float(x_pop.min()), float(x_pop.max())),
+              (float(y_pop.min()), float(y_pop.max())))
+    pop_points, pop_codes, pop_display = _display_points(
+        x_pop, y_pop, display, point_budget, data['codes'], ranges)
+    sample_points, _, sample_display = _display_points(
+        x_pop[mask], y_pop[mask], display, point_budget, None, ranges)
+    # Nazwy grup tylko dla punktow wysylanych w odpowiedzi
+    pop_groups = data['names'][pop_codes].tolist() if pop_codes is not None else None
+
+    result = {
         'scenario': {k: v for k, v in scenario.items() if k != 'bias_description'},
         'population': {
-            'points': _points_to_list(x_pop, y_pop),
-            'stats': _compute_stats(x_pop, y_pop),
-            'groups': None,
+            'points': pop_points,
+            'stats': dict(data['pop_stats']),
+            'group_stats': data['group_stats'],
+            'groups': pop_groups,
         },
         'sample': {
-            'points': _points_to_list(x_sample, y_sample),
-            'stats': _compute_stats(x_sample, y_sample),
+            'points': sample_points,
+            'stats': dict(data['sample_stats']),
             'bias_description': scenario['bias_description'],
         },
     }
+    if pop_display is not None:
+        result['population']['display'] = pop_display
+        result['sample']['display'] = sample_display
+    return result
+
+
+def _selection_coords(values, name, min_len, max_len):
+    """Lista wspolrzednych zaznaczenia jako numpy array liczb skonczonych."""
+    if not isinstance(values, list) or not min_len <= len(values) <= max_len:
+        raise ValueError(f"Pole '{name}' musi byc lista {min_len}-{max_len} liczb")
+    try:
+        arr = np.asarray(values, dtype=float)
+    except (ValueError, TypeError):
+        raise ValueError(f"Pole '{name}' musi zawierac liczby")
+    if arr.ndim != 1 or not np.all(np.isfinite(arr)):
+        raise ValueError(f"Pole '{name}' musi zawierac liczby skonczone")
+    return arr
 
 
-def _generate_truncation_bias(seed=None):
+def _validate_selection(selection):
     """
-    Scenariusz: obcinanie proby.
-    Populacja: godziny nauki vs wynik egzaminu, r~0.7.
-    Bias: tylko studenci z wynikiem > 50 (zdali).
+    Waliduje ksztalt zaznaczenia.
+
+    Args:
+        selection: {type: 'rectangle', x: [x0, x1], y: [y0, y1]}
+                   | {type: 'lasso', x: [...], y: [...]} (wierzcholki wielokata)
+                   | {type: 'threshold', axis: 'x' | 'y', min: float?, max: float?}
+
+    Returns:
+        dict: zwalidowane zaznaczenie (wspolrzedne jako numpy arrays)
     """
-    rng = np.random.default_rng(seed)
-    n = 300
+    if not isinstance(selection, dict):
+        raise ValueError("Pole 'selection' musi byc obiektem")
+    kind = selection.get('type')
+    if kind not in SELECTION_TYPES:
+        raise ValueError(f"Typ zaznaczenia musi byc jednym z: {', '.join(SELECTION_TYPES)}")
+
+    if kind == 'rectangle':
+        return {'type': kind,
+                'x': np.sort(_selection_coords(selection.get('x'), 'x', 2, 2)),
+                'y': np.sort(_selection_coords(selection.get('y'), 'y', 2, 2))}
+    if kind == 'lasso':
+        px = _selection_coords(selection.get('x'), 'x', 3, SELECTION_MAX_VERTICES)
+        py = _selection_coords(selection.get('y'), 'y', 3, SELECTION_MAX_VERTICES)
+        if len(px) != len(py):
+            raise ValueError("Wierzcholki lasso: 'x' i 'y' musza miec te sama dlugosc")
+        return {'type': kind, 'x': px, 'y': py}
+
+    axis = selection.get('axis', 'x')
+    if axis not in ('x', 'y'):
+        raise ValueError("Os progu musi byc 'x' lub 'y'")
+    bounds = {}
+    for name in ('min', 'max'):
+        value = selection.get(name)
+        if value is not None:
+            value = safe_float(value)
+            if value is None:
+                raise ValueError(f"Prog '{name}' musi byc liczba skonczona")
+        bounds[name] = value
+    if bounds['min'] is None and bounds['max'] is None:
+        raise ValueError("Prog wymaga co najmniej jednej granicy: 'min' lub 'max'")
+    return {'type': kind, 'axis': axis, **bounds}
+
+
+def _points_in_polygon(x, y, px, py):
+    """
+    Maska punktow wewnatrz wielokata (regula parzystosci, promien w prawo).
+
+    Petla idzie po krawedziach (O(wierzcholki)), a kazda krawedz jest
+    sprawdzana wektorowo dla wszystkich punktow z prostokata otaczajacego.
+    """
+    inside = np.zeros(len(x), dtype=bool)
+    candidates = np.flatnonzero((x >= px.min()) & (x <= px.max())
+                                & (y >= py.min()) & (y <= py.max()))
+    cx, cy = x[candidates], y[candidates]
+    crossings = np.zeros(len(candidates), dtype=bool)
+    for x0, y0, x1, y1 in zip(px, py, np.roll(px, -1), np.roll(py, -1)):
+        if y0 == y1:
+            continue
+        spans = (y0 > cy) != (y1 > cy)
+        x_cross = x0 + (cy - y0) * (x1 - x0) / (y1 - y0)
+        crossings ^= spans & (cx < x_cross)
+    inside[candidates] = crossings
+    return inside
+
+
+def _selection_mask(x, y, selection):
+    """Maska punktow (x, y) wybranych przez zwalidowane zaznaczenie."""
+    kind = selection['type']
+    if kind == 'rectangle':
+        (x0, x1), (y0, y1) = selection['x'], selection['y']
+        return (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+    if kind == 'lasso':
+        return _points_in_polygon(x, y, selection['x'], selection['y'])
+    values = x if selection['axis'] == 'x' else y
+    mask = np.ones(len(values), dtype=bool)
+    if selection['min'] is not None:
+        mask &= values >= selection['min']
+    if selection['max'] is not None:
+        mask &= values <= selection['max']
+    return mask
+
+
+# ── Specyfikacje scenariuszy ──────────────────────────────────────
+#
+# Kazdy scenariusz to deklaratywny opis: grupy populacji (udzial, srednia,
+# kowariancja rozkladu normalnego dwuwymiarowego), zakresy obciecia x i y
+# oraz regula wyboru obciazonej proby:
+#   {'rule': 'quantile', 'axis': 'x', 'q': 75}    - wartosci >= q-tego percentyla
+#   {'rule': 'above', 'axis': 'y', 'value': 50}   - wartosci > value
+#   {'rule': 'group', 'group': 'old'}             - tylko jedna grupa
+# Gdy regula wybierze mniej niz 3 punkty, proba to pierwsze 10 punktow.
+
+SCENARIO_SPECS = {
+    'restriction_of_range': {
+        'groups': [
+            # Dochod (20-120 tys) vs szczescie (1-10)
+            # Target r ~ 0.65: sd_x=20, sd_y=1.5, cov = 0.65*20*1.5 = 19.5
+            {'name': None, 'share': 1.0,
+             'mean': [60, 5.5], 'cov': [[400, 19.5], [19.5, 2.25]]},
+        ],
+        'clip_x': (15, 130),
+        'clip_y': (1, 10),
+        # Bias: tylko wysokie dochody (top 25%)
+        'selection': {'rule': 'quantile', 'axis': 'x', 'q': 75},
+    },
+    'truncation_bias': {
+        'groups': [
+            # Target r ~ 0.7: sd_x=5, sd_y=15, cov = 0.7*5*15 = 52.5
+            {'name': None, 'share': 1.0,
+             'mean': [15, 55], 'cov': [[25, 52.5], [52.5, 225]]},
+        ],
+        'clip_x': (0, 40),
+        'clip_y': (0, 100),
+        # Bias: tylko zdani (y > 50)
+        'selection': {'rule': 'above', 'axis': 'y', 'value': 50},
+    },
+    'simpsons_paradox': {
+        # Ogolna korelacja ujemna (wiecej cwiczen = mlodsi = mniejsza waga),
+        # wewnatrz grup dodatnia (r ~ +0.3)
+        'groups': [
+            # Mlodzi: srednia cwiczen=8h, waga=68kg; sd_x=2, sd_y=7, cov = 0.3*2*7 = 4.2
+            {'name': 'young', 'share': 0.5,
+             'mean': [8, 68], 'cov': [[4, 4.2], [4.2, 49]]},
+            # Starsi: srednia cwiczen=3h, waga=82kg; sd_x=1.5, sd_y=6, cov = 0.3*1.5*6 = 2.7
+            {'name': 'old', 'share': 0.5,
+             'mean': [3, 82], 'cov': [[2.25, 2.7], [2.7, 36]]},
+        ],
+        'clip_x': (0, 20),
+        'clip_y': (40, 120),
+        # Bias: tylko starsi -> korelacja dodatnia
+        'selection': {'rule': 'group', 'group': 'old'},
+    },
+}
+
+
+def _prepare_spec(spec):
+    """
+    Przygotowuje specyfikacje do generowania: czynnik Cholesky'ego kowariancji
+    kazdej grupy liczony raz (rng.multivariate_normal robi SVD przy kazdym wywolaniu).
+    """
+    names = [g['name'] for g in spec['groups']]
+    selection = dict(spec['selection'])
+    if selection['rule'] == 'group':
+        selection['code'] = names.index(selection['group'])
+    return {
+        'names': np.array(names) if len(names) > 1 else None,
+        'shares': np.cumsum([0.0] + [g['share'] for g in spec['groups']]),
+        'means': [np.array(g['mean'], dtype=float) for g in spec['groups']],
+        'factors': [np.linalg.cholesky(np.array(g['cov'], dtype=float)) for g in spec['groups']],
+        'clip_x': spec['clip_x'],
+        'clip_y': spec['clip_y'],
+        'selection': selection,
+    }
 
-    # Target r ~ 0.7: sd_x=5, sd_y=15, cov = 0.7*5*15 = 52.5
-    mean = [15, 55]
-    cov = [[25, 52.5], [52.5, 225]]
-    data = rng.multivariate_normal(mean, cov, size=n)
 
-    x_pop = np.clip(data[:, 0], 0, 40)
-    y_pop = np.clip(data[:, 1], 0, 100)
+_PREPARED_SPECS = {scenario_id: _prepare_spec(spec) for scenario_id, spec in SCENARIO_SPECS.items()}
 
-    # Bias: tylko zdani (y > 50)
-    passing_threshold = 50
-    mask = y_pop > passing_threshold
 
-    if np.sum(mask) < 3:
-        mask[:10] = True
+def _group_bounds(prepared, n):
+    """Granice grup w populacji n osob (udzialy skumulowane, zaokraglone w dol)."""
+    bounds = np.floor(prepared['shares'] * n).astype(int)
+    bounds[-1] = n
+    return bounds
 
-    x_sample = x_pop[mask]
-    y_sample = y_pop[mask]
 
-    scenario = SCENARIOS['truncation_bias']
+def _generate_batch(scenario_id, rng, reps, n):
+    """
+    Generuje reps populacji po n osob wg specyfikacji scenariusza.
+
+    Jedno losowanie standardowych normalnych Z (reps x n x 2); punkty grupy
+    to Z L^T + srednia dla jej wycinka kolumn.
+
+    Returns:
+        tuple: (x, y, codes, mask) - x, y, mask: reps x n; codes: numery grup (n,)
+    """
+    prepared = _PREPARED_SPECS[scenario_id]
+    bounds = _group_bounds(prepared, n)
+    data = rng.standard_normal((reps, n, 2))
+    for lo, hi, mean, factor in zip(bounds[:-1], bounds[1:], prepared['means'], prepared['factors']):
+        data[:, lo:hi] = data[:, lo:hi] @ factor.T + mean
+    x = np.clip(data[..., 0], *prepared['clip_x'])
+    y = np.clip(data[..., 1], *prepared['clip_y'])
+    codes = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+
+    rule = prepared['selection']
+    if rule['rule'] == 'group':
+        mask = np.broadcast_to(codes == rule['code'], x.shape).copy()
+    else:
+        values = x if rule['axis'] == 'x' else y
+        if rule['rule'] == 'quantile':
+            mask = values >= np.percentile(values, rule['q'], axis=1, keepdims=True)
+        else:
+            mask = values > rule['value']
+    mask[mask.sum(axis=1) < 3, :10] = True
+    return x, y, codes, mask
+
+
+def _group_stats(x, y, codes, names):
+    """
+    Statystyki korelacji osobno dla kazdej grupy - redukcje np.bincount
+    po numerach grup (srednie, potem sumy odchylen), bez petli po punktach.
+
+    Returns:
+        dict: nazwa grupy -> {r, p_value, slope, intercept, n}
+    """
+    k = len(names)
+    counts = np.bincount(codes, minlength=k)
+    mean_x = np.bincount(codes, weights=x, minlength=k) / counts
+    mean_y = np.bincount(codes, weights=y, minlength=k) / counts
+    dx = x - mean_x[codes]
+    dy = y - mean_y[codes]
+    sxx = np.bincount(codes, weights=dx * dx, minlength=k)
+    syy = np.bincount(codes, weights=dy * dy, minlength=k)
+    sxy = np.bincount(codes, weights=dx * dy, minlength=k)
     return {
-        'scenario': {k: v for k, v in scenario.items() if k != 'bias_description'},
-        'population': {
-            'points': _points_to_list(x_pop, y_pop),
-            'stats': _compute_stats(x_pop, y_pop),
-            'groups': None,
-        },
-        'sample': {
-            'points': _points_to_list(x_sample, y_sample),
-            'stats': _compute_stats(x_sample, y_sample),
-            'bias_description': scenario['bias_description'],
-        },
+        str(name): _stats_response(
+            regression_from_moments(int(counts[g]), mean_x[g], mean_y[g], sxx[g], syy[g], sxy[g]),
+            int(counts[g]))
+        for g, name in enumerate(names)
     }
 
 
-def _generate_simpsons_paradox(seed=None):
+def _scenario_data(scenario_id, seed=None, n=POPULATION_DEFAULT):
     """
-    Scenariusz: paradoks Simpsona.
-    Populacja: 2 grupy (mlodzi + starsi).
-    - Mlodzi: wiecej cwiczen, mniejsza waga, wewnetrzna r ~ +0.3
-    - Starsi: mniej cwiczen, wieksza waga, wewnetrzna r ~ +0.3
-    - Ogolna korelacja: ujemna (wiecej cwiczen = mlodsi = mniejsza waga)
-    Bias: tylko starsi → korelacja dodatnia.
+    Populacja, proba i ich statystyki dla scenariusza.
+
+    Wyniki dla podanego ziarna sa zapamietywane (LRU, klucz
+    (scenario_id, seed, n), lacznie do SCENARIO_CACHE_MAX_POINTS punktow
+    populacji), wiec powrot do odwiedzonej zakladki nie generuje danych ani
+    nie liczy statystyk od nowa. Bez ziarna (seed=None) kazde wywolanie
+    losuje nowe dane i nic nie jest zapamietywane.
+
+    Proba nie jest kopiowana - zapamietywana jest maska na populacji,
+    a grupy jako numery int8 (codes) z tablica nazw (names).
+
+    Returns:
+        tuple: (dane, cached) - dane: x_pop, y_pop, codes, names, mask,
+        pop_stats, group_stats, sample_stats (codes i names None dla
+        scenariuszy bez grup)
     """
-    rng = np.random.default_rng(seed)
+    global _scenario_cache_points
+    key = (scenario_id, seed, n)
+    if seed is not None:
+        with _scenario_cache_lock:
+            if key in _scenario_cache:
+                _scenario_cache.move_to_end(key)
+                return _scenario_cache[key], True
+
+    x, y, codes, mask = _generate_batch(scenario_id, np.random.default_rng(seed), 1, n)
+    x_pop, y_pop, mask = x[0], y[0], mask[0]
+    names = _PREPARED_SPECS[scenario_id]['names']
+    data = {
+        'x_pop': x_pop, 'y_pop': y_pop,
+        'codes': codes.astype(np.int8) if names is not None else None,
+        'names': names,
+        'mask': mask,
+        'pop_stats': _compute_stats(x_pop, y_pop),
+        'group_stats': _group_stats(x_pop, y_pop, codes, names) if names is not None else None,
+        'sample_stats': _compute_stats(x_pop[mask], y_pop[mask]),
+    }
+    if seed is not None:
+        with _scenario_cache_lock:
+            if key not in _scenario_cache:
+                _scenario_cache_points += n
+            _scenario_cache[key] = data
+            while _scenario_cache_points > SCENARIO_CACHE_MAX_POINTS:
+                _, evicted = _scenario_cache.popitem(last=False)
+                _scenario_cache_points -= len(evicted['x_pop'])
+    return data, False
+
+
+def _clear_scenario_cache():
+    global _scenario_cache_points
+    with _scenario_cache_lock:
+        _scenario_cache.clear()
+        _scenario_cache_points = 0
+
+
+# ── Badanie replikacyjne ──────────────────────────────────────────
+
+def _batch_r(x, y, mask=None):
+    """
+    r Pearsona dla kazdego wiersza x, y (opcjonalnie tylko punkty z maski).
 
-    # Mlodzi: srednia cwiczen=8h, waga=68kg
-    n_young = 150
-    # r=0.3: sd_x=2, sd_y=7, cov = 0.3*2*7 = 4.2
-    mean_young = [8, 68]
-    cov_young = [[4, 4.2], [4.2, 49]]
-    data_young = rng.multivariate_normal(mean_young, cov_young, size=n_young)
-
-    # Starsi: srednia cwiczen=3h, waga=82kg
-    n_old = 150
-    # r=0.3: sd_x=1.5, sd_y=6, cov = 0.3*1.5*6 = 2.7
-    mean_old = [3, 82]
-    cov_old = [[2.25, 2.7], [2.7, 36]]
-    data_old = rng.multivariate_normal(mean_old, cov_old, size=n_old)
-
-    # Polacz w populacje
-    x_pop = np.clip(
-        np.concatenate([data_young[:, 0], data_old[:, 0]]),
-        0, 20
-    )
-    y_pop = np.clip(
-        np.concatenate([data_young[:, 1], data_old[:, 1]]),
-        40, 120
-    )
-
-    # Etykiety grup
-    groups = ['young'] * n_young + ['old'] * n_old
-
-    # Bias: tylko starsi
-    x_sample = np.clip(data_old[:, 0], 0, 20)
-    y_sample = np.clip(data_old[:, 1], 40, 120)
-
-    scenario = SCENARIOS['simpsons_paradox']
+    Returns:
+        numpy array dlugosci reps (NaN gdy wariancja w wierszu zerowa)
+    """
+    w = np.ones(x.shape) if mask is None else mask.astype(float)
+    count = w.sum(axis=1, keepdims=True)
+    dx = (x - (w * x).sum(axis=1, keepdims=True) / count) * w
+    dy = y - (w * y).sum(axis=1, keepdims=True) / count
+    sxy = np.einsum('ij,ij->i', dx, dy)
+    sxx = np.einsum('ij,ij->i', dx, dx)
+    syy = np.einsum('ij,ij->i', w * dy, dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0)
+
+
+def _distribution_summary(values):
+    """Srednia, odchylenie i kwantyle 2.5/50/97.5% (bez NaN)."""
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return {'mean': None, 'std': None, 'q025': None, 'median': None, 'q975': None}
+    q025, median, q975 = np.percentile(values, [2.5, 50, 97.5])
     return {
-        'scenario': {k: v for k, v in scenario.items() if k != 'bias_description'},
-        'population': {
-            'points': _points_to_list(x_pop, y_pop),
-            'stats': _compute_stats(x_pop, y_pop),
-            'groups': groups,
-        },
-        'sample': {
-            'points': _points_to_list(x_sample, y_sample),
-            'stats': _compute_stats(x_sample, y_sample),
-            'bias_description': scenario['bias_description'],
-        },
+        'mean': round(float(values.mean()), 4),
+        'std': round(float(values.std()), 4),
+        'q025': round(float(q025), 4),
+        'median': round(float(median), 4),
+        'q975': round(float(q975), 4),
     }
 
 
-_GENERATORS = {
-    'restriction_of_range': _generate_restriction_of_range,
-    'truncation_bias': _generate_truncation_bias,
-    'simpsons_paradox': _generate_simpsons_paradox,
-}
+def _replication_study(scenario_id, reps=REPLICATION_DEFAULT, n=POPULATION_DEFAULT, seed=None):
+    """
+    Powtarza scenariusz reps razy i porownuje r populacji z r obciazonej proby.
+
+    Populacje generowane sa paczkami (reps_chunk x n punktow, co najwyzej
+    REPLICATION_CHUNK_ELEMENTS), a maski proby i r liczone sa wektorowo
+    dla calej paczki - pamiec nie zalezy od reps.
+
+    Returns:
+        dict: population_r, sample_r (podsumowania), bias {mean, rmse, std},
+        sign_flip_rate, n_valid, histogram {edges, population, sample}, throughput
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    chunk = max(1, REPLICATION_CHUNK_ELEMENTS // n)
+    r_pop = np.empty(reps)
+    r_sample = np.empty(reps)
+    sample_sizes = np.empty(reps)
+    for lo in range(0, reps, chunk):
+        hi = min(reps, lo + chunk)
+        x, y, _, mask = _generate_batch(scenario_id, rng, hi - lo, n)
+        r_pop[lo:hi] = _batch_r(x, y)
+        r_sample[lo:hi] = _batch_r(x, y, mask)
+        sample_sizes[lo:hi] = mask.sum(axis=1)
+
+    valid = np.isfinite(r_pop) & np.isfinite(r_sample)
+    bias = r_sample[valid] - r_pop[valid]
+    edges = np.linspace(-1, 1, REPLICATION_HIST_BINS + 1)
+    elapsed = time.perf_counter() - start
+    return {
+        'scenario_id': scenario_id,
+        'replications': reps,
+        'n': n,
+        'n_valid': int(valid.sum()),
+        'mean_sample_size': round(float(sample_sizes.mean()), 2),
+        'population_r': _distribution_summary(r_pop),
+        'sample_r': _distribution_summary(r_sample),
+        'bias': {
+            'mean': round(float(bias.mean()), 4) if len(bias) else None,
+            'rmse': round(float(np.sqrt(np.mean(bias ** 2))), 4) if len(bias) else None,
+            'std': round(float(bias.std()), 4) if len(bias) else None,
+        },
+        'sign_flip_rate': (round(float(np.mean(np.sign(r_pop[valid]) != np.sign(r_sample[valid]))), 4)
+                           if len(bias) else None),
+        'histogram': {
+            'edges': edges.tolist(),
+            'population': np.histogram(r_pop[valid], edges)[0].tolist(),
+            'sample': np.histogram(r_sample[valid], edges)[0].tolist(),
+        },
+        'throughput': {
+            'elapsed_s': round(elapsed, 4),
+            'replications_per_s': round(reps / elapsed, 1) if elapsed > 0 else None,
+            'points_per_s': round(reps * n / elapsed, 1) if elapsed > 0 else None,
+        },
+    }
 
 
 # ── Endpointy ─────────────────────────────────────────────────────
@@ -373,9 +726,18 @@ def generate():
     Request JSON:
         scenario_id: string - identyfikator scenariusza
         seed: int (opcjonalny) - ziarno generatora dla powtarzalnosci
+              (z ziarnem wynik jest zapamietywany - ponowne zapytanie nie liczy od nowa)
+        n: int (opcjonalny) - wielkosc populacji (domyslnie 300, 30-1000000)
+        display: 'all' (domyslnie, tylko n <= DISPLAY_MAX_BUDGET) | 'thin' | 'grid'
+                 | 'hexbin' - redukcja punktow na wykresie
+        point_budget: maksymalna liczba punktow / komorek siatki (domyslnie 2000)
 
     Response JSON:
-        scenario, population, sample
+        scenario, population, sample, cached; punkty kolumnowo
+        {x: [...], y: [...]}; przy display != 'all' dodatkowo
+        population.display i sample.display (thin: n_total, n_shown;
+        grid: x_edges, y_edges, counts[y][x]; hexbin: x, y, counts niepustych
+        szesciokatow, gridsize, hex_width, hex_height - points = null)
     """
     try:
         data = _validate_request_json()
@@ -388,8 +750,121 @@ def generate():
         if seed is not None:
             seed = int(seed)
 
-        generator = _GENERATORS[scenario_id]
-        result = generator(seed)
+        n = int(data.get('n', POPULATION_DEFAULT))
+        if n < POPULATION_MIN or n > POPULATION_MAX:
+            raise ValueError(f"Parametr 'n' musi byc miedzy {POPULATION_MIN} a {POPULATION_MAX}")
+
+        display, point_budget = _validate_display_params(data)
+        if display == 'all' and n > DISPLAY_MAX_BUDGET:
+            raise ValueError(f"Dla n > {DISPLAY_MAX_BUDGET} wybierz display "
+                             "'thin', 'grid' lub 'hexbin'")
+
+        scenario_data, cached = _scenario_data(scenario_id, seed, n)
+        result = _assemble_result(scenario_id, scenario_data, display, point_budget)
+        result['cached'] = cached
+        result['success'] = True
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+@app.route('/api/replicate', methods=['POST'])
+def replicate():
+    """
+    Badanie replikacyjne: R populacji i obciazonych prob dla scenariusza.
+
+    Request JSON:
+        scenario_id: string
+        replications: R (domyslnie 1000, 10-10000)
+        n: wielkosc populacji (domyslnie 300; R * n <= 10^8)
+        seed: int (opcjonalny)
+
+    Response JSON:
+        population_r, sample_r {mean, std, q025, median, q975}, bias {mean, rmse, std},
+        sign_flip_rate, n_valid, mean_sample_size, histogram, throughput
+    """
+    try:
+        data = _validate_request_json()
+
+        scenario_id = data.get('scenario_id', '')
+        if not scenario_id or scenario_id not in SCENARIOS:
+            raise ValueError(f"Nieznany scenariusz: '{scenario_id}'")
+        reps = int(data.get('replications', REPLICATION_DEFAULT))
+        if reps < 10 or reps > REPLICATION_MAX:
+            raise ValueError(f"Liczba replikacji musi byc miedzy 10 a {REPLICATION_MAX}")
+        n = int(data.get('n', POPULATION_DEFAULT))
+        if n < POPULATION_MIN or n > POPULATION_MAX:
+            raise ValueError(f"Parametr 'n' musi byc miedzy {POPULATION_MIN} a {POPULATION_MAX}")
+        if reps * n > REPLICATION_MAX_ELEMENTS:
+            raise ValueError(f"Iloczyn replikacji i n nie moze przekraczac {REPLICATION_MAX_ELEMENTS}")
+        seed = data.get('seed', None)
+        if seed is not None:
+            seed = int(seed)
+
+        result = _replication_study(scenario_id, reps, n, seed)
+        result['success'] = True
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+@app.route('/api/select', methods=['POST'])
+def select():
+    """
+    Statystyki dla regionu zaznaczonego na populacji scenariusza.
+
+    Zamiast listy punktow klient wysyla tylko ksztalt zaznaczenia; serwer
+    naklada maske na populacje z pamieci podrecznej (lub odtwarza ja z ziarna).
+
+    Request JSON:
+        scenario_id, seed (wymagany), n (opcjonalny, domyslnie 300)
+        target: 'population' (domyslnie) | 'sample' - ktore punkty zaznaczamy
+        selection: {type: 'rectangle', x: [x0, x1], y: [y0, y1]}
+                   | {type: 'lasso', x: [...], y: [...]}
+                   | {type: 'threshold', axis: 'x' | 'y', min, max}
+
+    Response JSON:
+        r, p_value, slope, intercept, n, n_total, cached
+    """
+    try:
+        data = _validate_request_json()
+
+        scenario_id = data.get('scenario_id', '')
+        if not scenario_id or scenario_id not in SCENARIOS:
+            raise ValueError(f"Nieznany scenariusz: '{scenario_id}'")
+        if data.get('seed') is None:
+            raise ValueError("Zaznaczenie wymaga pola 'seed' (populacji z /api/generate)")
+        seed = int(data['seed'])
+        n = int(data.get('n', POPULATION_DEFAULT))
+        if n < POPULATION_MIN or n > POPULATION_MAX:
+            raise ValueError(f"Parametr 'n' musi byc miedzy {POPULATION_MIN} a {POPULATION_MAX}")
+        target = data.get('target', 'population')
+        if target not in SELECTION_TARGETS:
+            raise ValueError(f"Parametr 'target' musi byc jednym z: {', '.join(SELECTION_TARGETS)}")
+        if 'selection' not in data:
+            raise ValueError("Brak wymaganego pola 'selection'")
+        selection = _validate_selection(data['selection'])
+
+        scenario_data, cached = _scenario_data(scenario_id, seed, n)
+        x_all, y_all = scenario_data['x_pop'], scenario_data['y_pop']
+        if target == 'sample':
+            x_all, y_all = x_all[scenario_data['mask']], y_all[scenario_data['mask']]
+        mask = _selection_mask(x_all, y_all, selection)
+        result = _compute_stats(x_all[mask], y_all[mask])
+        result['n_total'] = len(x_all)
+        result['cached'] = cached
         result['success'] = True
         return jsonify(result)
 
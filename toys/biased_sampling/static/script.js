@@ -8,8 +8,14 @@ const state = {
     populationRevealed: false,
     customSelecting: false,
     customStats: null,
+    seeds: {},  // ziarno per scenariusz - powrot do zakladki trafia w pamiec podreczna serwera
+    populationSize: 300,
 };
 
+// Powyzej tylu osob populacja i proba przychodza jako gestosci w szesciokatach
+const DENSITY_THRESHOLD = 5000;
+const DENSITY_BUDGET = 1500;
+
 // Kolory
 const COLORS = {
     popPoint: 'rgba(148, 163, 184, 0.35)',
@@ -90,27 +96,46 @@ function setupControls() {
         }
     });
 
-    document.getElementById('new-data-btn').addEventListener('click', function() {
+    document.getElementById('population-size').addEventListener('change', function() {
+        state.populationSize = parseInt(this.value, 10);
+        state.customStats = null;
+        document.getElementById('custom-stats').style.display = 'none';
         if (state.currentScenario) {
             selectScenario(state.currentScenario);
         }
     });
+
+    document.getElementById('new-data-btn').addEventListener('click', function() {
+        if (state.currentScenario) {
+            selectScenario(state.currentScenario, true);
+        }
+    });
 }
 
 
 // === WYBOR SCENARIUSZA ===
-async function selectScenario(scenarioId) {
+async function selectScenario(scenarioId, newData = false) {
     // Aktualizuj przyciski
     document.querySelectorAll('#scenario-buttons .st-btn').forEach(btn => {
         btn.classList.toggle('bs-scenario-btn--active',
                              btn.dataset.scenarioId === scenarioId);
     });
 
+    if (newData || state.seeds[scenarioId] === undefined) {
+        state.seeds[scenarioId] = Math.floor(Math.random() * 2147483647);
+    }
+
     try {
         const resp = await fetch('/api/generate', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ scenario_id: scenarioId }),
+            body: JSON.stringify({
+                scenario_id: scenarioId,
+                seed: state.seeds[scenarioId],
+                n: state.populationSize,
+                display: state.populationSize > DENSITY_THRESHOLD ? 'hexbin' : 'all',
+                point_budget: DENSITY_BUDGET,
+            }),
         });
         const data = await resp.json();
         if (!data.success) {
@@ -169,14 +194,16 @@ function renderPlot() {
 
     // Populacja
     if (showPop && pop) {
-        if (isSimpsons && pop.groups) {
+        if (pop.display && pop.display.mode === 'hexbin') {
+            traces.push(hexbinTrace(pop.display, 'Populacja (gestosc)', 'Greys', 1.0));
+        } else if (isSimpsons && pop.groups) {
             // Simpson's: dwa kolory grup
             const youngX = [], youngY = [], oldX = [], oldY = [];
-            pop.points.forEach((pt, i) => {
-                if (pop.groups[i] === 'young') {
-                    youngX.push(pt.x); youngY.push(pt.y);
+            pop.groups.forEach((group, i) => {
+                if (group === 'young') {
+                    youngX.push(pop.points.x[i]); youngY.push(pop.points.y[i]);
                 } else {
-                    oldX.push(pt.x); oldY.push(pt.y);
+                    oldX.push(pop.points.x[i]); oldY.push(pop.points.y[i]);
                 }
             });
             traces.push({
@@ -195,8 +222,8 @@ function renderPlot() {
             });
         } else {
             traces.push({
-                x: pop.points.map(p => p.x),
-                y: pop.points.map(p => p.y),
+                x: pop.points.x,
+                y: pop.points.y,
                 mode: 'markers', type: 'scatter',
                 name: 'Populacja',
                 marker: { color: COLORS.popPoint, size: 6 },
@@ -206,10 +233,12 @@ function renderPlot() {
     }
 
     // Proba
-    if (sample) {
+    if (sample && sample.display && sample.display.mode === 'hexbin') {
+        traces.push(hexbinTrace(sample.display, 'Proba (gestosc)', 'Purples', 0.55));
+    } else if (sample) {
         traces.push({
-            x: sample.points.map(p => p.x),
-            y: sample.points.map(p => p.y),
+            x: sample.points.x,
+            y: sample.points.y,
             mode: 'markers', type: 'scatter',
             name: 'Proba',
             marker: {
@@ -224,7 +253,7 @@ function renderPlot() {
 
     // Linie regresji
     if (showPop && pop && pop.stats.slope !== null) {
-        const regLine = getRegressionLine(pop.points, pop.stats);
+        const regLine = getRegressionLine(pointsX(pop), pop.stats);
         traces.push({
             x: regLine.x, y: regLine.y,
             mode: 'lines', type: 'scatter',
@@ -235,7 +264,7 @@ function renderPlot() {
     }
 
     if (sample && sample.stats.slope !== null) {
-        const regLine = getRegressionLine(sample.points, sample.stats);
+        const regLine = getRegressionLine(pointsX(sample), sample.stats);
         traces.push({
             x: regLine.x, y: regLine.y,
             mode: 'lines', type: 'scatter',
@@ -276,7 +305,7 @@ function renderPlot() {
     const config = {
         responsive: true,
         displayModeBar: true,
-        modeBarButtonsToRemove: ['lasso2d', 'autoScale2d'],
+        modeBarButtonsToRemove: ['autoScale2d'],
     };
 
     const plotEl = document.getElementById('plot');
@@ -285,15 +314,48 @@ function renderPlot() {
     // Event: zaznaczenie punktow
     plotEl.on('plotly_selected', function(eventData) {
         if (!state.customSelecting || !eventData || !eventData.points) return;
-        handleCustomSelection(eventData.points);
+        handleCustomSelection(eventData);
     });
 }
 
 
-function getRegressionLine(points, stats) {
-    const xs = points.map(p => p.x);
-    const xMin = Math.min(...xs);
-    const xMax = Math.max(...xs);
+// Wspolrzedne x punktow lub srodkow szesciokatow (tryb gestosci)
+function pointsX(group) {
+    return group.points ? group.points.x : group.display.x;
+}
+
+
+// Gestosc jako szesciokatne znaczniki; rozmiar z szerokosci wykresu i liczby szesciokatow
+function hexbinTrace(density, name, colorscale, sizeFactor) {
+    const plotWidth = document.getElementById('plot').clientWidth || 800;
+    const size = Math.max(3, (plotWidth - 80) / density.gridsize * 1.15 * sizeFactor);
+    return {
+        x: density.x,
+        y: density.y,
+        mode: 'markers', type: 'scatter',
+        name: name,
+        marker: {
+            symbol: 'hexagon',
+            size: size,
+            color: density.counts.map(c => Math.log10(c + 1)),
+            colorscale: colorscale,
+            reversescale: true,  // skale Plotly zaczynaja od koloru najciemniejszego
+            showscale: false,
+            line: { width: 0 },
+        },
+        customdata: density.counts,
+        hovertemplate: `<b>${name}</b><br>(%{x:.1f}, %{y:.1f})<br>n = %{customdata}<extra></extra>`,
+    };
+}
+
+
+function getRegressionLine(xs, stats) {
+    let xMin = Infinity;
+    let xMax = -Infinity;
+    for (const x of xs) {
+        if (x < xMin) xMin = x;
+        if (x > xMax) xMax = x;
+    }
     const margin = (xMax - xMin) * 0.05;
     const x0 = xMin - margin;
     const x1 = xMax + margin;
@@ -305,30 +367,36 @@ function getRegressionLine(points, stats) {
 
 
 // === CUSTOM SELECTION ===
-async function handleCustomSelection(selectedPoints) {
-    // Zbierz unikalne punkty z populacji (selectedPoints moga miec duplikaty z roznych traces)
-    const pointSet = new Map();
-    selectedPoints.forEach(pt => {
-        const key = `${pt.x.toFixed(4)}_${pt.y.toFixed(4)}`;
-        if (!pointSet.has(key)) {
-            pointSet.set(key, { x: pt.x, y: pt.y });
-        }
-    });
-
-    const customPoints = Array.from(pointSet.values());
-    if (customPoints.length < 3) {
-        document.getElementById('custom-stats').style.display = 'none';
-        return;
+async function handleCustomSelection(eventData) {
+    // Wysylamy tylko ksztalt zaznaczenia - serwer naklada go na populacje z pamieci podrecznej
+    let selection = null;
+    if (eventData.range) {
+        selection = { type: 'rectangle', x: eventData.range.x, y: eventData.range.y };
+    } else if (eventData.lassoPoints) {
+        selection = { type: 'lasso', x: eventData.lassoPoints.x, y: eventData.lassoPoints.y };
     }
+    if (!selection) return;
+
+    // Przed odslonieciem populacji zaznaczamy tylko widoczna probe
+    const showPop = !state.revealMode || state.populationRevealed;
 
     try {
-        const resp = await fetch('/api/compute', {
+        const resp = await fetch('/api/select', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ points: customPoints }),
+            body: JSON.stringify({
+                scenario_id: state.currentScenario,
+                seed: state.seeds[state.currentScenario],
+                n: state.populationSize,
+                target: showPop ? 'population' : 'sample',
+                selection: selection,
+            }),
         });
         const data = await resp.json();
-        if (!data.success) return;
+        if (!data.success || data.n < 3) {
+            document.getElementById('custom-stats').style.display = 'none';
+            return;
+        }
 
         state.customStats = data;
 
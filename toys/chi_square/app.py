@@ -1,11 +1,21 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
+from collections import OrderedDict
+import csv
+import io
+import itertools
+import json
 import math
+import threading
 import numpy as np
 from scipy import stats
 import os
 import sys
+import time
 
+from common.coalesce import (LatestWinsCoalescer, SUPERSEDED,
+                             client_id_from_request, superseded_response)
 from common.flask_app import register_common_static
+from common.parallel import parallel_map, resolve_workers
 
 
 def get_bundle_dir():
@@ -23,6 +33,43 @@ app = Flask(__name__,
 
 register_common_static(app, bundle_dir if getattr(sys, 'frozen', False) else None)
 
+# Limity rozmiaru danych
+MAX_TABLE_DIM = 100          # maksymalna liczba wierszy/kolumn tabeli
+MAX_N = 10000000             # maksymalna liczebność generowanej tabeli
+CELL_ARRAYS_LIMIT = 100      # powyżej tylu komórek tablice per-komórka tylko na życzenie
+SIM_MAX_CELLS = 5000000      # limit komórek (tabele x r x c) w jednej paczce symulacji
+CSV_CHUNK_ROWS = 100000      # tyle wierszy CSV przetwarzamy naraz
+
+# Monte Carlo p-value (dla małych wartości oczekiwanych)
+MC_DEFAULT_SIMULATIONS = 10000
+MC_MAX_SIMULATIONS = 1000000
+MC_BATCH_SIZE = 10000        # tyle tabel losujemy naraz (wektorowo)
+MC_FIRST_BATCH = 16          # pierwsza paczka - potem rośnie wg zmierzonego kosztu tabeli
+MC_TIME_BUDGET = 0.2         # sekundy - limit dla trybu interaktywnego
+MC_STREAMS = 16              # stała liczba strumieni losowych - wynik nie zależy od liczby procesów
+MC_CONFIDENCE = 0.95
+
+# Symulator rozkładu statystyki przy H0
+NULL_DEFAULT_SIMULATIONS = 10000
+NULL_MAX_SIMULATIONS = 200000
+NULL_CHUNK_SIZE = 5000
+NULL_HIST_BINS = 50
+NULL_CACHE_SIZE = 16
+
+# Obliczenia sterowane suwakami: liczymy tylko najnowsze zapytanie klienta
+_coalescer = LatestWinsCoalescer()
+
+# Cache symulacji: (row_sums, col_sums, n, n_sim, seed) -> posortowane statystyki
+_null_cache = OrderedDict()
+_null_cache_lock = threading.Lock()
+
+# Analiza mocy (symulacja na siatce n x alpha)
+POWER_DEFAULT_SIMULATIONS = 1000
+POWER_MAX_SIMULATIONS = 10000
+POWER_MAX_GRID = 50
+POWER_DEFAULT_ALPHAS = [0.01, 0.05, 0.10]
+POWER_TARGET = 0.8
+
 
 def _validate_request_json():
     """Waliduje że request zawiera poprawny JSON. Rzuca ValueError jeśli nie."""
@@ -48,8 +95,10 @@ def _validate_table(table):
         raise ValueError("Tabela musi być dwuwymiarowa")
     if table.shape[0] < 2 or table.shape[1] < 2:
         raise ValueError("Tabela musi mieć co najmniej 2 wiersze i 2 kolumny")
-    if table.shape[0] > 10 or table.shape[1] > 10:
-        raise ValueError("Tabela może mieć maksymalnie 10 wierszy i 10 kolumn")
+    if table.shape[0] > MAX_TABLE_DIM or table.shape[1] > MAX_TABLE_DIM:
+        raise ValueError(
+            f"Tabela może mieć maksymalnie {MAX_TABLE_DIM} wierszy i {MAX_TABLE_DIM} kolumn"
+        )
     if np.any(np.isnan(table)) or np.any(np.isinf(table)):
         raise ValueError("Tabela nie może zawierać wartości NaN lub nieskończonych")
     if np.any(table < 0):
@@ -65,24 +114,444 @@ def _validate_table(table):
         raise ValueError("Suma kolumny nie może być zerowa")
 
 
-def _compute_chi_square(table, alpha):
+def _validate_include_cells(value):
+    """
+    Waliduje flagę include_cells: JSON true/false albo brak (None).
+    Rzuca ValueError dla innych wartości (np. napisu "false").
+    """
+    if value is None or isinstance(value, bool):
+        return value
+    raise ValueError("Parametr 'include_cells' musi być wartością logiczną (true/false)")
+
+
+def _validate_form_flag(value, name):
+    """Waliduje flagę z formularza: 'true'/'1'/'yes' lub 'false'/'0'/'no' (bez względu na wielkość liter)."""
+    normalized = value.strip().lower()
+    if normalized in ('true', '1', 'yes'):
+        return True
+    if normalized in ('false', '0', 'no'):
+        return False
+    raise ValueError(f"Parametr '{name}' musi mieć wartość true lub false")
+
+
+def _validate_simulations(n_sim_raw):
+    """Waliduje i zwraca liczbę symulacji Monte Carlo (0 = wyłączone)."""
+    if n_sim_raw is None:
+        raise ValueError("Liczba symulacji nie może być pusta")
+    n_sim = int(n_sim_raw)
+    if n_sim < 0 or n_sim > MC_MAX_SIMULATIONS:
+        raise ValueError(f"Liczba symulacji musi być między 0 a {MC_MAX_SIMULATIONS}")
+    return n_sim
+
+
+def _validate_percentages(data):
+    """
+    Waliduje pola row_percentages i row_split. Rzuca ValueError jeśli niepoprawne.
+
+    Returns:
+        tuple: (row_percentages z ujemnymi wartościami zamienionymi na 0,
+                row_split znormalizowany do sumy 1)
+    """
+    row_percentages = np.array(data['row_percentages'], dtype=float)
+    row_split = np.array(data.get('row_split', [0.5, 0.5]), dtype=float)
+
+    if np.any(np.isnan(row_percentages)) or np.any(np.isinf(row_percentages)):
+        raise ValueError("Procenty nie mogą zawierać NaN lub nieskończonych wartości")
+    if row_percentages.ndim != 2:
+        raise ValueError("row_percentages musi być tablicą 2D")
+    if row_percentages.shape[0] < 2 or row_percentages.shape[1] < 2:
+        raise ValueError("Tabela musi mieć co najmniej 2 wiersze i 2 kolumny")
+    if len(row_split) != row_percentages.shape[0]:
+        raise ValueError("row_split musi mieć tyle elementów ile wierszy")
+    if np.any(np.isnan(row_split)) or np.any(np.isinf(row_split)):
+        raise ValueError("row_split nie może zawierać NaN lub nieskończonych wartości")
+    # Ujemne procenty traktujemy jak 0 (jak dotąd przycinane liczności)
+    row_percentages = np.maximum(row_percentages, 0)
+    if np.any(row_percentages.sum(axis=1) <= 0):
+        raise ValueError("Suma procentów w każdym wierszu musi być dodatnia")
+    if np.any(row_split <= 0):
+        raise ValueError("Udziały wierszy muszą być dodatnie")
+
+    return row_percentages, row_split / row_split.sum()
+
+
+def _largest_remainder(totals, weights):
+    """
+    Dzieli sumy na liczności całkowite metodą największych reszt,
+    dla wszystkich wierszy naraz.
+
+    Args:
+        totals: sumy całkowite (k,)
+        weights: nieujemne wagi (k, m) - normalizowane w każdym wierszu
+
+    Returns:
+        np.ndarray (k, m) int64: liczności sumujące się w wierszach do totals
+    """
+    totals = np.asarray(totals, dtype=np.int64)
+    raw = totals[:, None] * (weights / weights.sum(axis=1, keepdims=True))
+    counts = np.floor(raw).astype(np.int64)
+    missing = totals - counts.sum(axis=1)
+
+    # Ranga reszty w wierszu (0 = największa); przy remisie wygrywa wcześniejsza kolumna
+    order = np.argsort(counts - raw, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(raw.shape[1])[None, :], axis=1)
+    return counts + (ranks < missing[:, None])
+
+
+def _row_totals(n, row_split):
+    """Liczności wierszy dla n (skalar lub tablica) - metoda największych reszt."""
+    n = np.asarray(n, dtype=np.int64)
+    totals = _largest_remainder(n.reshape(-1), np.broadcast_to(row_split, (n.size, len(row_split))))
+    return totals.reshape(*n.shape, len(row_split))
+
+
+def _table_from_percentages(n, row_percentages, row_split):
+    """Tabela liczności o sumie n: najpierw liczności wierszy, potem komórek."""
+    return _largest_remainder(_row_totals(n, row_split), row_percentages)
+
+
+def _include_cells(flag, table):
+    """Czy zwracać tablice per-komórka (None = tylko dla małych tabel)."""
+    if flag is None:
+        return table.size <= CELL_ARRAYS_LIMIT
+    return bool(flag)
+
+
+def _simulate_power(row_percentages, row_split, n_values, alphas, n_sim, seed=None):
+    """
+    Szacuje moc testu chi-kwadrat na siatce (alpha x n) metodą symulacji.
+
+    Tabele dla wszystkich n losowane są jednym wywołaniem rng.multinomial
+    (liczności wierszy ustalone przez row_split, komórki wg row_percentages);
+    wszystkie alpha korzystają z tych samych statystyk.
+
+    Returns:
+        dict: power[alpha][n], analytic[alpha][n], effect_size_w, df, required_n
+    """
+    rng = np.random.default_rng(seed)
+    probs = row_percentages / row_percentages.sum(axis=1, keepdims=True)
+    n_rows, n_cols = probs.shape
+    df = (n_rows - 1) * (n_cols - 1)
+    crit = stats.chi2.ppf(1 - alphas, df)
+    row_totals = _row_totals(n_values, row_split)
+
+    # Paczki po symulacjach, aby G*B*r*c nie przekroczyło SIM_MAX_CELLS
+    chunk = max(1, SIM_MAX_CELLS // (len(n_values) * n_rows * n_cols))
+    rejections = np.zeros((len(alphas), len(n_values)))
+    done = 0
+    while done < n_sim:
+        size = min(chunk, n_sim - done)
+        totals = np.broadcast_to(row_totals[:, None, :], (len(n_values), size, n_rows))
+        tables = rng.multinomial(totals, probs)
+        chi2_stats = _pearson_statistic_free_margins(tables, correction=(df == 1))
+        rejections += np.sum(chi2_stats[None, :, :] >= crit[:, None, None], axis=2)
+        done += size
+    power = rejections / n_sim
+
+    # Moc asymptotyczna: niecentralny chi2 z ncp = n * w^2 (w Cohena)
+    joint = probs * row_split[:, None]
+    indep = np.outer(joint.sum(axis=1), joint.sum(axis=0))
+    w = float(np.sqrt(np.sum((joint - indep) ** 2 / indep)))
+    analytic = stats.ncx2.sf(crit[:, None], df, n_values[None, :] * w ** 2)
+    analytic = np.where(w > 0, analytic, alphas[:, None])
+
+    required_n = []
+    for row in power:
+        reached = np.nonzero(row >= POWER_TARGET)[0]
+        required_n.append(int(n_values[reached[0]]) if len(reached) else None)
+
+    return {
+        'df': int(df),
+        'effect_size_w': round(w, 4),
+        'power': np.round(power, 4).tolist(),
+        'analytic': np.round(analytic, 4).tolist(),
+        'required_n': required_n,
+    }
+
+
+def _crosstab_from_csv(stream, delimiter=',', header=True):
+    """
+    Buduje tabelę kontyngencji z surowych obserwacji (2 kolumny kategorii).
+
+    Plik czytany jest paczkami po CSV_CHUNK_ROWS wierszy; w każdej paczce
+    kategorie są kodowane przez np.unique(return_inverse=True), a liczności
+    zliczane jednym np.bincount po kodzie łącznym. Pamięć zależy od liczby
+    kategorii, nie od liczby wierszy.
+
+    Args:
+        stream: binarny strumień pliku CSV (UTF-8)
+        delimiter: separator pól
+        header: czy pierwszy wiersz zawiera nazwy zmiennych
+
+    Returns:
+        tuple: (table, row_labels, col_labels, variables, n_used, n_skipped)
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''),
+                        delimiter=delimiter)
+    variables = None
+    if header:
+        first = next(reader, None)
+        if first is None or len(first) < 2:
+            raise ValueError("Plik musi mieć co najmniej 2 kolumny")
+        variables = [first[0].strip(), first[1].strip()]
+
+    row_codes = {}
+    col_codes = {}
+    table = np.zeros((0, 0), dtype=np.int64)
+    n_used = 0
+    n_skipped = 0
+    line_offset = 2 if header else 1
+
+    while True:
+        chunk = list(itertools.islice(reader, CSV_CHUNK_ROWS))
+        if not chunk:
+            break
+        kept = []
+        for i, fields in enumerate(chunk):
+            # Puste wiersze (np. na końcu pliku) pomijamy jak braki danych
+            if not any(f.strip() for f in fields):
+                continue
+            if len(fields) < 2:
+                raise ValueError(f"Wiersz {line_offset + n_used + n_skipped + i}: wymagane 2 kolumny")
+            kept.append(fields)
+        n_blank = len(chunk) - len(kept)
+        if not kept:
+            n_skipped += n_blank
+            continue
+        rows = np.array([f[0].strip() for f in kept])
+        cols = np.array([f[1].strip() for f in kept])
+
+        # Braki danych (puste pola) są pomijane
+        valid = (rows != '') & (cols != '')
+        n_skipped += n_blank + int(len(kept) - np.count_nonzero(valid))
+        rows = rows[valid]
+        cols = cols[valid]
+        n_used += len(rows)
+        if len(rows) == 0:
+            continue
+
+        # Kody lokalne -> kody globalne (słownik odwiedzany raz na kategorię)
+        row_uniq, row_inv = np.unique(rows, return_inverse=True)
+        col_uniq, col_inv = np.unique(cols, return_inverse=True)
+        row_lut = np.array([row_codes.setdefault(u, len(row_codes)) for u in row_uniq.tolist()])
+        col_lut = np.array([col_codes.setdefault(u, len(col_codes)) for u in col_uniq.tolist()])
+        if len(row_codes) > MAX_TABLE_DIM or len(col_codes) > MAX_TABLE_DIM:
+            raise ValueError(f"Zmienna może mieć maksymalnie {MAX_TABLE_DIM} kategorii")
+
+        n_r, n_c = len(row_codes), len(col_codes)
+        counts = np.bincount(row_lut[row_inv] * n_c + col_lut[col_inv], minlength=n_r * n_c)
+        grown = np.zeros((n_r, n_c), dtype=np.int64)
+        grown[:table.shape[0], :table.shape[1]] = table
+        table = grown + counts.reshape(n_r, n_c)
+
+    if n_used == 0:
+        raise ValueError("Plik nie zawiera obserwacji")
+
+    # Kategorie w porządku alfabetycznym (niezależnie od kolejności w pliku)
+    row_labels = sorted(row_codes)
+    col_labels = sorted(col_codes)
+    table = table[np.ix_([row_codes[l] for l in row_labels], [col_codes[l] for l in col_labels])]
+    return table, row_labels, col_labels, variables, n_used, n_skipped
+
+
+def _pearson_statistic_batch(tables, expected):
+    """Statystyka Pearsona (bez poprawki Yatesa) dla stosu tabel (..., r, c)."""
+    diff = tables - expected
+    return np.sum(diff * diff / expected, axis=(-2, -1))
+
+
+def _mc_count_exceedances(task):
+    """
+    Losuje tabele o ustalonych brzegach (algorytm Patefielda) paczkami
+    i liczy statystyki nie mniejsze od obserwowanej.
+
+    Pierwsza paczka ma MC_FIRST_BATCH tabel; kolejne rosną dwukrotnie do
+    MC_BATCH_SIZE (mniej dla dużych tabel, limit SIM_MAX_CELLS), a przy
+    limicie czasu nie więcej niż zmieści się do deadline wg zmierzonego
+    kosztu jednej tabeli. Podział na paczki nie zmienia wylosowanych tabel.
+
+    Funkcja modułowa - uruchamiana także w procesach puli.
+
+    Args:
+        task: (row_sums, col_sums, threshold, n_sim, seed, deadline, first) -
+            deadline to czas zegara ściennego (time.time(), wspólny dla procesów)
+            albo None; strumień first zawsze wykonuje co najmniej jedną paczkę
+
+    Returns:
+        tuple: (liczba przekroczeń, liczba wykonanych symulacji)
+    """
+    row_sums, col_sums, threshold, n_sim, seed, deadline, first = task
+    dist = stats.random_table(row_sums, col_sums, seed=np.random.default_rng(seed))
+    expected = np.outer(row_sums, col_sums) / row_sums.sum()
+
+    max_batch = max(1, min(MC_BATCH_SIZE, SIM_MAX_CELLS // expected.size))
+    batch = min(MC_FIRST_BATCH, max_batch)
+
+    exceed = 0
+    done = 0
+    while done < n_sim:
+        now = time.time()
+        if deadline is not None and now > deadline and (done or not first):
+            break
+        size = min(batch, n_sim - done)
+        tables = dist.rvs(size=size, method='patefield')
+        exceed += int(np.count_nonzero(_pearson_statistic_batch(tables, expected) >= threshold))
+        done += size
+
+        batch = min(2 * batch, max_batch)
+        if deadline is not None:
+            per_table = max(time.time() - now, 1e-9) / size
+            batch = max(1, min(batch, int((deadline - time.time()) / per_table)))
+    return exceed, done
+
+
+def _monte_carlo_p_value(table, statistic, n_sim=MC_DEFAULT_SIMULATIONS, seed=None,
+                         time_budget=MC_TIME_BUDGET, workers=1):
+    """
+    Monte Carlo p-value testu niezależności przy ustalonych brzegach tabeli.
+
+    Symulacje dzielone są na MC_STREAMS strumieni (SeedSequence.spawn), więc
+    bez limitu czasu ten sam seed daje ten sam wynik przy dowolnym workers.
+
+    Args:
+        table: zwalidowana tabela liczności całkowitych
+        statistic: obserwowana statystyka Pearsona (bez poprawki Yatesa)
+        n_sim: żądana liczba symulacji
+        seed: ziarno generatora (None = losowe)
+        time_budget: limit czasu w sekundach (None = bez limitu), liczony razem
+            z uruchomieniem puli; po jego przekroczeniu wynik opiera się
+            na wykonanych symulacjach
+        workers: liczba procesów (domyślnie 1 - zapytania interaktywne liczone
+            są w bieżącym procesie; 0/None = wszystkie rdzenie)
+
+    Returns:
+        dict: p_value, ci_lower, ci_upper, confidence, n_simulations, requested, truncated, elapsed_ms
+    """
+    row_sums = np.rint(table.sum(axis=1)).astype(np.int64)
+    col_sums = np.rint(table.sum(axis=0)).astype(np.int64)
+    # Tolerancja na błędy zaokrągleń (tabele identyczne z obserwowaną się liczą)
+    threshold = statistic - 1e-7 * max(1.0, abs(statistic))
+
+    start = time.perf_counter()
+    deadline = time.time() + time_budget if time_budget is not None else None
+    seeds = np.random.SeedSequence(seed).spawn(MC_STREAMS)
+    tasks = [(row_sums, col_sums, threshold, n_sim // MC_STREAMS + (i < n_sim % MC_STREAMS),
+              s, deadline, i == 0)
+             for i, s in enumerate(seeds)]
+
+    results = parallel_map(_mc_count_exceedances, tasks, workers=resolve_workers(workers))
+    elapsed = time.perf_counter() - start
+
+    exceed = sum(r[0] for r in results)
+    done = sum(r[1] for r in results)
+
+    # Przedział Cloppera-Pearsona dla prawdopodobieństwa przekroczenia
+    tail = (1 - MC_CONFIDENCE) / 2
+    ci_lower = float(stats.beta.ppf(tail, exceed, done - exceed + 1)) if exceed > 0 else 0.0
+    ci_upper = float(stats.beta.ppf(1 - tail, exceed + 1, done - exceed)) if exceed < done else 1.0
+
+    return {
+        'p_value': (exceed + 1) / (done + 1),
+        'ci_lower': ci_lower,
+        'ci_upper': ci_upper,
+        'confidence': MC_CONFIDENCE,
+        'n_simulations': done,
+        'requested': n_sim,
+        'truncated': done < n_sim,
+        'elapsed_ms': round(elapsed * 1000, 1),
+    }
+
+
+def _chi_square_kernel(table):
+    """
+    Jednoprzebiegowe jądro testu niezależności.
+
+    Brzegi i wartości oczekiwane liczone są raz; z reszt (O - E) wyprowadzane
+    są wszystkie statystyki, bez ponownego przeliczania brzegów.
+
+    Args:
+        table: zwalidowana tabela liczności (r, c)
+
+    Returns:
+        dict: n, df, expected, contributions, pearson (bez poprawki),
+        yates (tylko 2x2, inaczej None), g_stat (iloraz wiarygodności),
+        std_residuals, adj_residuals
+    """
+    row_sums = table.sum(axis=1)
+    col_sums = table.sum(axis=0)
+    n = row_sums.sum()
+    row_frac = row_sums / n
+    col_frac = col_sums / n
+    df = (table.shape[0] - 1) * (table.shape[1] - 1)
+
+    expected = np.multiply.outer(row_sums, col_frac)
+    resid = table - expected
+
+    # Reszty standaryzowane (O - E) / sqrt(E); ich kwadraty to wkłady komórek
+    std_residuals = resid / np.sqrt(expected)
+    contributions = np.square(std_residuals)
+    pearson = contributions.sum()
+
+    # Reszty skorygowane (Haberman): dzielone przez sqrt((1 - r_i/n)(1 - c_j/n))
+    adj_residuals = std_residuals / np.sqrt(np.multiply.outer(1 - row_frac, 1 - col_frac))
+
+    # Poprawka Yatesa - jak w chi2_contingency (tylko df = 1)
+    yates = None
+    if df == 1:
+        abs_resid = np.abs(resid)
+        abs_resid -= np.minimum(0.5, abs_resid)
+        np.square(abs_resid, out=abs_resid)
+        yates = (abs_resid / expected).sum()
+
+    # Statystyka G = 2 * sum O ln(O / E); komórki z O = 0 nie wnoszą wkładu
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ratio = np.log(table / expected)
+        log_ratio *= table
+    g_stat = 2 * np.sum(log_ratio, where=table > 0)
+
+    return {
+        'n': n,
+        'df': df,
+        'expected': expected,
+        'contributions': contributions,
+        'pearson': pearson,
+        'yates': yates,
+        'g_stat': g_stat,
+        'std_residuals': std_residuals,
+        'adj_residuals': adj_residuals,
+    }
+
+
+def _compute_chi_square(table, alpha, mc_simulations=MC_DEFAULT_SIMULATIONS, seed=None,
+                        mc_time_budget=MC_TIME_BUDGET, include_cells=None):
     """
     Oblicza test chi-kwadrat dla zwalidowanej tabeli.
 
+    Statystyka główna to Pearson z poprawką Yatesa dla tabel 2x2 (jak
+    chi2_contingency); dodatkowo zwracana jest statystyka G.
+    Gdy część wartości oczekiwanych < 5 (a tabela zawiera liczności
+    całkowite), dołącza Monte Carlo p-value w polu 'monte_carlo'.
+    Tablice per-komórka są dołączane tylko gdy include_cells
+    (None = dla tabel do CELL_ARRAYS_LIMIT komórek).
+
     Returns:
         dict z wynikami gotowymi do jsonify
     """
-    chi2_stat, p_value, dof, expected = stats.chi2_contingency(table)
+    kernel = _chi_square_kernel(table)
+    dof = kernel['df']
+    expected = kernel['expected']
+    contributions = kernel['contributions']
+    chi2_stat = kernel['yates'] if kernel['yates'] is not None else kernel['pearson']
+    p_value = stats.chi2.sf(chi2_stat, dof)
+    g_p_value = stats.chi2.sf(kernel['g_stat'], dof)
     critical_value = float(stats.chi2.ppf(1 - alpha, dof))
 
     # V Craméra
-    n = table.sum()
+    n = kernel['n']
     min_dim = min(table.shape[0] - 1, table.shape[1] - 1)
     cramers_v = float(np.sqrt(chi2_stat / (n * min_dim))) if min_dim > 0 and n > 0 else 0
 
-    # Wkłady komórek
-    contributions = ((table - expected) ** 2) / expected
-
     # Zabezpieczenie przed NaN/Infinity w wynikach
     def safe_float(val):
         f = float(val)
@@ -94,26 +563,170 @@ def _compute_chi_square(table, alpha):
     p_safe = safe_float(p_value)
     crit_safe = safe_float(critical_value)
     v_safe = safe_float(cramers_v)
+    g_safe = safe_float(kernel['g_stat'])
+    g_p_safe = safe_float(g_p_value)
 
     # Ostrzeżenia
     warnings = []
+    monte_carlo = None
     if np.any(expected < 5):
         warnings.append(
             "Uwaga: niektóre wartości oczekiwane są mniejsze niż 5. "
             "Wynik testu może być niewiarygodny."
         )
+        if mc_simulations > 0 and np.all(table == np.round(table)):
+            monte_carlo = _monte_carlo_p_value(
+                table, float(kernel['pearson']), mc_simulations,
+                seed=seed, time_budget=mc_time_budget
+            )
+            warnings.append(
+                "Dołączono p-value z symulacji Monte Carlo (ustalone sumy brzegowe)."
+            )
 
-    return {
+    result = {
         'chi_square': round(chi2_safe, 4) if chi2_safe is not None else 0,
         'df': int(dof),
         'p_value': p_safe if p_safe is not None else 1.0,
         'critical_value': round(crit_safe, 4) if crit_safe is not None else None,
         'significant': bool(p_safe is not None and p_safe < alpha),
         'cramers_v': round(v_safe, 4) if v_safe is not None else 0,
-        'expected': np.round(expected, 2).tolist(),
-        'contributions': np.round(contributions, 4).tolist(),
+        'yates_correction': kernel['yates'] is not None,
+        'chi_square_uncorrected': round(float(kernel['pearson']), 4),
+        'g_statistic': round(g_safe, 4) if g_safe is not None else 0,
+        'g_p_value': g_p_safe if g_p_safe is not None else 1.0,
+        'shape': list(table.shape),
+        'cells_included': _include_cells(include_cells, table),
+        'min_expected': round(float(expected.min()), 4),
+        'max_contribution': round(float(contributions.max()), 4),
+        'monte_carlo': monte_carlo,
         'warnings': warnings
     }
+    if result['cells_included']:
+        result['expected'] = np.round(expected, 2).tolist()
+        result['contributions'] = np.round(contributions, 4).tolist()
+        result['std_residuals'] = np.round(kernel['std_residuals'], 4).tolist()
+        result['adj_residuals'] = np.round(kernel['adj_residuals'], 4).tolist()
+    return result
+
+
+def _pearson_statistic_free_margins(tables, correction=False):
+    """
+    Statystyka Pearsona dla stosu tabel (..., r, c) z wartościami oczekiwanymi
+    liczonymi z brzegów każdej tabeli. Komórki z zerową wartością oczekiwaną
+    (pusty wiersz/kolumna w symulacji) nie wnoszą wkładu.
+
+    Args:
+        tables: tablica liczności (..., r, c)
+        correction: poprawka Yatesa (jak chi2_contingency dla df=1)
+    """
+    n = tables.sum(axis=(-2, -1))[..., None, None]
+    expected = tables.sum(axis=-1)[..., :, None] * tables.sum(axis=-2)[..., None, :] / n
+    diff = np.abs(tables - expected)
+    if correction:
+        diff = diff - np.minimum(0.5, diff)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contrib = np.where(expected > 0, diff * diff / expected, 0.0)
+    return contrib.sum(axis=(-2, -1))
+
+
+def _iter_null_statistics(row_sums, col_sums, n, n_sim, seed):
+    """
+    Losuje tabele przy niezależności (rozkład wielomianowy z p_ij = p_i * q_j)
+    paczkami po NULL_CHUNK_SIZE (mniej dla dużych tabel, limit SIM_MAX_CELLS).
+
+    Yields:
+        tuple: (liczba wykonanych symulacji, statystyki z bieżącej paczki)
+    """
+    rng = np.random.default_rng(seed)
+    probs = np.outer(row_sums / row_sums.sum(), col_sums / col_sums.sum())
+    shape = probs.shape
+    probs = probs.ravel()
+    chunk = max(1, min(NULL_CHUNK_SIZE, SIM_MAX_CELLS // probs.size))
+
+    done = 0
+    while done < n_sim:
+        size = min(chunk, n_sim - done)
+        tables = rng.multinomial(n, probs, size=size).reshape(size, *shape)
+        done += size
+        yield done, _pearson_statistic_free_margins(tables)
+
+
+def _null_distribution_events(row_sums, col_sums, n, n_sim, seed):
+    """
+    Przebieg symulacji rozkładu zerowego z cache.
+
+    Yields:
+        ('progress', ułamek) po każdej paczce, na końcu ('result', posortowane statystyki)
+    """
+    key = (tuple(row_sums.tolist()), tuple(col_sums.tolist()), n, n_sim, seed)
+    with _null_cache_lock:
+        cached = _null_cache.get(key)
+        if cached is not None:
+            _null_cache.move_to_end(key)
+    if cached is not None:
+        yield 'progress', 1.0
+        yield 'result', cached
+        return
+
+    chunks = []
+    for done, chunk in _iter_null_statistics(row_sums, col_sums, n, n_sim, seed):
+        chunks.append(chunk)
+        yield 'progress', done / n_sim
+
+    simulated = np.sort(np.concatenate(chunks))
+    with _null_cache_lock:
+        _null_cache[key] = simulated
+        while len(_null_cache) > NULL_CACHE_SIZE:
+            _null_cache.popitem(last=False)
+    yield 'result', simulated
+
+
+def _summarize_null_distribution(simulated, df, observed, overlay=True):
+    """
+    Histogram symulowanych statystyk (gęstość) z opcjonalną krzywą chi2(df).
+
+    Gęstość normalizowana jest przez liczbę wszystkich symulacji, więc pole
+    histogramu plus share_beyond (statystyki powyżej zakresu) daje 1.
+
+    Args:
+        simulated: posortowane symulowane statystyki
+        df: stopnie swobody
+        observed: obserwowana statystyka Pearsona (bez poprawki Yatesa)
+        overlay: czy dołączyć gęstość teoretyczną
+
+    Returns:
+        dict gotowy do jsonify
+    """
+    upper = max(float(np.quantile(simulated, 0.995)), float(stats.chi2.ppf(0.995, df)), observed)
+    counts, edges = np.histogram(simulated, bins=NULL_HIST_BINS, range=(0, upper))
+    density = counts / (len(simulated) * np.diff(edges))
+    share_beyond = 1 - counts.sum() / len(simulated)
+    share_above = 1 - np.searchsorted(simulated, observed - 1e-7 * max(1.0, observed)) / len(simulated)
+
+    result = {
+        'df': int(df),
+        'observed': round(observed, 4),
+        'share_above_observed': float(share_above),
+        'n_simulations': int(len(simulated)),
+        'histogram': {
+            'edges': np.round(edges, 4).tolist(),
+            'density': np.round(density, 6).tolist(),
+            'share_beyond': float(share_beyond),
+        },
+        'simulated_mean': round(float(simulated.mean()), 4),
+        'simulated_variance': round(float(simulated.var(ddof=1)), 4),
+        'theoretical_mean': int(df),
+        'theoretical_variance': int(2 * df),
+    }
+    if overlay:
+        x = np.linspace(0, upper, 200)
+        pdf = stats.chi2.pdf(x, df)
+        result['pdf'] = {
+            'x': np.round(x, 4).tolist(),
+            # chi2(1) ma biegun w zerze - zamieniamy Inf na None
+            'y': [None if not np.isfinite(v) else round(float(v), 6) for v in pdf],
+        }
+    return result
 
 
 @app.route('/')
@@ -130,10 +743,19 @@ def compute():
     Request JSON:
         table: 2D tablica liczności obserwowanych
         alpha: poziom istotności (domyślnie 0.05)
+        mc_simulations: liczba symulacji Monte Carlo (domyślnie 10000, 0 = wyłączone)
+        seed: ziarno symulacji (opcjonalne)
+        include_cells: czy zwrócić expected/contributions (domyślnie tylko do 100 komórek)
+
+    Nagłówek X-Client-Id (opcjonalny): gdy ten sam klient wyśle nowsze zapytanie,
+    czekające starsze dostają odpowiedź {success: false, status: 'superseded'}.
 
     Response JSON:
         chi_square, df, p_value, critical_value, significant,
-        cramers_v, expected, contributions, warnings
+        cramers_v, yates_correction, chi_square_uncorrected, g_statistic, g_p_value,
+        shape, cells_included, min_expected, max_contribution,
+        expected, contributions, std_residuals, adj_residuals (gdy cells_included),
+        monte_carlo, warnings
     """
     try:
         data = _validate_request_json()
@@ -144,9 +766,21 @@ def compute():
         table = np.array(data['table'], dtype=float)
         alpha = _validate_alpha(data.get('alpha', 0.05))
 
+        n_sim = _validate_simulations(data.get('mc_simulations', MC_DEFAULT_SIMULATIONS))
+        seed = data.get('seed', None)
+        if seed is not None:
+            seed = int(seed)
+
         _validate_table(table)
+        include_cells = _validate_include_cells(data.get('include_cells', None))
 
-        result = _compute_chi_square(table, alpha)
+        result = _coalescer.run(
+            client_id_from_request(), 'compute',
+            lambda: _compute_chi_square(table, alpha, n_sim, seed,
+                                        include_cells=include_cells)
+        )
+        if result is SUPERSEDED:
+            return superseded_response()
         result['success'] = True
         return jsonify(result)
 
@@ -169,9 +803,13 @@ def generate_from_percentages():
         n: całkowita liczebność próbki
         row_split: [0.6, 0.4] - udział każdego wiersza
         alpha: poziom istotności (domyślnie 0.05)
+        include_cells: jak w /api/compute
+
+    Nagłówek X-Client-Id: jak w /api/compute.
 
     Response JSON:
         Jak /api/compute + pole 'table' z wygenerowanymi liczebnościami
+        (gdy cells_included)
     """
     try:
         data = _validate_request_json()
@@ -179,7 +817,6 @@ def generate_from_percentages():
         if 'row_percentages' not in data:
             raise ValueError("Brak wymaganego pola 'row_percentages'")
 
-        row_percentages = np.array(data['row_percentages'], dtype=float)
         alpha = _validate_alpha(data.get('alpha', 0.05))
 
         # Walidacja n
@@ -187,46 +824,244 @@ def generate_from_percentages():
         if n_raw is None:
             raise ValueError("Wielkość próby (n) nie może być pusta")
         n = int(n_raw)
-        if n < 10 or n > 10000:
-            raise ValueError("Liczebność próbki musi być między 10 a 10000")
-
-        row_split = np.array(data.get('row_split', [0.5, 0.5]), dtype=float)
-
-        # Walidacja
-        if np.any(np.isnan(row_percentages)) or np.any(np.isinf(row_percentages)):
-            raise ValueError("Procenty nie mogą zawierać NaN lub nieskończonych wartości")
-        if row_percentages.ndim != 2:
-            raise ValueError("row_percentages musi być tablicą 2D")
-        if row_percentages.shape[0] < 2 or row_percentages.shape[1] < 2:
-            raise ValueError("Tabela musi mieć co najmniej 2 wiersze i 2 kolumny")
-        if len(row_split) != row_percentages.shape[0]:
-            raise ValueError("row_split musi mieć tyle elementów ile wierszy")
-        if np.any(np.isnan(row_split)) or np.any(np.isinf(row_split)):
-            raise ValueError("row_split nie może zawierać NaN lub nieskończonych wartości")
-
-        # Normalizuj row_split
-        row_split = row_split / row_split.sum()
-
-        # Oblicz liczności wierszy
-        row_totals = np.round(n * row_split).astype(int)
-        row_totals[-1] = n - row_totals[:-1].sum()
-
-        # Generuj tabelę liczności
-        table = np.zeros_like(row_percentages, dtype=int)
-        for i in range(row_percentages.shape[0]):
-            pcts = row_percentages[i] / row_percentages[i].sum() * 100
-            counts = np.round(row_totals[i] * pcts / 100).astype(int)
-            counts[-1] = row_totals[i] - counts[:-1].sum()
-            table[i] = counts
-
-        # Upewnij się że nie ma ujemnych wartości
-        table = np.maximum(table, 0)
+        if n < 10 or n > MAX_N:
+            raise ValueError(f"Liczebność próbki musi być między 10 a {MAX_N}")
+
+        row_percentages, row_split = _validate_percentages(data)
+
+        # Generuj tabelę liczności (wszystkie wiersze naraz)
+        table = _table_from_percentages(n, row_percentages, row_split)
 
         _validate_table(table)
+        include_cells = _validate_include_cells(data.get('include_cells', None))
 
-        result = _compute_chi_square(table, alpha)
+        result = _coalescer.run(
+            client_id_from_request(), 'generate-from-percentages',
+            lambda: _compute_chi_square(table, alpha, include_cells=include_cells)
+        )
+        if result is SUPERSEDED:
+            return superseded_response()
         result['success'] = True
-        result['table'] = table.tolist()
+        if result['cells_included']:
+            result['table'] = table.tolist()
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany błąd serwera'
+        }), 500
+
+
+@app.route('/api/null-distribution', methods=['POST'])
+def null_distribution():
+    """
+    Symuluje rozkład statystyki chi-kwadrat przy niezależności
+    dla brzegów bieżącej tabeli.
+
+    Request JSON:
+        table: 2D tablica liczności (źródło brzegów i obserwowanej statystyki)
+        n: liczebność symulowanych tabel (domyślnie suma tabeli)
+        simulations: liczba symulacji (domyślnie 10000, max 200000)
+        seed: ziarno (opcjonalne; bez niego losowane i zwracane)
+        overlay: czy dołączyć gęstość chi2(df) (domyślnie true)
+        stream: gdy true - odpowiedź NDJSON z postępem ({"progress": ...})
+                i wynikiem w ostatniej linii
+
+    Response JSON:
+        df, observed, share_above_observed, n_simulations,
+        histogram{edges, density, share_beyond},
+        simulated_mean, simulated_variance, theoretical_mean, theoretical_variance,
+        pdf{x, y} (gdy overlay), seed
+    """
+    try:
+        data = _validate_request_json()
+
+        if 'table' not in data:
+            raise ValueError("Brak wymaganego pola 'table'")
+
+        table = np.array(data['table'], dtype=float)
+        _validate_table(table)
+
+        n_raw = data.get('n', None)
+        n = int(round(table.sum())) if n_raw is None else int(n_raw)
+        if n < 2 or n > 1000000:
+            raise ValueError("Liczebność próbki musi być między 2 a 1000000")
+
+        n_sim = int(data.get('simulations', NULL_DEFAULT_SIMULATIONS))
+        if n_sim < 100 or n_sim > NULL_MAX_SIMULATIONS:
+            raise ValueError(f"Liczba symulacji musi być między 100 a {NULL_MAX_SIMULATIONS}")
+
+        seed = data.get('seed', None)
+        seed = int(np.random.SeedSequence().entropy % (2 ** 32)) if seed is None else int(seed)
+        overlay = bool(data.get('overlay', True))
+
+        row_sums = table.sum(axis=1)
+        col_sums = table.sum(axis=0)
+        expected = np.outer(row_sums, col_sums) / table.sum()
+        observed = float(np.sum((table - expected) ** 2 / expected))
+        df = (table.shape[0] - 1) * (table.shape[1] - 1)
+
+        events = _null_distribution_events(row_sums, col_sums, n, n_sim, seed)
+
+        def finish(simulated):
+            result = _summarize_null_distribution(simulated, df, observed, overlay)
+            result['seed'] = seed
+            result['success'] = True
+            return result
+
+        if data.get('stream', False):
+            def generate():
+                # Status 200 jest już wysłany - błąd zgłaszamy ostatnią linią
+                try:
+                    for kind, payload in events:
+                        if kind == 'progress':
+                            yield json.dumps({'progress': round(payload, 4)}) + '\n'
+                        else:
+                            yield json.dumps(finish(payload)) + '\n'
+                except (ValueError, TypeError) as e:
+                    yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+                except Exception:
+                    yield json.dumps({'success': False,
+                                      'error': 'Nieoczekiwany błąd serwera'}) + '\n'
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        simulated = None
+        for kind, payload in events:
+            if kind == 'result':
+                simulated = payload
+        return jsonify(finish(simulated))
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany błąd serwera'
+        }), 500
+
+
+@app.route('/api/power', methods=['POST'])
+def power_analysis():
+    """
+    Analiza mocy testu chi-kwadrat na siatce liczebności i poziomów istotności.
+
+    Request JSON:
+        row_percentages: [[40, 35, 25], [35, 35, 30]] - założony efekt (H1)
+        row_split: [0.6, 0.4] - udział każdego wiersza
+        n_values: lista liczebności (opcjonalnie; inaczej siatka n_min..n_max)
+        n_min, n_max, n_steps: siatka równomierna (domyślnie 20, 1000, 25)
+        alphas: lista poziomów istotności (domyślnie [0.01, 0.05, 0.1])
+        simulations: liczba symulacji na punkt siatki (domyślnie 1000)
+        seed: ziarno (opcjonalne)
+
+    Response JSON:
+        n_values, alphas, df, effect_size_w, power[alpha][n],
+        analytic[alpha][n], required_n (pierwsze n z mocą >= 0.8), target_power
+    """
+    try:
+        data = _validate_request_json()
+
+        if 'row_percentages' not in data:
+            raise ValueError("Brak wymaganego pola 'row_percentages'")
+
+        row_percentages, row_split = _validate_percentages(data)
+
+        if 'n_values' in data:
+            n_values = np.array(data['n_values'], dtype=float)
+        else:
+            n_values = np.linspace(float(data.get('n_min', 20)), float(data.get('n_max', 1000)),
+                                   int(data.get('n_steps', 25)))
+        if n_values.ndim != 1 or len(n_values) < 1 or len(n_values) > POWER_MAX_GRID:
+            raise ValueError(f"Siatka n musi mieć od 1 do {POWER_MAX_GRID} wartości")
+        if not np.all(np.isfinite(n_values)):
+            raise ValueError("Wartości n muszą być liczbami skończonymi")
+        n_values = np.unique(np.round(n_values).astype(int))
+        if n_values[0] < 10 or n_values[-1] > 100000:
+            raise ValueError("Liczebność próbki musi być między 10 a 100000")
+
+        alphas = np.array([_validate_alpha(a) for a in data.get('alphas', POWER_DEFAULT_ALPHAS)])
+        if len(alphas) < 1 or len(alphas) > 10:
+            raise ValueError("Lista alphas musi mieć od 1 do 10 wartości")
+
+        n_sim = int(data.get('simulations', POWER_DEFAULT_SIMULATIONS))
+        if n_sim < 100 or n_sim > POWER_MAX_SIMULATIONS:
+            raise ValueError(f"Liczba symulacji musi być między 100 a {POWER_MAX_SIMULATIONS}")
+
+        seed = data.get('seed', None)
+        if seed is not None:
+            seed = int(seed)
+
+        result = _simulate_power(row_percentages, row_split, n_values, alphas, n_sim, seed)
+        result.update({
+            'success': True,
+            'n_values': n_values.tolist(),
+            'alphas': alphas.tolist(),
+            'simulations': n_sim,
+            'target_power': POWER_TARGET,
+        })
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany błąd serwera'
+        }), 500
+
+
+@app.route('/api/upload-raw', methods=['POST'])
+def upload_raw():
+    """
+    Buduje tabelę kontyngencji z pliku CSV surowych obserwacji i oblicza test.
+
+    Request (multipart/form-data):
+        file: plik CSV, dwie pierwsze kolumny to zmienne kategoryczne
+        header: 'true'/'false' - czy pierwszy wiersz to nagłówek (domyślnie true)
+        delimiter: separator pól (domyślnie ',')
+        alpha: poziom istotności (domyślnie 0.05)
+        include_cells: jak w /api/compute
+
+    Response JSON:
+        Jak /api/compute + row_labels, col_labels, variables, n_observations,
+        skipped_rows oraz 'table' (gdy cells_included)
+    """
+    try:
+        if 'file' not in request.files:
+            raise ValueError("Brak wymaganego pliku 'file'")
+
+        form = request.form
+        alpha = _validate_alpha(form.get('alpha', 0.05))
+        header = form.get('header', 'true').lower() not in ('false', '0', 'no')
+        delimiter = form.get('delimiter', ',')
+        if len(delimiter) != 1:
+            raise ValueError("Separator musi być pojedynczym znakiem")
+        include_cells = form.get('include_cells', None)
+        if include_cells is not None:
+            include_cells = _validate_form_flag(include_cells, 'include_cells')
+
+        try:
+            table, row_labels, col_labels, variables, n_used, n_skipped = \
+                _crosstab_from_csv(request.files['file'].stream, delimiter, header)
+        except (UnicodeDecodeError, csv.Error):
+            raise ValueError("Niepoprawny plik CSV (wymagane kodowanie UTF-8)")
+
+        _validate_table(table)
+
+        result = _compute_chi_square(table, alpha, include_cells=include_cells)
+        result.update({
+            'success': True,
+            'row_labels': row_labels,
+            'col_labels': col_labels,
+            'variables': variables,
+            'n_observations': n_used,
+            'skipped_rows': n_skipped,
+        })
+        if result['cells_included']:
+            result['table'] = table.tolist()
         return jsonify(result)
 
     except (ValueError, TypeError) as e:
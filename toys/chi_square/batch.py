@@ -0,0 +1,207 @@
+"""
+Wsadowe obliczanie testu chi-kwadrat bez uruchamiania Flask i PyWebView.
+
+Czyta tabele ze strumienia NDJSON lub CSV (plik lub stdin), liczy test tą
+samą walidacją i funkcją co aplikacja (_validate_table, _compute_chi_square)
+i zapisuje wyniki jako NDJSON - jedna linia na tabelę, w kolejności wejścia.
+
+Formaty wejścia:
+    NDJSON: {"id": "t1", "table": [[10, 20], [30, 40]], "alpha": 0.05}
+    CSV (format długi, wiersze jednej tabeli kolejno po sobie):
+        id,row,col,count
+        t1,K,tak,10
+        t1,K,nie,20
+        ...
+
+Użycie:
+    python batch.py tabele.ndjson -o wyniki.ndjson --workers 4
+    cat tabele.csv | python batch.py --format csv
+"""
+import argparse
+import csv
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+_TOY_DIR = os.path.dirname(os.path.abspath(__file__))
+_TOYS_DIR = os.path.normpath(os.path.join(_TOY_DIR, '..'))
+if _TOYS_DIR not in sys.path:
+    sys.path.insert(0, _TOYS_DIR)
+
+from common.parallel import parallel_imap  # noqa: E402
+
+
+def _load_app_module():
+    """
+    Ładuje app.py zabawki pod unikalną nazwą (jak conftest testów) - bez
+    katalogu zabawki w sys.path, więc sys.modules['app'] nie jest zajmowane.
+    """
+    name = 'chi_square_app'
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_TOY_DIR, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_app = _load_app_module()
+_compute_chi_square = _app._compute_chi_square
+_validate_alpha = _app._validate_alpha
+_validate_table = _app._validate_table
+
+
+def _read_ndjson(lines):
+    """Zwraca rekordy (id, table, alpha) z linii NDJSON. Puste linie są pomijane."""
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield (line_no, None, None, "Niepoprawny JSON")
+            continue
+        if not isinstance(record, dict):
+            yield (line_no, None, None, "Rekord musi być obiektem JSON")
+            continue
+        yield (record.get('id', line_no), record.get('table'), record.get('alpha'), None)
+
+
+def _read_long_csv(lines):
+    """
+    Zwraca rekordy (id, table, None) z CSV w formacie długim (id,row,col,count).
+    Kategorie wierszy i kolumn są ustawiane w kolejności pierwszego wystąpienia.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    if [h.strip().lower() for h in header[:4]] != ['id', 'row', 'col', 'count']:
+        raise ValueError("CSV musi mieć nagłówek: id,row,col,count")
+
+    for table_id, rows in itertools.groupby(reader, key=lambda f: f[0] if f else ''):
+        rows = [r for r in rows if r]
+        if not rows:
+            continue
+        try:
+            row_idx = {}
+            col_idx = {}
+            cells = []
+            for r in rows:
+                i = row_idx.setdefault(r[1], len(row_idx))
+                j = col_idx.setdefault(r[2], len(col_idx))
+                cells.append((i, j, float(r[3])))
+            table = np.zeros((len(row_idx), len(col_idx)))
+            for i, j, count in cells:
+                table[i, j] += count
+            yield (table_id, table.tolist(), None, None)
+        except (IndexError, ValueError):
+            yield (table_id, None, None, "Wiersz CSV musi mieć pola id,row,col,count")
+
+
+def _process_record(task):
+    """
+    Liczy test dla jednego rekordu. Funkcja modułowa - uruchamiana w puli procesów.
+
+    Args:
+        task: ((id, table, alpha, error), options)
+
+    Returns:
+        dict: wynik jak z /api/compute, z polami 'id' i 'success'
+    """
+    (record_id, table_raw, alpha_raw, error), options = task
+    if error is not None:
+        return {'id': record_id, 'success': False, 'error': error}
+    try:
+        if table_raw is None:
+            raise ValueError("Brak wymaganego pola 'table'")
+        table = np.array(table_raw, dtype=float)
+        alpha = _validate_alpha(options['alpha'] if alpha_raw is None else alpha_raw)
+        _validate_table(table)
+        result = _compute_chi_square(table, alpha,
+                                     mc_simulations=options['mc_simulations'],
+                                     seed=options['seed'],
+                                     mc_time_budget=None,
+                                     include_cells=options['include_cells'])
+    except (ValueError, TypeError) as e:
+        return {'id': record_id, 'success': False, 'error': str(e)}
+    result['id'] = record_id
+    result['success'] = True
+    return result
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Test chi-kwadrat dla strumienia tabel (NDJSON/CSV) -> NDJSON")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="plik wejściowy (domyślnie stdin)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="plik wyjściowy NDJSON (domyślnie stdout)")
+    parser.add_argument('--format', choices=['auto', 'ndjson', 'csv'], default='auto',
+                        help="format wejścia (auto = wg rozszerzenia, stdin = ndjson)")
+    parser.add_argument('--alpha', type=float, default=0.05,
+                        help="domyślny poziom istotności")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="liczba procesów (0 = wszystkie rdzenie)")
+    parser.add_argument('--chunksize', type=int, default=64,
+                        help="liczba tabel wysyłanych do procesu naraz")
+    parser.add_argument('--mc-simulations', type=int, default=0,
+                        help="symulacje Monte Carlo dla małych wartości oczekiwanych (0 = wyłączone)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="ziarno symulacji Monte Carlo")
+    parser.add_argument('--include-cells', action='store_true',
+                        help="zawsze zwracaj expected/contributions")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Punkt wejścia CLI. Zwraca kod wyjścia (0 = wszystkie tabele poprawne)."""
+    args = _parse_args(argv)
+    fmt = args.format
+    if fmt == 'auto':
+        fmt = 'csv' if args.input.lower().endswith('.csv') else 'ndjson'
+
+    options = {
+        'alpha': args.alpha,
+        'mc_simulations': args.mc_simulations,
+        'seed': args.seed,
+        'include_cells': True if args.include_cells else None,
+    }
+
+    src = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8-sig', newline='')
+    dst = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    n_total = 0
+    n_failed = 0
+    start = time.perf_counter()
+    try:
+        records = _read_long_csv(src) if fmt == 'csv' else _read_ndjson(src)
+        tasks = ((record, options) for record in records)
+        for result in parallel_imap(_process_record, tasks, args.workers, args.chunksize):
+            dst.write(json.dumps(result, ensure_ascii=False) + '\n')
+            n_total += 1
+            n_failed += not result['success']
+    except ValueError as e:
+        print(f"Błąd: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+    elapsed = time.perf_counter() - start
+    rate = n_total / elapsed if elapsed > 0 else float('inf')
+    print(f"Przetworzono {n_total} tabel ({n_failed} błędnych) w {elapsed:.2f} s "
+          f"- {rate:.1f} tabel/s", file=sys.stderr)
+    return 1 if n_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
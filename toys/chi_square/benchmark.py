@@ -0,0 +1,112 @@
+"""
+Benchmarki zabawki chi-kwadrat.
+
+1. Jednoprzebiegowe jądro testu vs dotychczasowa ścieżka przez scipy.
+   Ścieżka scipy = chi2_contingency + osobne przeliczenie wkładów komórek
+   i V Craméra (tak liczył _compute_chi_square przed wprowadzeniem jądra).
+   Jądro liczy dodatkowo statystykę G, poprawkę Yatesa i reszty.
+
+2. Test obciążeniowy łączenia zapytań (X-Client-Id): kilku klientów
+   "przeciąga suwak", wysyłając serie zapytań; mierzymy czas do odpowiedzi
+   na ostatnie zapytanie serii (na nią czeka użytkownik).
+
+Użycie:
+    python benchmark.py
+"""
+import os
+import sys
+import threading
+import time
+import timeit
+
+import numpy as np
+from scipy import stats
+
+_TOY_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_TOY_DIR, '..'))
+sys.path.insert(0, _TOY_DIR)
+
+from app import _chi_square_kernel, app  # noqa: E402
+
+
+def _scipy_path(table):
+    """Poprzednia ścieżka: chi2_contingency + przeliczenie brzegów i wkładów."""
+    chi2_stat, p_value, dof, expected = stats.chi2_contingency(table)
+    n = table.sum()
+    min_dim = min(table.shape[0] - 1, table.shape[1] - 1)
+    cramers_v = np.sqrt(chi2_stat / (n * min_dim))
+    contributions = ((table - expected) ** 2) / expected
+    return chi2_stat, p_value, cramers_v, contributions
+
+
+def _kernel_path(table):
+    """Nowa ścieżka: jądro + p-value z rozkładu chi2."""
+    kernel = _chi_square_kernel(table)
+    chi2_stat = kernel['yates'] if kernel['yates'] is not None else kernel['pearson']
+    p_value = stats.chi2.sf(chi2_stat, kernel['df'])
+    g_p_value = stats.chi2.sf(kernel['g_stat'], kernel['df'])
+    return chi2_stat, p_value, g_p_value, kernel
+
+
+def bench_kernel():
+    rng = np.random.default_rng(0)
+    print(f"{'tabela':>10} {'scipy [us]':>12} {'jadro [us]':>12} {'przysp.':>8}")
+    for shape in [(2, 2), (5, 5), (10, 10), (50, 50), (100, 100)]:
+        table = rng.integers(5, 500, size=shape).astype(float)
+        number = 2000 if table.size <= 100 else 200
+        t_scipy = min(timeit.repeat(lambda: _scipy_path(table), number=number, repeat=5)) / number
+        t_kernel = min(timeit.repeat(lambda: _kernel_path(table), number=number, repeat=5)) / number
+        label = f"{shape[0]}x{shape[1]}"
+        print(f"{label:>10} {t_scipy * 1e6:12.1f} {t_kernel * 1e6:12.1f} {t_scipy / t_kernel:7.2f}x")
+
+
+def _drag_session(client_idx, n_requests, gap, use_client_id, table, latencies):
+    """Jeden klient: seria zapytań co `gap` sekund, jak przy przeciąganiu suwaka."""
+    client = app.test_client()
+    headers = {'X-Client-Id': f'load-{client_idx}'} if use_client_id else {}
+    threads = []
+    done_at = {}
+
+    def send(i):
+        client.post('/api/compute', json={'table': table, 'include_cells': True,
+                                          'mc_simulations': 0}, headers=headers)
+        done_at[i] = time.perf_counter()
+
+    for i in range(n_requests):
+        t = threading.Thread(target=send, args=(i,))
+        t.start()
+        threads.append(t)
+        last_sent = time.perf_counter()
+        time.sleep(gap)
+    for t in threads:
+        t.join()
+    latencies.append(done_at[n_requests - 1] - last_sent)
+
+
+def bench_coalescing(n_clients=8, n_requests=15, gap=0.005, rounds=3):
+    rng = np.random.default_rng(1)
+    table = rng.integers(5, 500, size=(60, 60)).tolist()
+    print(f"\n{'tryb':>16} {'p50 [ms]':>10} {'p95 [ms]':>10} {'max [ms]':>10}")
+    for use_client_id in (False, True):
+        latencies = []
+        for _ in range(rounds):
+            sessions = [threading.Thread(target=_drag_session,
+                                         args=(c, n_requests, gap, use_client_id, table, latencies))
+                        for c in range(n_clients)]
+            for t in sessions:
+                t.start()
+            for t in sessions:
+                t.join()
+        lat = np.array(latencies) * 1000
+        label = 'X-Client-Id' if use_client_id else 'bez laczenia'
+        print(f"{label:>16} {np.percentile(lat, 50):10.1f} {np.percentile(lat, 95):10.1f} "
+              f"{lat.max():10.1f}")
+
+
+def main():
+    bench_kernel()
+    bench_coalescing()
+
+
+if __name__ == '__main__':
+    main()
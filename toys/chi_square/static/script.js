@@ -25,6 +25,11 @@ const state = {
 // Debouncing
 let debounceTimer = null;
 
+// Identyfikator klienta - serwer liczy tylko najnowsze zapytanie danego klienta
+const CLIENT_ID = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : Math.random().toString(36).slice(2) + Date.now().toString(36);
+
 // Kolory wierszy dla wykresu (paleta Okabe-Ito, colorblind-safe)
 const ROW_COLORS = ['#0072B2', '#E69F00', '#CC79A7', '#D55E00'];
 const ROW_COLORS_LIGHT = ['rgba(0,114,178,0.35)', 'rgba(230,159,0,0.35)', 'rgba(204,121,167,0.35)', 'rgba(213,94,0,0.35)'];
@@ -425,7 +430,7 @@ async function triggerComputation() {
             const rowSplit = [state.rowSplitPct / 100, 1 - state.rowSplitPct / 100];
             response = await fetch('/api/generate-from-percentages', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'X-Client-Id': CLIENT_ID },
                 body: JSON.stringify({
                     row_percentages: state.rowPercentages,
                     n: state.sampleSize,
@@ -437,7 +442,7 @@ async function triggerComputation() {
             // Wyslij tabele bezposrednio
             response = await fetch('/api/compute', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'X-Client-Id': CLIENT_ID },
                 body: JSON.stringify({
                     table: state.table,
                     alpha: state.alpha
@@ -452,6 +457,9 @@ async function triggerComputation() {
 
         const data = await response.json();
 
+        // Nowsze zapytanie jest juz liczone - jego wynik zaktualizuje widok
+        if (data.status === 'superseded') return;
+
         if (data.success) {
             // Zapisz wyniki
             state.expected = data.expected;
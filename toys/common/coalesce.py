@@ -0,0 +1,101 @@
+"""
+Łączenie zapytań "najnowsze wygrywa" dla obliczeń sterowanych suwakami.
+
+Frontend wysyła zapytanie przy każdym ruchu suwaka lub przeciągnięciu
+punktu. Gdy serwer jest zajęty, starsze zapytania tego samego klienta
+czekają w kolejce, choć ich wynik i tak zostanie nadpisany. Coalescer
+wpuszcza do obliczeń tylko najnowsze zapytanie klienta; starsze, które
+jeszcze czekają, dostają tanią odpowiedź 'superseded'.
+
+Klient identyfikuje się nagłówkiem X-Client-Id (zapytania bez nagłówka
+są liczone normalnie).
+
+Użycie:
+    from common.coalesce import (LatestWinsCoalescer, SUPERSEDED,
+                                 client_id_from_request, superseded_response)
+
+    _coalescer = LatestWinsCoalescer()
+    result = _coalescer.run(client_id_from_request(), 'compute', lambda: compute(...))
+    if result is SUPERSEDED:
+        return superseded_response()
+"""
+import os
+import threading
+
+from flask import jsonify, request
+
+CLIENT_ID_HEADER = 'X-Client-Id'
+
+# Znacznik zwracany zamiast wyniku dla nieaktualnych zapytań
+SUPERSEDED = object()
+
+
+def client_id_from_request():
+    """Zwraca identyfikator klienta z nagłówka X-Client-Id (None gdy brak)."""
+    client_id = request.headers.get(CLIENT_ID_HEADER, '').strip()
+    return client_id[:64] or None
+
+
+def superseded_response():
+    """Odpowiedź dla zapytania zastąpionego nowszym (frontend ją ignoruje)."""
+    return jsonify({'success': False, 'status': 'superseded'})
+
+
+class LatestWinsCoalescer:
+    """
+    Wpuszcza do obliczeń tylko najnowsze zapytanie każdego klienta.
+
+    Każdy klient (i klucz, np. nazwa endpointu) liczy co najwyżej jedno
+    zapytanie naraz, a łączna liczba równoległych obliczeń jest ograniczona
+    do max_concurrent. Zapytanie, które po doczekaniu się na swoją kolej
+    nie jest już najnowsze, nie jest liczone.
+    """
+
+    def __init__(self, max_concurrent=None):
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent or os.cpu_count() or 1)
+        self._counter = 0
+        self._clients = {}  # (client_id, key) -> {'latest', 'pending', 'lock'}
+        self.superseded_count = 0
+
+    def _register(self, slot):
+        """Nadaje zapytaniu kolejny numer i oznacza je jako najnowsze dla klienta."""
+        with self._lock:
+            self._counter += 1
+            token = self._counter
+            entry = self._clients.setdefault(
+                slot, {'latest': 0, 'pending': 0, 'lock': threading.Lock()})
+            entry['latest'] = token
+            entry['pending'] += 1
+        return token, entry
+
+    def run(self, client_id, key, func):
+        """
+        Wykonuje func, o ile zapytanie jest nadal najnowsze dla klienta.
+
+        Args:
+            client_id: identyfikator klienta (None = bez łączenia)
+            key: rodzaj obliczenia (np. nazwa endpointu)
+            func: funkcja bez argumentów licząca wynik
+
+        Returns:
+            wynik func albo SUPERSEDED
+        """
+        if client_id is None:
+            with self._slots:
+                return func()
+
+        slot = (client_id, key)
+        token, entry = self._register(slot)
+        try:
+            with entry['lock'], self._slots:
+                with self._lock:
+                    if entry['latest'] != token:
+                        self.superseded_count += 1
+                        return SUPERSEDED
+                return func()
+        finally:
+            with self._lock:
+                entry['pending'] -= 1
+                if entry['pending'] == 0:
+                    self._clients.pop(slot, None)
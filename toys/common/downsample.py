@@ -0,0 +1,216 @@
+"""
+Redukcja dużych chmur punktów do wykresu rozrzutu.
+
+Przy tysiącach punktów wąskim gardłem jest przesłanie i narysowanie
+każdego punktu w Plotly, a nie obliczenia. Statystyki liczone są zawsze
+na pełnych danych; tutaj wybieramy tylko to, co trafia na wykres:
+
+- grid_counts: liczności w siatce bins x bins (mapa ciepła), jeden np.bincount,
+- hexbin_counts: liczności w sześciokątach (dwie przesunięte siatki prostokątne,
+  punkt trafia do bliższego środka), też jeden np.bincount,
+- thin_indices: przerzedzanie warstwowe do zadanego budżetu punktów -
+  zachowuje punkty skrajne (min/max x i y) i odstające (duża odległość
+  Mahalanobisa), a resztę losuje z komórek siatki proporcjonalnie do
+  ich liczności (każda niepusta komórka dostaje co najmniej jeden punkt,
+  więc rzadkie obszary nie znikają).
+
+Użycie:
+    from common.downsample import (grid_counts, hexbin_counts, hex_gridsize_for_budget,
+                                   thin_indices, bins_for_budget)
+"""
+import numpy as np
+
+OUTLIER_D2 = 13.8155        # chi2(df=2).ppf(0.999) - próg odległości Mahalanobisa^2
+OUTLIER_SHARE = 0.1         # odstające mogą zająć co najwyżej 10% budżetu
+
+
+def bins_for_budget(budget):
+    """Liczba przedziałów na oś, tak by siatka miała co najwyżej `budget` komórek."""
+    return max(1, int(np.sqrt(budget)))
+
+
+def _bin_index(values, lo, hi, bins):
+    """Numer przedziału (0..bins-1) dla każdej wartości z [lo, hi]."""
+    if hi <= lo:
+        return np.zeros(len(values), dtype=np.intp)
+    idx = ((values - lo) * (bins / (hi - lo))).astype(np.intp)
+    return np.clip(idx, 0, bins - 1)
+
+
+def grid_counts(x, y, bins, x_range=None, y_range=None):
+    """
+    Histogram dwuwymiarowy przez jeden np.bincount po kodach komórek.
+
+    Args:
+        x, y: numpy arrays
+        bins: liczba przedziałów na oś
+        x_range, y_range: (min, max) - domyślnie zakres danych
+
+    Returns:
+        dict: x_edges, y_edges (listy bins + 1), counts (lista bins wierszy po y,
+        każdy z bins kolumnami po x - układ z[y][x] jak w Plotly heatmap)
+    """
+    x_lo, x_hi = x_range if x_range is not None else (float(x.min()), float(x.max()))
+    y_lo, y_hi = y_range if y_range is not None else (float(y.min()), float(y.max()))
+    codes = _bin_index(y, y_lo, y_hi, bins) * bins + _bin_index(x, x_lo, x_hi, bins)
+    counts = np.bincount(codes, minlength=bins * bins).reshape(bins, bins)
+    return {
+        'x_edges': np.linspace(x_lo, x_hi, bins + 1).tolist(),
+        'y_edges': np.linspace(y_lo, y_hi, bins + 1).tolist(),
+        'counts': counts.tolist(),
+    }
+
+
+def hex_gridsize_for_budget(budget):
+    """
+    Liczba sześciokątów w poziomie, tak by siatka miała co najwyżej `budget` komórek.
+
+    Siatka nx x ny (ny ~ nx / sqrt(3), sześciokąty foremne przy kwadratowym
+    wykresie) ma (nx + 1)(ny + 1) + nx * ny komórek, czyli ok. 1.15 nx^2.
+    """
+    nx = max(1, int(np.sqrt(budget / (2 / np.sqrt(3)))))
+    while nx > 1 and _hex_cells(nx, _hex_rows(nx)) > budget:
+        nx -= 1
+    return nx
+
+
+def _hex_rows(nx):
+    return max(1, int(round(nx / np.sqrt(3))))
+
+
+def _hex_cells(nx, ny):
+    return (nx + 1) * (ny + 1) + nx * ny
+
+
+def hexbin_counts(x, y, gridsize, x_range=None, y_range=None):
+    """
+    Histogram sześciokątny (jak matplotlib hexbin) przez jeden np.bincount.
+
+    Środki sześciokątów leżą na dwóch siatkach prostokątnych: A w węzłach
+    (i, j) i B przesuniętej o pół komórki (i + 1/2, j + 1/2). Punkt trafia do
+    bliższego z dwóch kandydatów (odległość w osi y ważona przez 3 -
+    sześciokąty foremne), a kody komórek obu siatek tworzą jedną numerację.
+
+    Args:
+        x, y: numpy arrays
+        gridsize: liczba sześciokątów w poziomie (nx)
+        x_range, y_range: (min, max) - domyślnie zakres danych
+
+    Returns:
+        dict: x, y (środki niepustych sześciokątów), counts, gridsize,
+        hex_width, hex_height (odstęp środków siatki A w jednostkach danych)
+    """
+    x_lo, x_hi = x_range if x_range is not None else (float(x.min()), float(x.max()))
+    y_lo, y_hi = y_range if y_range is not None else (float(y.min()), float(y.max()))
+    nx = gridsize
+    ny = _hex_rows(nx)
+    sx = (x_hi - x_lo) / nx if x_hi > x_lo else 1.0
+    sy = (y_hi - y_lo) / ny if y_hi > y_lo else 1.0
+
+    u = (x - x_lo) / sx
+    v = (y - y_lo) / sy
+    ix_a = np.clip(np.round(u), 0, nx).astype(np.intp)
+    iy_a = np.clip(np.round(v), 0, ny).astype(np.intp)
+    ix_b = np.clip(np.floor(u), 0, nx - 1).astype(np.intp)
+    iy_b = np.clip(np.floor(v), 0, ny - 1).astype(np.intp)
+    d_a = (u - ix_a) ** 2 + 3 * (v - iy_a) ** 2
+    d_b = (u - ix_b - 0.5) ** 2 + 3 * (v - iy_b - 0.5) ** 2
+
+    offset = (nx + 1) * (ny + 1)
+    codes = np.where(d_a <= d_b, iy_a * (nx + 1) + ix_a, offset + iy_b * nx + ix_b)
+    counts = np.bincount(codes, minlength=_hex_cells(nx, ny))
+
+    cells = np.flatnonzero(counts)
+    in_a = cells < offset
+    b = cells - offset
+    cx = np.where(in_a, cells % (nx + 1), b % nx + 0.5)
+    cy = np.where(in_a, cells // (nx + 1), b // nx + 0.5)
+    return {
+        'x': (x_lo + cx * sx).tolist(),
+        'y': (y_lo + cy * sy).tolist(),
+        'counts': counts[cells].tolist(),
+        'gridsize': nx,
+        'hex_width': sx,
+        'hex_height': sy,
+    }
+
+
+def _outlier_indices(x, y, limit):
+    """Do `limit` punktów o największej odległości Mahalanobisa powyżej progu."""
+    if limit <= 0 or len(x) < 3:
+        return np.empty(0, dtype=np.intp)
+    zx = (x - x.mean()) / (x.std() or 1.0)
+    zy = (y - y.mean()) / (y.std() or 1.0)
+    r = float(np.clip(np.mean(zx * zy), -0.999, 0.999))
+    d2 = (zx * zx - 2 * r * zx * zy + zy * zy) / (1 - r * r)
+    candidates = np.flatnonzero(d2 > OUTLIER_D2)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(d2[candidates], -limit)[-limit:]]
+    return candidates
+
+
+def _cell_quotas(counts, budget):
+    """
+    Liczba punktów do wzięcia z każdej komórki: ~proporcjonalnie do liczności,
+    co najmniej 1 z niepustej, łącznie nie więcej niż budget (skala z bisekcji).
+    """
+    nonempty = counts > 0
+
+    def quotas(scale):
+        return np.where(nonempty, np.maximum(1, np.floor(counts * scale)), 0).astype(np.int64)
+
+    lo, hi = 0.0, 1.0
+    if quotas(hi).sum() <= budget:
+        return quotas(hi)
+    for _ in range(40):
+        mid = (lo + hi) / 2
+        if quotas(mid).sum() <= budget:
+            lo = mid
+        else:
+            hi = mid
+    return quotas(lo)
+
+
+def thin_indices(x, y, budget, seed=0):
+    """
+    Indeksy co najwyżej `budget` punktów zachowujących kształt chmury.
+
+    Args:
+        x, y: numpy arrays
+        budget: maksymalna liczba punktów na wykresie
+        seed: ziarno losowania wewnątrz komórek (stałe = stabilny wykres)
+
+    Returns:
+        posortowana numpy array indeksów
+    """
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+
+    # Skrajne i odstające zawsze na wykresie
+    keep = np.unique(np.concatenate([
+        [np.argmin(x), np.argmax(x), np.argmin(y), np.argmax(y)],
+        _outlier_indices(x, y, int(budget * OUTLIER_SHARE)),
+    ]))[:budget]
+    rest_budget = budget - len(keep)
+    rest = np.setdiff1d(np.arange(n), keep, assume_unique=True)
+    if rest_budget <= 0 or len(rest) == 0:
+        return keep
+
+    # Warstwy = komórki siatki; połowa budżetu na komórki, by zostało miejsce na proporcje
+    bins = bins_for_budget(max(1, rest_budget // 2))
+    xr, yr = x[rest], y[rest]
+    codes = (_bin_index(yr, yr.min(), yr.max(), bins) * bins
+             + _bin_index(xr, xr.min(), xr.max(), bins))
+    counts = np.bincount(codes, minlength=bins * bins)
+    quota = _cell_quotas(counts, rest_budget)
+
+    # Losowa kolejność w komórce: permutacja + stabilne sortowanie po kodzie komórki
+    rng = np.random.default_rng(seed)
+    perm = rng.permutation(len(rest))
+    order = perm[np.argsort(codes[perm], kind='stable')]
+    sorted_codes = codes[order]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(len(order)) - starts[sorted_codes]
+    chosen = rest[order[rank < quota[sorted_codes]]]
+    return np.sort(np.concatenate([keep, chosen]))
@@ -0,0 +1,115 @@
+"""
+Wspólne jądro momentów dla korelacji i regresji liniowej y ~ x.
+
+Jedno przejście po danych daje sumy wystarczające (średnie, Sxx, Syy, Sxy),
+a z nich w O(1): r Pearsona, p-value (test t, df = n - 2), nachylenie,
+wyraz wolny i błąd standardowy nachylenia. Zastępuje parę wywołań
+scipy.stats.pearsonr + scipy.stats.linregress, które liczą te same
+momenty dwukrotnie.
+
+Użycie:
+    from common.moments import centered_moments, correlation_stats, stats_from_sums
+
+    st = correlation_stats(x, y)             # r, p_value, slope, intercept, std_err
+    m = centered_moments(x, y)               # sumy + odchylenia dx, dy (np. do tabel)
+    st = stats_from_sums(n, sx, sy, sxx, syy, sxy)   # z sum biegnących
+"""
+import numpy as np
+from scipy import stats
+
+
+def centered_moments(x, y):
+    """
+    Średnie i sumy kwadratów/iloczynów odchyleń.
+
+    Args:
+        x, y: numpy arrays tej samej długości
+
+    Returns:
+        dict: n, mean_x, mean_y, sum_dx_sq, sum_dy_sq, sum_products, dx, dy
+    """
+    n = len(x)
+    mean_x = float(x.mean()) if n else 0.0
+    mean_y = float(y.mean()) if n else 0.0
+    dx = x - mean_x
+    dy = y - mean_y
+    return {
+        'n': n,
+        'mean_x': mean_x,
+        'mean_y': mean_y,
+        'sum_dx_sq': float(dx @ dx),
+        'sum_dy_sq': float(dy @ dy),
+        'sum_products': float(dx @ dy),
+        'dx': dx,
+        'dy': dy,
+    }
+
+
+def regression_from_moments(n, mean_x, mean_y, sum_dx_sq, sum_dy_sq, sum_products):
+    """
+    Statystyki korelacji i regresji z momentów scentrowanych, w O(1).
+
+    Returns:
+        dict: r, p_value, slope, intercept, std_err - None gdy n < 3
+        lub wariancja x albo y jest zerowa
+    """
+    out = {'r': None, 'p_value': None, 'slope': None, 'intercept': None, 'std_err': None}
+    if n < 3 or sum_dx_sq <= 0 or sum_dy_sq <= 0:
+        return out
+
+    df = n - 2
+    r = max(-1.0, min(1.0, sum_products / np.sqrt(sum_dx_sq * sum_dy_sq)))
+    slope = sum_products / sum_dx_sq
+    if abs(r) < 1:
+        t = r * np.sqrt(df / (1 - r * r))
+        p_value = float(2 * stats.t.sf(abs(t), df))
+    else:
+        p_value = 0.0
+    residual_ss = max(sum_dy_sq - slope * sum_products, 0.0)
+    out.update({
+        'r': float(r),
+        'p_value': p_value,
+        'slope': float(slope),
+        'intercept': float(mean_y - slope * mean_x),
+        'std_err': float(np.sqrt(residual_ss / df / sum_dx_sq)),
+    })
+    return out
+
+
+def correlation_stats(x, y):
+    """
+    r, p_value, slope, intercept, std_err dla danych x, y (jedno przejście).
+
+    Returns:
+        dict jak regression_from_moments, z dodatkowym polem n
+    """
+    m = centered_moments(x, y)
+    out = regression_from_moments(m['n'], m['mean_x'], m['mean_y'],
+                                  m['sum_dx_sq'], m['sum_dy_sq'], m['sum_products'])
+    out['n'] = m['n']
+    return out
+
+
+def stats_from_sums(n, sx, sy, sxx, syy, sxy):
+    """
+    Statystyki z sum surowych (n, Sx, Sy, Sx^2, Sy^2, Sxy), np. biegnących.
+
+    Sumy mogą być liczone dla danych przesuniętych o stałą (shift) - wynik
+    nie zależy od przesunięcia poza średnimi i wyrazem wolnym, które są
+    zwracane względem niego.
+
+    Returns:
+        dict: mean_x, mean_y, sum_dx_sq, sum_dy_sq, sum_products,
+        r, p_value, slope, intercept, std_err
+    """
+    mean_x = sx / n
+    mean_y = sy / n
+    sum_dx_sq = max(sxx - sx * mean_x, 0.0)
+    sum_dy_sq = max(syy - sy * mean_y, 0.0)
+    sum_products = sxy - sx * mean_y
+    out = {
+        'mean_x': mean_x, 'mean_y': mean_y,
+        'sum_dx_sq': sum_dx_sq, 'sum_dy_sq': sum_dy_sq, 'sum_products': sum_products,
+    }
+    out.update(regression_from_moments(n, mean_x, mean_y, sum_dx_sq, sum_dy_sq, sum_products))
+    return out
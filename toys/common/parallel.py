@@ -0,0 +1,87 @@
+"""
+Pula procesów dla ciężkich symulacji w zabawkach statystycznych.
+
+Zadania są dzielone na niezależne paczki (każda z własnym ziarnem),
+więc wynik nie zależy od tego, czy liczymy sekwencyjnie czy równolegle.
+
+UWAGA: funkcja przekazywana do parallel_map musi być zdefiniowana
+na poziomie modułu (pickle). W zbudowanym .exe main.py musi wywołać
+multiprocessing.freeze_support().
+
+Użycie:
+    from common.parallel import parallel_map, parallel_imap, resolve_workers
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def resolve_workers(workers):
+    """
+    Normalizuje liczbę procesów roboczych.
+
+    Args:
+        workers: None/0 = liczba rdzeni, liczba całkowita >= 1 w p.p.
+
+    Returns:
+        int: liczba procesów (co najmniej 1)
+    """
+    if workers is None or workers == 0:
+        return os.cpu_count() or 1
+    workers = int(workers)
+    if workers < 0:
+        raise ValueError("Liczba procesów nie może być ujemna")
+    return workers
+
+
+def parallel_map(func, tasks, workers=1):
+    """
+    Wywołuje func dla każdego zadania, w kolejności zadań.
+
+    Args:
+        func: funkcja modułowa przyjmująca jeden argument
+        tasks: lista argumentów
+        workers: liczba procesów; przy 1 (lub jednym zadaniu) liczy w bieżącym procesie
+
+    Returns:
+        list: wyniki w kolejności zadań
+    """
+    tasks = list(tasks)
+    workers = min(resolve_workers(workers), len(tasks))
+    if workers <= 1:
+        return [func(task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, tasks))
+
+
+def parallel_imap(func, tasks, workers=1, chunksize=64):
+    """
+    Leniwa wersja parallel_map dla strumieni zadań (np. wiersze pliku).
+
+    Zadania pobierane są oknami po workers * chunksize * 4, więc pamięć
+    nie rośnie z długością strumienia. Kolejność wyników = kolejność zadań.
+
+    Args:
+        func: funkcja modułowa przyjmująca jeden argument
+        tasks: dowolny iterator argumentów
+        workers: liczba procesów (1 = w bieżącym procesie)
+        chunksize: liczba zadań wysyłanych do procesu naraz
+
+    Yields:
+        wyniki func w kolejności zadań
+    """
+    workers = resolve_workers(workers)
+    if workers <= 1:
+        for task in tasks:
+            yield func(task)
+        return
+
+    window = workers * chunksize * 4
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(itertools.islice(tasks, window))
+            if not batch:
+                break
+            yield from executor.map(func, batch, chunksize=chunksize)
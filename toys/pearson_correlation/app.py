@@ -6,12 +6,28 @@ linie regresji i szczegolowy rozklad skladowych wzoru.
 """
 
 from flask import Flask, render_template, jsonify, request
+from collections import OrderedDict
+import atexit
+import csv
+import hashlib
+import io
+import itertools
 import numpy as np
 from scipy import stats
+from scipy.cluster import hierarchy
+from scipy.spatial.distance import squareform
 import os
 import sys
+import tempfile
+import threading
+import uuid
 
+from common.coalesce import (LatestWinsCoalescer, SUPERSEDED,
+                             client_id_from_request, superseded_response)
+from common.downsample import bins_for_budget, grid_counts, thin_indices
 from common.flask_app import register_common_static
+from common.moments import centered_moments, regression_from_moments, stats_from_sums
+from common.parallel import parallel_map, resolve_workers
 
 
 def get_bundle_dir():
@@ -29,6 +45,64 @@ app = Flask(__name__,
 
 register_common_static(app, bundle_dir if getattr(sys, 'frozen', False) else None)
 
+# Przeciaganie punktow: liczymy tylko najnowsze zapytanie klienta
+_coalescer = LatestWinsCoalescer()
+
+MAX_POINTS = 100000
+DETAILS_MODES = ('none', 'first_k', 'all')
+DETAILS_DEFAULT_K = 100         # tyle wierszy tabeli per-punkt zwracamy domyslnie
+STORE_RECALIBRATE_EVERY = 256   # co tyle zmian sumy liczone sa od nowa (dryf numeryczny)
+STORE_MAX_CLIENTS = 64
+
+# Redukcja punktow na wykresie (statystyki zawsze z pelnych danych)
+DISPLAY_MODES = ('all', 'thin', 'grid')
+DISPLAY_DEFAULT_BUDGET = 2000
+DISPLAY_MAX_BUDGET = 50000
+
+# Pasma ufnosci i predykcji regresji
+BANDS_DEFAULT_GRID = 50
+BANDS_MAX_GRID = 1000
+BANDS_CACHE_SIZE = 32
+
+# Cache pasm dla /api/compute: (skrot punktow, parametry siatki) -> pasma
+_bands_cache = OrderedDict()
+_bands_cache_lock = threading.Lock()
+
+# Bootstrap przedzialu ufnosci dla r
+BOOTSTRAP_DEFAULT_RESAMPLES = 10000
+BOOTSTRAP_MAX_RESAMPLES = 1000000
+BOOTSTRAP_MAX_ELEMENTS = 200000000    # B * n - limit pracy jednego zapytania
+BOOTSTRAP_TASK_SIZE = 20000         # tyle prob na zadanie (wlasne ziarno) - wynik nie zalezy od workers
+BOOTSTRAP_CHUNK_ELEMENTS = 2000000  # limit elementow macierzy indeksow w jednej paczce (~16 MB)
+BOOTSTRAP_PARALLEL_MIN = 200000     # od tylu prob (gdy workers nie podano) uruchamiamy pule procesow
+BOOTSTRAP_HIST_BINS = 40
+
+# Test permutacyjny dla r
+PERMUTATION_MAX = 200000
+PERMUTATION_MAX_ELEMENTS = 200000000  # permutacje * n - limit pracy jednego zapytania
+PERMUTATION_EXACT_MAX_N = 8         # do 8! = 40320 permutacji liczymy test dokladny
+PERMUTATION_CHUNK_ELEMENTS = 2000000
+PERMUTATION_HIST_BINS = 40
+
+# Macierz korelacji wielu zmiennych
+MATRIX_MAX_COLUMNS = 500
+MATRIX_MAX_CELLS = 25000000         # n * p - limit danych w jednym zapytaniu (~200 MB float64)
+MATRIX_CHUNK_ROWS = 8192            # tyle wierszy centrujemy naraz (bez kopii calej tablicy)
+MATRIX_LINKAGE_METHODS = ('average', 'complete', 'single')
+
+# Duze pliki CSV: dane trzymane w pliku mapowanym w pamieci (float64, n x 2)
+UPLOAD_CHUNK_ROWS = 100000
+UPLOAD_SAMPLE_SIZE = 2000           # probka do wykresu rozrzutu (reservoir sampling)
+UPLOAD_MAX_SAMPLE = 20000
+UPLOAD_MAX_DATASETS = 4             # najdawniej uzywane zbiory sa usuwane z dysku
+
+_uploads = OrderedDict()            # dataset_id -> {'path', 'data', 'n', 'summary', 'variables'}
+_uploads_lock = threading.Lock()
+
+# Zbiory punktow per klient (X-Client-Id), najdawniej uzywane sa usuwane
+_point_stores = OrderedDict()
+_point_stores_lock = threading.Lock()
+
 
 def safe_float(val):
     """Bezpieczna konwersja na float - zwraca None dla NaN/Inf/blednych wartosci."""
@@ -49,96 +123,134 @@ def _validate_request_json():
     return data
 
 
-def _validate_points(points_raw):
+def _parse_point(pt, label):
     """
-    Waliduje i zwraca tablice punktow.
-    Rzuca ValueError jesli dane sa niepoprawne.
-
-    Args:
-        points_raw: lista slownikow [{x, y}, ...]
+    Waliduje pojedynczy punkt {x, y}. Rzuca ValueError jesli niepoprawny.
 
     Returns:
-        tuple: (x_array, y_array) jako numpy arrays
+        tuple: (x, y) jako float
     """
-    if not isinstance(points_raw, list):
-        raise ValueError("Punkty musza byc lista")
+    if not isinstance(pt, dict) or 'x' not in pt or 'y' not in pt:
+        raise ValueError(f"{label}: wymagane pola 'x' i 'y'")
 
-    if len(points_raw) < 3:
-        raise ValueError("Potrzeba co najmniej 3 punktow do obliczenia korelacji")
+    try:
+        x = float(pt['x'])
+        y = float(pt['y'])
+    except (ValueError, TypeError):
+        raise ValueError(f"{label}: wspolrzedne musza byc liczbami")
 
-    if len(points_raw) > 100:
-        raise ValueError("Maksymalnie 100 punktow")
+    if np.isnan(x) or np.isinf(x):
+        raise ValueError(f"{label}: wspolrzedna x musi byc liczba skonczona")
+    if np.isnan(y) or np.isinf(y):
+        raise ValueError(f"{label}: wspolrzedna y musi byc liczba skonczona")
 
-    xs = []
-    ys = []
-    for i, pt in enumerate(points_raw):
-        if not isinstance(pt, dict) or 'x' not in pt or 'y' not in pt:
-            raise ValueError(f"Punkt {i+1}: wymagane pola 'x' i 'y'")
+    return x, y
+
+
+def _coordinates_array(values):
+    """
+    Konwertuje liste wspolrzednych na float64 jednym np.asarray.
 
+    Przy bledzie konwersji (wolna sciezka, tylko dla blednych danych)
+    szuka pierwszego niepoprawnego punktu, aby podac jego numer.
+    """
+    try:
+        arr = np.asarray(values, dtype=float)
+    except (ValueError, TypeError):
+        arr = None
+    if arr is None or arr.ndim != 1:
+        for i, v in enumerate(values):
+            try:
+                float(v)
+            except (ValueError, TypeError):
+                raise ValueError(f"Punkt {i+1}: wspolrzedne musza byc liczbami")
+        raise ValueError("Wspolrzedne musza byc liczbami")
+    return arr
+
+
+def _points_to_arrays(points_raw, min_points=3):
+    """
+    Waliduje punkty i zwraca je jako tablice (bez sprawdzania wariancji).
+
+    Akceptuje dwie postacie:
+        lista slownikow [{x, y}, ...]
+        kolumny {"x": [...], "y": [...]}
+
+    Konwersja i sprawdzenie skonczonosci sa wektorowe; komunikaty bledow
+    wskazuja numer pierwszego niepoprawnego punktu.
+
+    Returns:
+        tuple: (x_array, y_array) jako numpy arrays float64
+    """
+    if isinstance(points_raw, dict):
+        if 'x' not in points_raw or 'y' not in points_raw:
+            raise ValueError("Wymagane kolumny 'x' i 'y'")
+        xs_raw = points_raw['x']
+        ys_raw = points_raw['y']
+        if not isinstance(xs_raw, list) or not isinstance(ys_raw, list):
+            raise ValueError("Kolumny 'x' i 'y' musza byc listami")
+        if len(xs_raw) != len(ys_raw):
+            raise ValueError("Kolumny 'x' i 'y' musza miec te sama dlugosc")
+    elif isinstance(points_raw, list):
         try:
-            x = float(pt['x'])
-            y = float(pt['y'])
-        except (ValueError, TypeError):
-            raise ValueError(f"Punkt {i+1}: wspolrzedne musza byc liczbami")
+            xs_raw = [pt['x'] for pt in points_raw]
+            ys_raw = [pt['y'] for pt in points_raw]
+        except (KeyError, TypeError, IndexError):
+            xs_raw = ys_raw = None
+        if xs_raw is None or not all(isinstance(pt, dict) for pt in points_raw):
+            for i, pt in enumerate(points_raw):
+                if not isinstance(pt, dict) or 'x' not in pt or 'y' not in pt:
+                    raise ValueError(f"Punkt {i+1}: wymagane pola 'x' i 'y'")
+    else:
+        raise ValueError("Punkty musza byc lista")
 
-        if np.isnan(x) or np.isinf(x):
-            raise ValueError(f"Punkt {i+1}: wspolrzedna x musi byc liczba skonczona")
-        if np.isnan(y) or np.isinf(y):
-            raise ValueError(f"Punkt {i+1}: wspolrzedna y musi byc liczba skonczona")
+    if len(xs_raw) < min_points:
+        raise ValueError("Potrzeba co najmniej 3 punktow do obliczenia korelacji")
 
-        xs.append(x)
-        ys.append(y)
+    if len(xs_raw) > MAX_POINTS:
+        raise ValueError(f"Maksymalnie {MAX_POINTS} punktow")
 
-    x_arr = np.array(xs)
-    y_arr = np.array(ys)
+    x_arr = _coordinates_array(xs_raw)
+    y_arr = _coordinates_array(ys_raw)
 
-    # Sprawdz czy nie ma zerowej wariancji
-    if np.all(x_arr == x_arr[0]):
-        raise ValueError("Wszystkie wartosci x sa identyczne - korelacja niezdefiniowana")
-    if np.all(y_arr == y_arr[0]):
-        raise ValueError("Wszystkie wartosci y sa identyczne - korelacja niezdefiniowana")
+    bad_x = ~np.isfinite(x_arr)
+    bad_y = ~np.isfinite(y_arr)
+    bad = bad_x | bad_y
+    if bad.any():
+        i = int(np.argmax(bad))
+        # None zamienia sie w NaN - to brak liczby, nie liczba nieskonczona
+        if xs_raw[i] is None or ys_raw[i] is None:
+            raise ValueError(f"Punkt {i+1}: wspolrzedne musza byc liczbami")
+        axis = 'x' if bad_x[i] else 'y'
+        raise ValueError(f"Punkt {i+1}: wspolrzedna {axis} musi byc liczba skonczona")
 
     return x_arr, y_arr
 
 
-def _compute_pearson(x_arr, y_arr):
+def _validate_points(points_raw):
     """
-    Oblicza wspolczynnik korelacji Pearsona i powiazane statystyki.
+    Waliduje i zwraca tablice punktow.
+    Rzuca ValueError jesli dane sa niepoprawne.
 
     Args:
-        x_arr: numpy array wspolrzednych x
-        y_arr: numpy array wspolrzednych y
+        points_raw: lista slownikow [{x, y}, ...] lub kolumny {"x": [...], "y": [...]}
 
     Returns:
-        dict z wynikami gotowymi do jsonify
+        tuple: (x_array, y_array) jako numpy arrays
     """
-    n = len(x_arr)
-    mean_x = float(np.mean(x_arr))
-    mean_y = float(np.mean(y_arr))
-
-    # Odchylenia od srednich
-    dx = x_arr - mean_x  # (xi - x_bar)
-    dy = y_arr - mean_y  # (yi - y_bar)
+    x_arr, y_arr = _points_to_arrays(points_raw)
 
-    # Skladowe wzoru Pearsona
-    products = dx * dy           # (xi - x_bar)(yi - y_bar)
-    dx_squared = dx ** 2         # (xi - x_bar)^2
-    dy_squared = dy ** 2         # (yi - y_bar)^2
-
-    sum_products = float(np.sum(products))
-    sum_dx_sq = float(np.sum(dx_squared))
-    sum_dy_sq = float(np.sum(dy_squared))
-
-    # Pearson r via scipy (z p-value)
-    r_value, p_value = stats.pearsonr(x_arr, y_arr)
+    # Sprawdz czy nie ma zerowej wariancji
+    if np.all(x_arr == x_arr[0]):
+        raise ValueError("Wszystkie wartosci x sa identyczne - korelacja niezdefiniowana")
+    if np.all(y_arr == y_arr[0]):
+        raise ValueError("Wszystkie wartosci y sa identyczne - korelacja niezdefiniowana")
 
-    # r^2
-    r_squared = r_value ** 2
+    return x_arr, y_arr
 
-    # Linia regresji: y = slope * x + intercept
-    slope, intercept, _, _, std_err = stats.linregress(x_arr, y_arr)
 
-    # Interpretacja sily korelacji
+def _strength_and_direction(r_value):
+    """Interpretacja sily i kierunku korelacji: (strength, strength_label, direction)."""
     abs_r = abs(r_value)
     if abs_r < 0.3:
         strength = "slaba"
@@ -150,7 +262,6 @@ def _compute_pearson(x_arr, y_arr):
         strength = "silna"
         strength_label = "Silna"
 
-    # Kierunek
     if r_value > 0:
         direction = "dodatnia"
     elif r_value < 0:
@@ -158,8 +269,21 @@ def _compute_pearson(x_arr, y_arr):
     else:
         direction = "brak"
 
-    # Stopnie swobody
-    df = n - 2
+    return strength, strength_label, direction
+
+
+def _summary_response(n, mean_x, mean_y, sum_products, sum_dx_sq, sum_dy_sq,
+                      r_value, p_value, slope, intercept, std_err):
+    """
+    Sklada odpowiedz ze statystykami zbiorczymi (bez danych per-punkt).
+
+    Returns:
+        dict z wynikami gotowymi do jsonify
+    """
+    strength, strength_label, direction = _strength_and_direction(r_value)
+
+    # r^2
+    r_squared = r_value ** 2
 
     # Bezpieczne wartosci
     r_safe = safe_float(r_value)
@@ -169,25 +293,12 @@ def _compute_pearson(x_arr, y_arr):
     intercept_safe = safe_float(intercept)
     stderr_safe = safe_float(std_err)
 
-    # Dane per-punkt do tabeli
-    point_details = []
-    for i in range(n):
-        point_details.append({
-            'x': safe_float(x_arr[i]),
-            'y': safe_float(y_arr[i]),
-            'dx': safe_float(dx[i]),
-            'dy': safe_float(dy[i]),
-            'product': safe_float(products[i]),
-            'dx_sq': safe_float(dx_squared[i]),
-            'dy_sq': safe_float(dy_squared[i]),
-        })
-
     return {
         'r': round(r_safe, 6) if r_safe is not None else 0,
         'r_squared': round(r2_safe, 6) if r2_safe is not None else 0,
         'p_value': p_safe if p_safe is not None else 1.0,
         'n': n,
-        'df': df,
+        'df': n - 2,
         'mean_x': round(safe_float(mean_x), 4) if safe_float(mean_x) is not None else 0,
         'mean_y': round(safe_float(mean_y), 4) if safe_float(mean_y) is not None else 0,
         'sum_products': round(safe_float(sum_products), 4) if safe_float(sum_products) is not None else 0,
@@ -199,10 +310,1050 @@ def _compute_pearson(x_arr, y_arr):
         'strength': strength,
         'strength_label': strength_label,
         'direction': direction,
-        'point_details': point_details,
     }
 
 
+def _regression_bands(n, mean_x, sum_dx_sq, slope, intercept, residual_ss, x_grid,
+                      confidence=0.95):
+    """
+    Pasmo ufnosci sredniej odpowiedzi i pasmo predykcji dla siatki x, z sum.
+
+    Jedno wyznaczenie kwantyla t(n-2) i wektorowe bledy standardowe:
+        se_fit(x0)  = s * sqrt(1/n + (x0 - x_bar)^2 / Sxx)
+        se_pred(x0) = s * sqrt(1 + 1/n + (x0 - x_bar)^2 / Sxx)
+
+    Returns:
+        dict: x, fit, ci_lower, ci_upper, pi_lower, pi_upper (listy), confidence, t_critical
+    """
+    df = n - 2
+    s = np.sqrt(max(residual_ss, 0.0) / df)
+    t_crit = float(stats.t.ppf((1 + confidence) / 2, df))
+    lever = 1 / n + (x_grid - mean_x) ** 2 / sum_dx_sq
+    fit = intercept + slope * x_grid
+    half_ci = t_crit * s * np.sqrt(lever)
+    half_pi = t_crit * s * np.sqrt(1 + lever)
+    return {
+        'x': x_grid.tolist(),
+        'fit': fit.tolist(),
+        'ci_lower': (fit - half_ci).tolist(),
+        'ci_upper': (fit + half_ci).tolist(),
+        'pi_lower': (fit - half_pi).tolist(),
+        'pi_upper': (fit + half_pi).tolist(),
+        'confidence': confidence,
+        't_critical': round(t_crit, 6),
+    }
+
+
+def _validate_bands_params(params, x_arr=None):
+    """
+    Waliduje parametry pasm: n_grid, confidence, x_min, x_max.
+    Zakres domyslnie = zakres danych (x_arr) poszerzony o 20% z kazdej strony.
+
+    Returns:
+        tuple: (n_grid, confidence, x_min, x_max)
+    """
+    n_grid = int(params.get('n_grid', BANDS_DEFAULT_GRID))
+    if n_grid < 2 or n_grid > BANDS_MAX_GRID:
+        raise ValueError(f"n_grid musi byc miedzy 2 a {BANDS_MAX_GRID}")
+    confidence = float(params.get('confidence', 0.95))
+    if not 0.5 <= confidence < 1:
+        raise ValueError("Poziom ufnosci musi byc z przedzialu [0.5, 1)")
+    x_min = params.get('x_min', None)
+    x_max = params.get('x_max', None)
+    if x_min is None or x_max is None:
+        lo, hi = float(np.min(x_arr)), float(np.max(x_arr))
+        pad = (hi - lo) * 0.2
+        x_min = lo - pad if x_min is None else x_min
+        x_max = hi + pad if x_max is None else x_max
+    x_min, x_max = float(x_min), float(x_max)
+    if not (np.isfinite(x_min) and np.isfinite(x_max)) or x_min >= x_max:
+        raise ValueError("Zakres siatki: x_min musi byc mniejsze od x_max")
+    return n_grid, confidence, x_min, x_max
+
+
+def _ranks_in_sorted(sorted_values, values):
+    """
+    Rangi srednie (1..n, remisy = srednia pozycji) wzgledem posortowanej tablicy.
+    Dwie bisekcje na wartosc - bez ponownego sortowania danych.
+    """
+    lo = np.searchsorted(sorted_values, values, side='left')
+    hi = np.searchsorted(sorted_values, values, side='right')
+    return (lo + hi + 1) / 2
+
+
+def _spearman_from_ranks(rank_x, rank_y):
+    """rho Spearmana = r Pearsona rang; p-value z testu t (jak scipy.stats.spearmanr)."""
+    m = centered_moments(rank_x, rank_y)
+    st = regression_from_moments(m['n'], m['mean_x'], m['mean_y'],
+                                 m['sum_dx_sq'], m['sum_dy_sq'], m['sum_products'])
+    if st['r'] is None:
+        return {'rho': None, 'p_value': None}
+    return {'rho': round(st['r'], 6), 'p_value': st['p_value']}
+
+
+def _count_inversions(seq):
+    """
+    Liczba par i < j z seq[i] > seq[j] - sortowanie przez scalanie od dolu.
+
+    Na kazdym poziomie (serie o dlugosci width) wszystkie pary serii sa
+    obslugiwane naraz: klucze przesuniete o numer bloku tworza jedna
+    posortowana tablice lewych serii, a searchsorted zlicza elementy lewej
+    serii wieksze od kazdego elementu prawej. Scalenie to stabilne
+    sortowanie kluczy (timsort na dwoch gotowych seriach - liniowo).
+
+    Args:
+        seq: liczby calkowite z zakresu 0..n-1 (np. rangi geste)
+    """
+    a = np.asarray(seq, dtype=np.int64)
+    n = len(a)
+    pos = np.arange(n)
+    inversions = 0
+    width = 1
+    while width < n:
+        block = pos // (2 * width)
+        is_right = (pos % (2 * width)) >= width
+        key = a + block * n
+        left_keys = key[~is_right]
+        right_keys = key[is_right]
+        left_end = np.searchsorted(left_keys, (block[is_right] + 1) * n, side='left')
+        inversions += int((left_end - np.searchsorted(left_keys, right_keys, side='right')).sum())
+        a = np.sort(key, kind='stable') - block * n
+        width *= 2
+    return inversions
+
+
+def _tie_terms(counts):
+    """Skladniki poprawki na remisy: sum c(c-1)/2, sum c(c-1)(c-2), sum c(c-1)(2c+5)."""
+    c = np.asarray(counts, dtype=np.int64)
+    return (int((c * (c - 1) // 2).sum()), int((c * (c - 1) * (c - 2)).sum()),
+            int((c * (c - 1) * (2 * c + 5)).sum()))
+
+
+def _kendall_from_s(n, s, x_ties, y_ties):
+    """
+    tau-b Kendalla i p-value (przyblizenie normalne z poprawka na remisy, jak
+    scipy.stats.kendalltau method='asymptotic') z S = zgodne - niezgodne.
+
+    Args:
+        x_ties, y_ties: wyniki _tie_terms dla grup remisow x i y
+    """
+    xtie, x0, x1 = x_ties
+    ytie, y0, y1 = y_ties
+    total = n * (n - 1) // 2
+    if n < 3 or xtie == total or ytie == total:
+        return {'tau': None, 'p_value': None}
+    tau = max(-1.0, min(1.0, s / np.sqrt(total - xtie) / np.sqrt(total - ytie)))
+    m = n * (n - 1.0)
+    var = ((m * (2 * n + 5) - x1 - y1) / 18
+           + (2 * xtie * ytie) / m + x0 * y0 / (9 * m * (n - 2)))
+    p_value = float(2 * stats.norm.sf(abs(s) / np.sqrt(var))) if var > 0 else 1.0
+    return {'tau': round(float(tau), 6), 'p_value': p_value}
+
+
+def _kendall_s(x_arr, y_arr):
+    """
+    S = (pary zgodne) - (pary niezgodne) w O(n log n).
+
+    Returns:
+        tuple: (S, _tie_terms dla x, _tie_terms dla y)
+    """
+    n = len(x_arr)
+    # Rangi geste; sortowanie po (x, y) - pary z remisem w x nie daja inwersji
+    _, x_dense, x_counts = np.unique(x_arr, return_inverse=True, return_counts=True)
+    _, y_dense, y_counts = np.unique(y_arr, return_inverse=True, return_counts=True)
+    order = np.lexsort((y_dense, x_dense))
+    xs, ys = x_dense[order], y_dense[order]
+    discordant = _count_inversions(ys)
+    joint = np.flatnonzero(np.r_[True, (xs[1:] != xs[:-1]) | (ys[1:] != ys[:-1]), True])
+    joint_ties = _tie_terms(np.diff(joint))[0]
+    x_ties = _tie_terms(x_counts)
+    y_ties = _tie_terms(y_counts)
+    s = n * (n - 1) // 2 - x_ties[0] - y_ties[0] + joint_ties - 2 * discordant
+    return s, x_ties, y_ties
+
+
+def _rank_correlations(x_arr, y_arr):
+    """
+    rho Spearmana i tau-b Kendalla w O(n log n).
+
+    Returns:
+        dict: spearman {rho, p_value}, kendall {tau, p_value}
+    """
+    spearman = _spearman_from_ranks(_ranks_in_sorted(np.sort(x_arr), x_arr),
+                                    _ranks_in_sorted(np.sort(y_arr), y_arr))
+    s, x_ties, y_ties = _kendall_s(x_arr, y_arr)
+    return {'spearman': spearman, 'kendall': _kendall_from_s(len(x_arr), s, x_ties, y_ties)}
+
+
+class PointStore:
+    """
+    Zbior punktow z sumami biegnacymi (n, Sx, Sy, Sx^2, Sy^2, Sxy).
+
+    Dodanie, przesuniecie i usuniecie punktu aktualizuja sumy w O(1).
+    Sumy liczone sa dla danych przesunietych o srednie z ostatniej
+    rekalibracji (mniejsze znoszenie sie skladnikow); co
+    STORE_RECALIBRATE_EVERY zmian sa przeliczane od nowa z punktow.
+
+    Korelacje rangowe (Spearman, Kendall) wymagaja przejscia po wszystkich
+    punktach - nie sa liczone przy zmianie, tylko w /api/points/details.
+    """
+
+    def __init__(self):
+        self.xs = []
+        self.ys = []
+        self.version = 0
+        self.lock = threading.Lock()
+        self._bands_cache = {}  # (version, n_grid, confidence, x_min, x_max) -> pasma
+        self._recalibrate()
+
+    def _recalibrate(self):
+        x = np.asarray(self.xs, dtype=float)
+        y = np.asarray(self.ys, dtype=float)
+        self.shift_x = float(x.mean()) if len(x) else 0.0
+        self.shift_y = float(y.mean()) if len(y) else 0.0
+        dx = x - self.shift_x
+        dy = y - self.shift_y
+        self.n = len(x)
+        self.sx = float(dx.sum())
+        self.sy = float(dy.sum())
+        self.sxx = float(dx @ dx)
+        self.syy = float(dy @ dy)
+        self.sxy = float(dx @ dy)
+        self._updates = 0
+
+    def _accumulate(self, x, y, sign):
+        dx = x - self.shift_x
+        dy = y - self.shift_y
+        self.n += sign
+        self.sx += sign * dx
+        self.sy += sign * dy
+        self.sxx += sign * dx * dx
+        self.syy += sign * dy * dy
+        self.sxy += sign * dx * dy
+
+    def _changed(self):
+        self.version += 1
+        self._updates += 1
+        if self._updates >= STORE_RECALIBRATE_EVERY:
+            self._recalibrate()
+
+    def _check_index(self, index):
+        if isinstance(index, bool) or not isinstance(index, int):
+            raise ValueError("Indeks punktu musi byc liczba calkowita")
+        if not 0 <= index < len(self.xs):
+            raise ValueError(f"Brak punktu o indeksie {index}")
+
+    def reset(self, xs, ys):
+        self.xs = np.asarray(xs, dtype=float).tolist()
+        self.ys = np.asarray(ys, dtype=float).tolist()
+        self.version += 1
+        self._recalibrate()
+
+    def add(self, x, y):
+        if len(self.xs) >= MAX_POINTS:
+            raise ValueError(f"Maksymalnie {MAX_POINTS} punktow")
+        self.xs.append(x)
+        self.ys.append(y)
+        self._accumulate(x, y, +1)
+        self._changed()
+
+    def move(self, index, x, y):
+        self._check_index(index)
+        old_x, old_y = self.xs[index], self.ys[index]
+        self._accumulate(old_x, old_y, -1)
+        self.xs[index] = x
+        self.ys[index] = y
+        self._accumulate(x, y, +1)
+        self._changed()
+
+    def remove(self, index):
+        self._check_index(index)
+        old_x, old_y = self.xs[index], self.ys[index]
+        del self.xs[index]
+        del self.ys[index]
+        self._accumulate(old_x, old_y, -1)
+        self._changed()
+
+    def summary(self):
+        """Statystyki zbiorcze z sum biegnacych (bez przechodzenia po punktach)."""
+        result = {'version': self.version, 'n': self.n}
+        if self.n == 0:
+            result.update({'ready': False, 'reason': "Brak punktow"})
+            return result
+
+        st = stats_from_sums(self.n, self.sx, self.sy, self.sxx, self.syy, self.sxy)
+        if st['r'] is None:
+            reason = ("Potrzeba co najmniej 3 punktow do obliczenia korelacji" if self.n < 3
+                      else "Zerowa wariancja x lub y - korelacja niezdefiniowana")
+            result.update({'ready': False, 'reason': reason})
+            return result
+
+        result.update(_summary_response(
+            self.n, st['mean_x'] + self.shift_x, st['mean_y'] + self.shift_y,
+            st['sum_products'], st['sum_dx_sq'], st['sum_dy_sq'],
+            st['r'], st['p_value'], st['slope'],
+            st['intercept'] + self.shift_y - st['slope'] * self.shift_x, st['std_err']))
+        result['ready'] = True
+        return result
+
+    def bands(self, n_grid, confidence, x_min, x_max):
+        """
+        Pasma regresji dla biezacej wersji zbioru (z sum biegnacych, bez przejscia
+        po punktach). Wynik jest zapamietywany dla wersji - ponowne rysowanie
+        wykresu (np. po zmianie rozmiaru okna) nie liczy pasm od nowa.
+
+        Returns:
+            dict jak _regression_bands + version, cached; None gdy zbior nie jest gotowy
+        """
+        key = (self.version, n_grid, confidence, x_min, x_max)
+        cached = self._bands_cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        st = stats_from_sums(self.n, self.sx, self.sy, self.sxx, self.syy, self.sxy)
+        if st['r'] is None:
+            return None
+        # Srednia i wyraz wolny z sum przesunietych - z powrotem w ukladzie danych
+        slope = st['slope']
+        result = _regression_bands(
+            self.n, st['mean_x'] + self.shift_x, st['sum_dx_sq'], slope,
+            st['intercept'] + self.shift_y - slope * self.shift_x,
+            st['sum_dy_sq'] - slope * st['sum_products'],
+            np.linspace(x_min, x_max, n_grid), confidence)
+        result['version'] = self.version
+        # Tylko biezaca wersja - starsze wpisy sa juz nieaktualne
+        self._bands_cache = {k: v for k, v in self._bands_cache.items() if k[0] == self.version}
+        self._bands_cache[key] = result
+        return dict(result, cached=False)
+
+
+def _get_point_store():
+    """
+    Zwraca zbior punktow biezacego klienta (naglowek X-Client-Id).
+
+    Naglowek jest wymagany - bez niego niezwiazani klienci dzieliliby jeden zbior.
+    """
+    client_id = client_id_from_request()
+    if client_id is None:
+        raise ValueError("Wymagany naglowek X-Client-Id")
+    with _point_stores_lock:
+        store = _point_stores.get(client_id)
+        if store is None:
+            store = _point_stores[client_id] = PointStore()
+            while len(_point_stores) > STORE_MAX_CLIENTS:
+                _point_stores.popitem(last=False)
+        _point_stores.move_to_end(client_id)
+    return store
+
+
+def _sanitize_columns(columns):
+    """
+    Zamienia slownik kolumn (numpy arrays) na listy, z None w miejsce NaN/Inf.
+    Sprawdzenie skonczonosci jest jednym krokiem wektorowym dla wszystkich kolumn.
+    """
+    names = list(columns)
+    matrix = np.vstack([columns[name] for name in names]).astype(float)
+    finite = np.isfinite(matrix)
+    if finite.all():
+        rows = matrix.tolist()
+    else:
+        obj = matrix.astype(object)
+        obj[~finite] = None
+        rows = obj.tolist()
+    return dict(zip(names, rows))
+
+
+def _validate_details_params(data):
+    """
+    Waliduje parametry tabeli per-punkt: details, details_k, details_offset.
+
+    Returns:
+        tuple: (mode, k, offset)
+    """
+    mode = data.get('details', 'first_k')
+    if mode not in DETAILS_MODES:
+        raise ValueError(f"Parametr 'details' musi byc jednym z: {', '.join(DETAILS_MODES)}")
+    k = int(data.get('details_k', DETAILS_DEFAULT_K))
+    offset = int(data.get('details_offset', 0))
+    if k < 1 or offset < 0:
+        raise ValueError("details_k musi byc dodatnie, a details_offset nieujemny")
+    return mode, k, offset
+
+
+def _permutation_test(x_arr, y_arr, n_permutations, seed=None):
+    """
+    Permutacyjne p-value dla r (dwustronne).
+
+    Dla n <= PERMUTATION_EXACT_MAX_N przechodzi wszystkie n! permutacji (test
+    dokladny), w p.p. losuje n_permutations permutacji (Monte Carlo, p = (k+1)/(B+1)).
+    Permutacje y tworzone sa paczkami jako macierze indeksow, a wszystkie r
+    z paczki daje jeden iloczyn macierzowy z wycentrowanym x - mianownik
+    sqrt(Sxx * Syy) nie zmienia sie przy permutowaniu.
+
+    Returns:
+        dict: method, n_permutations, p_value, observed_r, histogram{edges, counts}
+    """
+    n = len(x_arr)
+    x = x_arr - x_arr.mean()
+    y = y_arr - y_arr.mean()
+    scale = float(np.sqrt((x @ x) * (y @ y)))
+    observed = float(x @ y) / scale
+    # Tolerancja: permutacje dajace r rowne obserwowanemu licza sie jako "co najmniej tak skrajne"
+    threshold = abs(observed) - 1e-12 * max(1.0, abs(observed))
+
+    exact = n <= PERMUTATION_EXACT_MAX_N
+    if exact:
+        perms = np.array(list(itertools.permutations(range(n))), dtype=np.intp)
+        total = len(perms)
+        batches = (perms[i:i + 10000] for i in range(0, total, 10000))
+    else:
+        rng = np.random.default_rng(seed)
+        total = n_permutations
+        rows = max(1, PERMUTATION_CHUNK_ELEMENTS // n)
+        base = np.arange(n)
+        batches = (rng.permuted(np.broadcast_to(base, (min(rows, total - i), n)), axis=1)
+                   for i in range(0, total, rows))
+
+    edges = np.linspace(-1, 1, PERMUTATION_HIST_BINS + 1)
+    counts = np.zeros(PERMUTATION_HIST_BINS, dtype=np.int64)
+    extreme = 0
+    for idx in batches:
+        r_perm = np.clip((y[idx] @ x) / scale, -1.0, 1.0)
+        extreme += int(np.count_nonzero(np.abs(r_perm) >= threshold))
+        counts += np.histogram(r_perm, bins=edges)[0]
+
+    p_value = extreme / total if exact else (extreme + 1) / (total + 1)
+    return {
+        'method': 'exact' if exact else 'monte_carlo',
+        'n_permutations': int(total),
+        'p_value': float(p_value),
+        'observed_r': round(observed, 6),
+        'histogram': {'edges': np.round(edges, 4).tolist(), 'counts': counts.tolist()},
+    }
+
+
+def _influence_diagnostics(x_arr, y_arr):
+    """
+    Diagnostyka wplywu punktow dla regresji y ~ x, w O(n) z sum wystarczajacych.
+
+    Zamiast n dopasowan bez kolejnych punktow korzysta z wzorow zamknietych:
+    sumy bez punktu i to sumy pelne minus jego wklad, a dla regresji
+    h_i = 1/n + dx_i^2/Sxx, e_(i) = e_i / (1 - h_i).
+
+    Returns:
+        dict numpy arrays (dlugosc n): loo_r, loo_slope, delta_r, leverage,
+        cooks_d, dfbetas_intercept, dfbetas_slope (NaN gdy niezdefiniowane),
+        oraz progi orientacyjne w 'thresholds'
+    """
+    n = len(x_arr)
+    mean_x = x_arr.mean()
+    dx = x_arr - mean_x
+    dy = y_arr - y_arr.mean()
+    sxx = dx @ dx
+    syy = dy @ dy
+    sxy = dx @ dy
+    slope = sxy / sxx
+    r = sxy / np.sqrt(sxx * syy)
+
+    # Sumy bez punktu i (dane wycentrowane: Sx = Sy = 0)
+    m = n - 1
+    loo_r = _r_from_sums(m, -dx, -dy, sxx - dx * dx, syy - dy * dy, sxy - dx * dy)
+    loo_var_x = m * (sxx - dx * dx) - dx * dx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loo_slope = np.where(loo_var_x > 0, (m * (sxy - dx * dy) - dx * dy) / loo_var_x, np.nan)
+
+        leverage = 1 / n + dx * dx / sxx
+        residuals = dy - slope * dx
+        sse = max(syy - slope * sxy, 0.0)
+        one_minus_h = 1 - leverage
+        s2 = sse / (n - 2)
+        cooks_d = residuals ** 2 / (2 * s2) * leverage / one_minus_h ** 2
+
+        # DFBETAS: zmiana wspolczynnika / (s_(i) * sqrt((X'X)^-1_jj))
+        s2_loo = (sse - residuals ** 2 / one_minus_h) / (n - 3) if n > 3 else np.full(n, np.nan)
+        s_loo = np.sqrt(np.clip(s2_loo, 0, None))
+        scaled = residuals / (one_minus_h * s_loo)
+        dfbetas_slope = dx / sxx * scaled / np.sqrt(1 / sxx)
+        dfbetas_intercept = ((1 / n - mean_x * dx / sxx) * scaled
+                             / np.sqrt(1 / n + mean_x ** 2 / sxx))
+
+    return {
+        'loo_r': loo_r,
+        'loo_slope': loo_slope,
+        'delta_r': r - loo_r,
+        'leverage': leverage,
+        'cooks_d': cooks_d,
+        'dfbetas_intercept': dfbetas_intercept,
+        'dfbetas_slope': dfbetas_slope,
+        'thresholds': {
+            'leverage': 4 / n,           # 2p/n dla p = 2
+            'cooks_d': 4 / n,
+            'dfbetas': 2 / np.sqrt(n),
+        },
+    }
+
+
+def _cached_bands(x_arr, y_arr, moments, params):
+    """
+    Pasma regresji dla /api/compute, zapamietywane wg skrotu punktow i parametrow
+    (ten sam zbior punktow = ta sama wersja - bez ponownego liczenia).
+    """
+    n_grid, confidence, x_min, x_max = params
+    digest = hashlib.blake2b(x_arr.tobytes() + y_arr.tobytes(), digest_size=16).hexdigest()
+    key = (digest, n_grid, confidence, x_min, x_max)
+    with _bands_cache_lock:
+        cached = _bands_cache.get(key)
+        if cached is not None:
+            _bands_cache.move_to_end(key)
+            return dict(cached, cached=True)
+
+    st = regression_from_moments(moments['n'], moments['mean_x'], moments['mean_y'],
+                                 moments['sum_dx_sq'], moments['sum_dy_sq'],
+                                 moments['sum_products'])
+    residual_ss = moments['sum_dy_sq'] - st['slope'] * moments['sum_products']
+    result = _regression_bands(moments['n'], moments['mean_x'], moments['sum_dx_sq'],
+                               st['slope'], st['intercept'], residual_ss,
+                               np.linspace(x_min, x_max, n_grid), confidence)
+    with _bands_cache_lock:
+        _bands_cache[key] = result
+        while len(_bands_cache) > BANDS_CACHE_SIZE:
+            _bands_cache.popitem(last=False)
+    return dict(result, cached=False)
+
+
+def _validate_display_params(data):
+    """
+    Waliduje parametry redukcji punktow: display, point_budget.
+
+    Returns:
+        tuple: (mode, budget)
+    """
+    mode = data.get('display', 'all')
+    if mode not in DISPLAY_MODES:
+        raise ValueError(f"Parametr 'display' musi byc jednym z: {', '.join(DISPLAY_MODES)}")
+    budget = int(data.get('point_budget', DISPLAY_DEFAULT_BUDGET))
+    if budget < 10 or budget > DISPLAY_MAX_BUDGET:
+        raise ValueError(f"point_budget musi byc miedzy 10 a {DISPLAY_MAX_BUDGET}")
+    return mode, budget
+
+
+def _display_payload(x_arr, y_arr, mode, budget):
+    """
+    Co narysowac zamiast wszystkich punktow (None dla trybu 'all').
+
+    thin: indeksy co najwyzej budget punktow (skrajne i odstajace zawsze zachowane),
+    grid: liczebnosci w siatce o co najwyzej budget komorkach (mapa ciepla).
+    """
+    if mode == 'all':
+        return None
+    if mode == 'grid':
+        return dict(mode='grid', n_total=len(x_arr),
+                    **grid_counts(x_arr, y_arr, bins_for_budget(budget)))
+    idx = thin_indices(x_arr, y_arr, budget)
+    return {'mode': 'thin', 'n_total': len(x_arr), 'n_shown': len(idx), 'indices': idx.tolist()}
+
+
+def _compute_pearson(x_arr, y_arr, details='first_k', details_k=DETAILS_DEFAULT_K,
+                     details_offset=0, permutations=0, seed=None, influence=False,
+                     display='all', point_budget=DISPLAY_DEFAULT_BUDGET, bands=None):
+    """
+    Oblicza wspolczynnik korelacji Pearsona i powiazane statystyki.
+
+    Args:
+        x_arr: numpy array wspolrzednych x
+        y_arr: numpy array wspolrzednych y
+        details: 'none' | 'first_k' | 'all' - zakres tabeli per-punkt
+        details_k: liczba wierszy dla 'first_k'
+        details_offset: poczatek strony dla 'first_k'
+        permutations: liczba permutacji testu permutacyjnego (0 = bez testu)
+        seed: ziarno permutacji
+        influence: czy dolaczyc diagnostyke wplywu punktow
+        display: 'all' | 'thin' | 'grid' - redukcja punktow na wykresie
+        point_budget: maksymalna liczba punktow / komorek siatki
+        bands: (n_grid, confidence, x_min, x_max) - pasma regresji (None = bez pasm)
+
+    Returns:
+        dict z wynikami gotowymi do jsonify; point_details jako kolumny
+        {x, y, dx, dy, product, dx_sq, dy_sq} (lub None dla details='none');
+        permutation (gdy permutations > 0); influence (gdy influence=True);
+        display (gdy display != 'all'); bands (gdy bands)
+    """
+    # Jedno przejscie: srednie, odchylenia i sumy (wspolne jadro momentow)
+    m = centered_moments(x_arr, y_arr)
+    n = m['n']
+    dx = m['dx']  # (xi - x_bar)
+    dy = m['dy']  # (yi - y_bar)
+    st = regression_from_moments(n, m['mean_x'], m['mean_y'],
+                                 m['sum_dx_sq'], m['sum_dy_sq'], m['sum_products'])
+
+    result = _summary_response(n, m['mean_x'], m['mean_y'], m['sum_products'],
+                               m['sum_dx_sq'], m['sum_dy_sq'], st['r'], st['p_value'],
+                               st['slope'], st['intercept'], st['std_err'])
+
+    # Odporne alternatywy: rho Spearmana i tau-b Kendalla
+    result.update(_rank_correlations(x_arr, y_arr))
+
+    # Dane per-punkt do tabeli (kolumnowo, tylko wybrany zakres)
+    if details == 'none':
+        start, stop = 0, 0
+        result['point_details'] = None
+    else:
+        start, stop = (0, n) if details == 'all' else (min(details_offset, n),
+                                                       min(details_offset + details_k, n))
+        part = slice(start, stop)
+        dx_part = dx[part]
+        dy_part = dy[part]
+        result['point_details'] = _sanitize_columns({
+            'x': x_arr[part],
+            'y': y_arr[part],
+            'dx': dx_part,
+            'dy': dy_part,
+            'product': dx_part * dy_part,     # (xi - x_bar)(yi - y_bar)
+            'dx_sq': dx_part ** 2,            # (xi - x_bar)^2
+            'dy_sq': dy_part ** 2,            # (yi - y_bar)^2
+        })
+    result['details'] = {'mode': details, 'offset': start, 'count': stop - start, 'total': n}
+
+    if permutations:
+        result['permutation'] = _permutation_test(x_arr, y_arr, permutations, seed)
+
+    if influence:
+        # Liczone dla wszystkich punktow, kolumny zwracane w zakresie tabeli per-punkt
+        diag = _influence_diagnostics(x_arr, y_arr)
+        thresholds = diag.pop('thresholds')
+        abs_delta = np.abs(np.nan_to_num(diag['delta_r']))
+        cooks = np.nan_to_num(diag['cooks_d'])
+        result['influence'] = {
+            'columns': _sanitize_columns({name: col[start:stop] for name, col in diag.items()}),
+            'most_influential': int(np.argmax(abs_delta)),
+            'max_abs_delta_r': round(float(abs_delta.max()), 6),
+            'n_high_cooks_d': int(np.count_nonzero(cooks > thresholds['cooks_d'])),
+            'thresholds': {k: round(float(v), 6) for k, v in thresholds.items()},
+        }
+
+    if bands is not None:
+        result['bands'] = _cached_bands(x_arr, y_arr, m, bands)
+
+    display_payload = _display_payload(x_arr, y_arr, display, point_budget)
+    if display_payload is not None:
+        result['display'] = display_payload
+    return result
+
+
+def _r_from_sums(n, sx, sy, sxx, syy, sxy):
+    """
+    Wektorowy wspolczynnik r z sum (tablice dowolnego ksztaltu).
+    Dla zerowej wariancji zwraca NaN.
+    """
+    cov = n * sxy - sx * sy
+    var_x = n * sxx - sx * sx
+    var_y = n * syy - sy * sy
+    denom = np.sqrt(np.clip(var_x, 0, None) * np.clip(var_y, 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.where(denom > 0, cov / denom, np.nan)
+    return np.clip(r, -1.0, 1.0)
+
+
+def _bootstrap_r_chunk(task):
+    """
+    Liczy r dla `count` prob bootstrapowych. Funkcja modulowa - uruchamiana w puli procesow.
+
+    Probki losowane sa jako macierze indeksow (rows x n), po tyle wierszy,
+    by macierz miescila sie w BOOTSTRAP_CHUNK_ELEMENTS. Sumy wystarczajace
+    liczone sa wektorowo dla wszystkich wierszy naraz.
+
+    Args:
+        task: (x, y, count, seed) - x, y wycentrowane
+
+    Returns:
+        numpy array r (NaN dla prob o zerowej wariancji)
+    """
+    x, y, count, seed = task
+    n = len(x)
+    rng = np.random.default_rng(seed)
+    rows = max(1, min(count, BOOTSTRAP_CHUNK_ELEMENTS // n))
+    out = np.empty(count)
+    for start in range(0, count, rows):
+        k = min(rows, count - start)
+        idx = rng.integers(0, n, size=(k, n))
+        xs = x[idx]
+        ys = y[idx]
+        out[start:start + k] = _r_from_sums(
+            n, xs.sum(axis=1), ys.sum(axis=1),
+            np.einsum('ij,ij->i', xs, xs), np.einsum('ij,ij->i', ys, ys),
+            np.einsum('ij,ij->i', xs, ys))
+    return out
+
+
+def _jackknife_r(x, y):
+    """Wspolczynniki r z pominieciem kolejnych punktow - w O(n) z sum."""
+    n = len(x)
+    sx, sy = x.sum(), y.sum()
+    return _r_from_sums(n - 1, sx - x, sy - y, (x @ x) - x * x, (y @ y) - y * y,
+                        (x @ y) - x * y)
+
+
+def _bootstrap_correlation(x_arr, y_arr, n_resamples=BOOTSTRAP_DEFAULT_RESAMPLES,
+                           confidence=0.95, seed=None, workers=None):
+    """
+    Przedzialy bootstrapowe dla r: percentylowy i BCa.
+
+    Args:
+        x_arr, y_arr: numpy arrays punktow (po walidacji)
+        n_resamples: liczba prob B
+        confidence: poziom ufnosci
+        seed: ziarno (None = losowe)
+        workers: liczba procesow; None = wszystkie rdzenie gdy B >= BOOTSTRAP_PARALLEL_MIN
+
+    Returns:
+        dict gotowy do jsonify
+    """
+    x = x_arr - x_arr.mean()
+    y = y_arr - y_arr.mean()
+    r_hat = float(_r_from_sums(len(x), 0.0, 0.0, x @ x, y @ y, x @ y))
+
+    if workers is None:
+        workers = resolve_workers(None) if n_resamples >= BOOTSTRAP_PARALLEL_MIN else 1
+    sizes = [BOOTSTRAP_TASK_SIZE] * (n_resamples // BOOTSTRAP_TASK_SIZE)
+    if n_resamples % BOOTSTRAP_TASK_SIZE:
+        sizes.append(n_resamples % BOOTSTRAP_TASK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(x, y, k, s) for k, s in zip(sizes, seeds)]
+    boot = np.concatenate(parallel_map(_bootstrap_r_chunk, tasks, workers=workers))
+    boot = np.sort(boot[np.isfinite(boot)])
+    if len(boot) < 2:
+        raise ValueError("Za malo prob bootstrapowych o niezerowej wariancji")
+
+    tail = (1 - confidence) / 2
+    percentile = np.quantile(boot, [tail, 1 - tail])
+
+    # BCa: korekta obciazenia z0 i przyspieszenie a z jackknife
+    below = np.searchsorted(boot, r_hat, side='left')
+    equal = np.searchsorted(boot, r_hat, side='right') - below
+    share = (below + 0.5 * equal) / len(boot)
+    z0 = float(stats.norm.ppf(np.clip(share, 1 / len(boot), 1 - 1 / len(boot))))
+    jack = _jackknife_r(x, y)
+    jack = jack[np.isfinite(jack)]
+    d = jack.mean() - jack
+    denom = 6 * (d @ d) ** 1.5
+    accel = float((d ** 3).sum() / denom) if denom > 0 else 0.0
+    z_alpha = stats.norm.ppf([tail, 1 - tail])
+    adjusted = stats.norm.cdf(z0 + (z0 + z_alpha) / (1 - accel * (z0 + z_alpha)))
+    bca = np.quantile(boot, adjusted)
+
+    counts, edges = np.histogram(boot, bins=BOOTSTRAP_HIST_BINS, range=(-1, 1))
+    return {
+        'r': round(r_hat, 6),
+        'confidence': confidence,
+        'n_resamples': int(n_resamples),
+        'n_valid': int(len(boot)),
+        'percentile': {'lower': round(float(percentile[0]), 6),
+                       'upper': round(float(percentile[1]), 6)},
+        'bca': {'lower': round(float(bca[0]), 6), 'upper': round(float(bca[1]), 6),
+                'z0': round(z0, 6), 'acceleration': round(accel, 6)},
+        'bootstrap_mean': round(float(boot.mean()), 6),
+        'bootstrap_std': round(float(boot.std(ddof=1)), 6),
+        'histogram': {'edges': np.round(edges, 4).tolist(), 'counts': counts.tolist()},
+    }
+
+
+def _matrix_columns(columns_raw):
+    """
+    Waliduje kolumny {nazwa: [wartosci], ...} i zwraca (nazwy, tablica p x n).
+    Rzuca ValueError jesli dane sa niepoprawne.
+    """
+    if not isinstance(columns_raw, dict):
+        raise ValueError("Pole 'columns' musi byc obiektem {nazwa: [wartosci], ...}")
+    names = [str(name) for name in columns_raw]
+    if not 2 <= len(names) <= MATRIX_MAX_COLUMNS:
+        raise ValueError(f"Wymagane 2-{MATRIX_MAX_COLUMNS} kolumn")
+    lengths = {len(v) if isinstance(v, list) else -1 for v in columns_raw.values()}
+    if -1 in lengths:
+        raise ValueError("Kazda kolumna musi byc lista liczb")
+    if len(lengths) != 1:
+        raise ValueError("Kolumny musza miec te sama dlugosc")
+    n = lengths.pop()
+    if n < 3:
+        raise ValueError("Wymagane co najmniej 3 wiersze")
+    if n * len(names) > MATRIX_MAX_CELLS:
+        raise ValueError(f"Maksymalnie {MATRIX_MAX_CELLS} wartosci (wiersze x kolumny)")
+
+    data = np.empty((len(names), n))
+    for j, (name, values) in enumerate(zip(names, columns_raw.values())):
+        try:
+            data[j] = np.asarray(values, dtype=float)
+        except (ValueError, TypeError):
+            raise ValueError(f"Kolumna '{name}': wartosci musza byc liczbami")
+        bad = np.flatnonzero(~np.isfinite(data[j]))
+        if len(bad):
+            raise ValueError(f"Kolumna '{name}', wiersz {bad[0] + 1}: "
+                             "wartosc musi byc liczba skonczona")
+        if np.all(data[j] == data[j, 0]):
+            raise ValueError(f"Kolumna '{name}' ma zerowa wariancje - korelacja niezdefiniowana")
+    return names, data
+
+
+def _correlation_matrix(data, chunk_rows=MATRIX_CHUNK_ROWS):
+    """
+    Macierz korelacji Pearsona dla p zmiennych.
+
+    Jeden blokowy iloczyn macierzowy: C = sum po paczkach wierszy D_c D_c^T,
+    gdzie D_c to wycentrowana paczka (p x chunk_rows). Centrowana jest tylko
+    jedna paczka naraz, wiec pamiec dodatkowa nie zalezy od n.
+
+    Args:
+        data: numpy array p x n (wiersz = zmienna)
+
+    Returns:
+        tuple: (r p x p, p_value p x p) - p-value z testu t, df = n - 2
+    """
+    p, n = data.shape
+    means = data.mean(axis=1, keepdims=True)
+    comoments = np.zeros((p, p))
+    for start in range(0, n, chunk_rows):
+        block = data[:, start:start + chunk_rows] - means
+        comoments += block @ block.T
+
+    scale = np.sqrt(np.diag(comoments))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.clip(comoments / np.outer(scale, scale), -1.0, 1.0)
+        np.fill_diagonal(r, 1.0)
+        df = n - 2
+        t = np.abs(r) * np.sqrt(df / (1 - r * r))
+        p_value = np.where(np.abs(r) < 1, 2 * stats.t.sf(t, df), 0.0)
+    return r, p_value
+
+
+def _cluster_order(r, method):
+    """Kolejnosc lisci grupowania hierarchicznego z odlegloscia 1 - |r|."""
+    distance = np.clip(1 - np.abs(r), 0.0, None)
+    np.fill_diagonal(distance, 0.0)
+    tree = hierarchy.linkage(squareform(distance, checks=False), method=method)
+    return hierarchy.leaves_list(tree).tolist()
+
+
+def _merge_comoments(a, b):
+    """
+    Laczy momenty dwoch paczek danych (wzor Chana i in. dla wariancji i kowariancji).
+
+    Momenty to krotki (n, mean_x, mean_y, Sxx, Syy, Sxy) z sumami odchylen
+    od sredniej paczki - stabilne numerycznie niezaleznie od przesuniecia danych.
+    """
+    n_a, mx_a, my_a, sxx_a, syy_a, sxy_a = a
+    n_b, mx_b, my_b, sxx_b, syy_b, sxy_b = b
+    n = n_a + n_b
+    if n_a == 0 or n_b == 0:
+        return a if n_b == 0 else b
+    dx = mx_b - mx_a
+    dy = my_b - my_a
+    w = n_a * n_b / n
+    return (n, mx_a + dx * n_b / n, my_a + dy * n_b / n,
+            sxx_a + sxx_b + dx * dx * w,
+            syy_a + syy_b + dy * dy * w,
+            sxy_a + sxy_b + dx * dy * w)
+
+
+def _parse_csv_chunk(lines, delimiter, first_record):
+    """
+    Parsuje paczke linii CSV do tablicy (m, 2) z dwoch pierwszych kolumn.
+
+    Szybka sciezka: np.loadtxt (parser w C). Gdy paczka zawiera braki lub
+    bledy, wolna sciezka csv.reader pomija wiersze z pustymi polami i wskazuje
+    numer pierwszego niepoprawnego rekordu (rekordy danych liczone od 1, bez
+    naglowka i pustych linii - pole w cudzyslowie moze zajmowac kilka linii).
+
+    Args:
+        first_record: numer pierwszego rekordu danych w paczce
+
+    Returns:
+        tuple: (xy, n_skipped, n_records) - xy zawiera tylko wiersze o skonczonych
+        wartosciach, n_records to liczba rekordow danych w paczce
+    """
+    try:
+        # comments=None: linie z '#' sa rekordami jak w csv.reader (nie komentarzami)
+        xy = np.loadtxt(lines, delimiter=delimiter, usecols=(0, 1), ndmin=2,
+                        dtype=np.float64, quotechar='"', comments=None)
+        skipped = 0
+        n_records = len(xy)
+    except ValueError:
+        rows = []
+        skipped = 0
+        n_records = 0
+        for fields in csv.reader(lines, delimiter=delimiter):
+            if not fields:
+                continue
+            record = first_record + n_records
+            n_records += 1
+            if len(fields) < 2:
+                raise ValueError(f"Rekord {record}: wymagane 2 kolumny")
+            a, b = fields[0].strip(), fields[1].strip()
+            if not a or not b:
+                skipped += 1
+                continue
+            try:
+                rows.append((float(a), float(b)))
+            except ValueError:
+                raise ValueError(f"Rekord {record}: wartosci musza byc liczbami")
+        xy = np.array(rows, dtype=np.float64).reshape(-1, 2)
+
+    finite = np.isfinite(xy).all(axis=1)
+    if not finite.all():
+        skipped += int(len(xy) - np.count_nonzero(finite))
+        xy = xy[finite]
+    return xy, skipped, n_records
+
+
+def _reservoir_update(reservoir, seen, chunk, rng):
+    """
+    Algorytm R dla calej paczki naraz: element o numerze t (od 1) trafia na
+    losowa pozycje j < k z prawdopodobienstwem k/t. Przy powtorzonych j
+    zostaje ostatni element (jak w wersji sekwencyjnej) - wybierany jawnie
+    przez np.unique na odwroconej tablicy, bez polegania na kolejnosci
+    zapisu przy powtorzonych indeksach.
+
+    Args:
+        reservoir: tablica (k, 2) uzupelniana w miejscu
+        seen: liczba elementow strumienia przed ta paczka
+
+    Returns:
+        int: liczba elementow strumienia po tej paczce
+    """
+    k = len(reservoir)
+    m = len(chunk)
+    fill = min(max(k - seen, 0), m)
+    reservoir[seen:seen + fill] = chunk[:fill]
+    if fill < m:
+        t = np.arange(seen + fill + 1, seen + m + 1)
+        j = rng.integers(0, t)
+        src = np.flatnonzero(j < k)[::-1]
+        slots, last = np.unique(j[src], return_index=True)
+        reservoir[slots] = chunk[fill:][src[last]]
+    return seen + m
+
+
+def _analyze_csv_stream(stream, delimiter=',', header=True, sample_size=UPLOAD_SAMPLE_SIZE,
+                        seed=None):
+    """
+    Jedno przejscie po pliku CSV: zapis do pliku float64, momenty i probka.
+
+    Plik czytany jest paczkami po UPLOAD_CHUNK_ROWS wierszy; kazda paczka jest
+    dopisywana do pliku tymczasowego (pozniej mapowanego w pamieci), jej momenty
+    sa laczone z dotychczasowymi (_merge_comoments), a probka do wykresu jest
+    uzupelniana losowaniem rezerwuarowym. Pamiec nie rosnie z rozmiarem pliku.
+
+    Returns:
+        dict: path, n, n_skipped, moments (n, mean_x, mean_y, Sxx, Syy, Sxy),
+        sample (k x 2), variables
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    variables = None
+    record_no = 1
+    if header:
+        first = next(csv.reader([text.readline()], delimiter=delimiter), [])
+        if len(first) < 2:
+            raise ValueError("Plik musi miec co najmniej 2 kolumny")
+        variables = [first[0].strip(), first[1].strip()]
+
+    rng = np.random.default_rng(seed)
+    reservoir = np.empty((sample_size, 2))
+    moments = (0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    n_skipped = 0
+    seen = 0
+    fd, path = tempfile.mkstemp(prefix='pearson_', suffix='.f64')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                lines = list(itertools.islice(text, UPLOAD_CHUNK_ROWS))
+                if not lines:
+                    break
+                xy, skipped, n_records = _parse_csv_chunk(lines, delimiter, record_no)
+                record_no += n_records
+                n_skipped += skipped
+                if len(xy) == 0:
+                    continue
+                xy.tofile(out)
+                m = centered_moments(xy[:, 0], xy[:, 1])
+                moments = _merge_comoments(moments, (
+                    m['n'], m['mean_x'], m['mean_y'],
+                    m['sum_dx_sq'], m['sum_dy_sq'], m['sum_products']))
+                seen = _reservoir_update(reservoir, seen, xy, rng)
+    except Exception:
+        os.remove(path)
+        raise
+
+    n = moments[0]
+    return {
+        'path': path,
+        'n': n,
+        'n_skipped': n_skipped,
+        'moments': moments,
+        'sample': reservoir[:min(n, sample_size)],
+        'variables': variables,
+    }
+
+
+def _summary_from_moments(moments):
+    """Statystyki jak w /api/compute z momentow (n, mean_x, mean_y, Sxx, Syy, Sxy)."""
+    n, mean_x, mean_y, sxx, syy, sxy = moments
+    if n < 3:
+        raise ValueError("Potrzeba co najmniej 3 punktow do obliczenia korelacji")
+    if sxx <= 0:
+        raise ValueError("Wszystkie wartosci x sa identyczne - korelacja niezdefiniowana")
+    if syy <= 0:
+        raise ValueError("Wszystkie wartosci y sa identyczne - korelacja niezdefiniowana")
+    st = regression_from_moments(n, mean_x, mean_y, sxx, syy, sxy)
+    return _summary_response(n, mean_x, mean_y, sxy, sxx, syy, st['r'], st['p_value'],
+                             st['slope'], st['intercept'], st['std_err'])
+
+
+def _remove_upload(entry):
+    """Zamyka mapowanie i usuwa plik zbioru (na Windows moze sie nie udac od razu)."""
+    entry.pop('data', None)
+    try:
+        os.remove(entry['path'])
+    except OSError:
+        pass
+
+
+def _register_upload(entry):
+    """Zapisuje zbior w rejestrze i zwraca jego identyfikator."""
+    dataset_id = uuid.uuid4().hex
+    with _uploads_lock:
+        _uploads[dataset_id] = entry
+        while len(_uploads) > UPLOAD_MAX_DATASETS:
+            _remove_upload(_uploads.popitem(last=False)[1])
+    return dataset_id
+
+
+def _get_upload(dataset_id):
+    """Zwraca zarejestrowany zbior. Rzuca ValueError gdy nie istnieje (lub zostal usuniety)."""
+    with _uploads_lock:
+        entry = _uploads.get(dataset_id)
+        if entry is None:
+            raise ValueError("Nieznany zbior danych - wyslij plik ponownie")
+        _uploads.move_to_end(dataset_id)
+    return entry
+
+
+@atexit.register
+def _cleanup_uploads():
+    with _uploads_lock:
+        while _uploads:
+            _remove_upload(_uploads.popitem()[1])
+
+
+def _sample_response(sample):
+    """Probka do wykresu rozrzutu jako kolumny {x, y}."""
+    return {'x': sample[:, 0].tolist(), 'y': sample[:, 1].tolist()}
+
+
+def _validate_sample_size(value):
+    sample_size = int(value)
+    if sample_size < 1 or sample_size > UPLOAD_MAX_SAMPLE:
+        raise ValueError(f"Rozmiar probki musi byc miedzy 1 a {UPLOAD_MAX_SAMPLE}")
+    return sample_size
+
+
 def _generate_dataset(dataset_type):
     """
     Generuje przykladowy zbior danych.
@@ -269,14 +1420,37 @@ def compute():
     Oblicza wspolczynnik korelacji Pearsona dla podanych punktow.
 
     Request JSON:
-        points: [{x: float, y: float}, ...]
+        points: [{x: float, y: float}, ...] lub {x: [...], y: [...]} (max 100000)
+        details: 'none' | 'first_k' (domyslnie) | 'all' - zakres tabeli per-punkt
+        details_k: rozmiar strony dla 'first_k' (domyslnie 100)
+        details_offset: poczatek strony dla 'first_k' (domyslnie 0)
+        permutations: liczba permutacji testu permutacyjnego (domyslnie 0 = wylaczony;
+            permutacje * n <= 2e8)
+        seed: ziarno permutacji (opcjonalne)
+        influence: czy dolaczyc diagnostyke wplywu punktow (domyslnie false)
+        display: 'all' (domyslnie) | 'thin' | 'grid' - redukcja punktow na wykresie
+        point_budget: maksymalna liczba punktow / komorek siatki (domyslnie 2000)
+        bands: {n_grid, confidence, x_min, x_max} (opcjonalne) - pasma regresji
+
+    Naglowek X-Client-Id (opcjonalny): gdy ten sam klient wysle nowsze zapytanie,
+    czekajace starsze dostaja odpowiedz {success: false, status: 'superseded'}.
 
     Response JSON:
         r, r_squared, p_value, n, df, mean_x, mean_y,
         sum_products, sum_dx_sq, sum_dy_sq,
         slope, intercept, std_err,
         strength, strength_label, direction,
-        point_details: [{x, y, dx, dy, product, dx_sq, dy_sq}, ...]
+        point_details: {x: [...], y: [...], dx, dy, product, dx_sq, dy_sq} lub null,
+        details: {mode, offset, count, total},
+        permutation: {method, n_permutations, p_value, observed_r,
+                      histogram{edges, counts}} (gdy permutations > 0),
+        influence: {columns{loo_r, loo_slope, delta_r, leverage, cooks_d,
+                    dfbetas_intercept, dfbetas_slope}, most_influential,
+                    max_abs_delta_r, n_high_cooks_d, thresholds} (gdy influence),
+        display: {mode: 'thin', n_total, n_shown, indices}
+                 | {mode: 'grid', n_total, x_edges, y_edges, counts[y][x]} (gdy display != 'all'),
+        bands: {x, fit, ci_lower, ci_upper, pi_lower, pi_upper, confidence,
+                t_critical, cached} (gdy bands)
     """
     try:
         data = _validate_request_json()
@@ -285,7 +1459,29 @@ def compute():
             raise ValueError("Brak wymaganego pola 'points'")
 
         x_arr, y_arr = _validate_points(data['points'])
-        result = _compute_pearson(x_arr, y_arr)
+        mode, k, offset = _validate_details_params(data)
+        permutations = int(data.get('permutations', 0))
+        if permutations < 0 or permutations > PERMUTATION_MAX:
+            raise ValueError(f"Liczba permutacji musi byc miedzy 0 a {PERMUTATION_MAX}")
+        if permutations * len(x_arr) > PERMUTATION_MAX_ELEMENTS:
+            raise ValueError("Iloczyn liczby permutacji i liczby punktow nie moze "
+                             f"przekraczac {PERMUTATION_MAX_ELEMENTS}")
+        seed = data.get('seed', None)
+        if seed is not None:
+            seed = int(seed)
+        influence = bool(data.get('influence', False))
+        display, point_budget = _validate_display_params(data)
+        bands = data.get('bands', None)
+        if bands is not None:
+            if not isinstance(bands, dict):
+                raise ValueError("Parametr 'bands' musi byc obiektem")
+            bands = _validate_bands_params(bands, x_arr)
+        result = _coalescer.run(
+            client_id_from_request(), 'compute',
+            lambda: _compute_pearson(x_arr, y_arr, mode, k, offset, permutations, seed,
+                                     influence, display, point_budget, bands))
+        if result is SUPERSEDED:
+            return superseded_response()
         result['success'] = True
         return jsonify(result)
 
@@ -334,5 +1530,388 @@ def generate():
         }), 500
 
 
+@app.route('/api/bootstrap', methods=['POST'])
+def bootstrap():
+    """
+    Bootstrapowy przedzial ufnosci dla r (percentylowy i BCa).
+
+    Request JSON:
+        points: [{x, y}, ...] lub {x: [...], y: [...]}
+        n_resamples: liczba prob B (domyslnie 10000, max 1000000; B * n <= 2e8)
+        confidence: poziom ufnosci (domyslnie 0.95)
+        seed: ziarno (opcjonalne)
+        workers: liczba procesow (opcjonalne; 0 = wszystkie rdzenie)
+
+    Response JSON:
+        r, confidence, n_resamples, n_valid, percentile{lower, upper},
+        bca{lower, upper, z0, acceleration}, bootstrap_mean, bootstrap_std,
+        histogram{edges, counts}
+    """
+    try:
+        data = _validate_request_json()
+
+        if 'points' not in data:
+            raise ValueError("Brak wymaganego pola 'points'")
+
+        x_arr, y_arr = _validate_points(data['points'])
+        n_resamples = int(data.get('n_resamples', BOOTSTRAP_DEFAULT_RESAMPLES))
+        if n_resamples < 100 or n_resamples > BOOTSTRAP_MAX_RESAMPLES:
+            raise ValueError(f"Liczba prob musi byc miedzy 100 a {BOOTSTRAP_MAX_RESAMPLES}")
+        if n_resamples * len(x_arr) > BOOTSTRAP_MAX_ELEMENTS:
+            raise ValueError("Iloczyn liczby prob i liczby punktow nie moze "
+                             f"przekraczac {BOOTSTRAP_MAX_ELEMENTS}")
+        confidence = float(data.get('confidence', 0.95))
+        if not 0.5 <= confidence < 1:
+            raise ValueError("Poziom ufnosci musi byc z przedzialu [0.5, 1)")
+        seed = data.get('seed', None)
+        if seed is not None:
+            seed = int(seed)
+        workers = data.get('workers', None)
+        if workers is not None:
+            workers = resolve_workers(workers)
+
+        result = _coalescer.run(
+            client_id_from_request(), 'bootstrap',
+            lambda: _bootstrap_correlation(x_arr, y_arr, n_resamples, confidence, seed, workers))
+        if result is SUPERSEDED:
+            return superseded_response()
+        result['success'] = True
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+@app.route('/api/matrix', methods=['POST'])
+def matrix():
+    """
+    Macierz korelacji dla wielu zmiennych.
+
+    Request JSON:
+        columns: {nazwa: [wartosci], ...} (2-500 kolumn, co najmniej 3 wiersze)
+        cluster: null | 'average' | 'complete' | 'single' - kolejnosc z grupowania
+                 hierarchicznego (odleglosc 1 - |r|)
+
+    Response JSON:
+        names, n, p, r (p x p), p_values (p x p), order (lista indeksow lub null)
+    """
+    try:
+        data = _validate_request_json()
+
+        if 'columns' not in data:
+            raise ValueError("Brak wymaganego pola 'columns'")
+        cluster = data.get('cluster', None)
+        if cluster is not None and cluster not in MATRIX_LINKAGE_METHODS:
+            raise ValueError(f"Nieznana metoda grupowania. Dostepne: {', '.join(MATRIX_LINKAGE_METHODS)}")
+        names, values = _matrix_columns(data['columns'])
+
+        def compute_matrix():
+            r, p_value = _correlation_matrix(values)
+            return {
+                'names': names,
+                'n': values.shape[1],
+                'p': len(names),
+                'r': np.round(r, 6).tolist(),
+                'p_values': p_value.tolist(),
+                'order': _cluster_order(r, cluster) if cluster else None,
+            }
+
+        result = _coalescer.run(client_id_from_request(), 'matrix', compute_matrix)
+        if result is SUPERSEDED:
+            return superseded_response()
+        result['success'] = True
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+@app.route('/api/upload', methods=['POST'])
+def upload():
+    """
+    Analizuje duzy plik CSV (dwie kolumny liczbowe) bez wczytywania go do pamieci.
+
+    Request (multipart/form-data):
+        file: plik CSV, dwie pierwsze kolumny to x i y
+        header: 'true'/'false' - czy pierwszy wiersz to naglowek (domyslnie true)
+        delimiter: separator pol (domyslnie ',')
+        sample_size: rozmiar probki do wykresu (domyslnie 2000, max 20000)
+        seed: ziarno losowania probki (opcjonalne)
+
+    Response JSON:
+        statystyki jak w /api/compute (bez point_details), dataset_id,
+        variables, skipped_rows, sample{x, y}
+    """
+    try:
+        if 'file' not in request.files:
+            raise ValueError("Brak wymaganego pliku 'file'")
+
+        form = request.form
+        header = form.get('header', 'true').lower() not in ('false', '0', 'no')
+        delimiter = form.get('delimiter', ',')
+        if len(delimiter) != 1:
+            raise ValueError("Separator musi byc pojedynczym znakiem")
+        sample_size = _validate_sample_size(form.get('sample_size', UPLOAD_SAMPLE_SIZE))
+        seed = form.get('seed', None)
+        if seed is not None:
+            seed = int(seed)
+
+        try:
+            parsed = _analyze_csv_stream(request.files['file'].stream, delimiter, header,
+                                         sample_size, seed)
+        except (UnicodeDecodeError, csv.Error):
+            raise ValueError("Niepoprawny plik CSV (wymagane kodowanie UTF-8)")
+
+        try:
+            summary = _summary_from_moments(parsed['moments'])
+        except ValueError:
+            os.remove(parsed['path'])
+            raise
+
+        n = parsed['n']
+        dataset_id = _register_upload({
+            'path': parsed['path'],
+            'data': np.memmap(parsed['path'], dtype=np.float64, mode='r', shape=(n, 2)),
+            'n': n,
+            'summary': summary,
+            'variables': parsed['variables'],
+        })
+
+        result = dict(summary)
+        result.update({
+            'success': True,
+            'dataset_id': dataset_id,
+            'variables': parsed['variables'],
+            'skipped_rows': parsed['n_skipped'],
+            'sample': _sample_response(parsed['sample']),
+        })
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+@app.route('/api/upload/<dataset_id>', methods=['GET'])
+def upload_get(dataset_id):
+    """
+    Zwraca statystyki wczesniej wyslanego pliku i nowa probke do wykresu.
+
+    Probka losowana jest bez zwracania z pliku mapowanego w pamieci
+    (odczytywane sa tylko potrzebne strony pliku).
+
+    Query params:
+        sample_size: rozmiar probki (domyslnie 2000, max 20000)
+        seed: ziarno (opcjonalne)
+    """
+    try:
+        entry = _get_upload(dataset_id)
+        sample_size = _validate_sample_size(request.args.get('sample_size', UPLOAD_SAMPLE_SIZE))
+        seed = request.args.get('seed', None)
+        rng = np.random.default_rng(None if seed is None else int(seed))
+        n = entry['n']
+        idx = np.sort(rng.choice(n, size=min(sample_size, n), replace=False))
+
+        result = dict(entry['summary'])
+        result.update({
+            'success': True,
+            'dataset_id': dataset_id,
+            'variables': entry['variables'],
+            'sample': _sample_response(np.asarray(entry['data'][idx])),
+        })
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+def _store_response(store, include_points=False):
+    """Odpowiedz endpointow /api/points/* ze statystykami zbioru."""
+    result = store.summary()
+    if include_points:
+        result['points'] = [{'x': x, 'y': y} for x, y in zip(store.xs, store.ys)]
+    result['success'] = True
+    return jsonify(result)
+
+
+@app.route('/api/points', methods=['GET'])
+def points_get():
+    """
+    Zwraca biezacy zbior punktow klienta i jego statystyki.
+
+    Response JSON:
+        version, n, ready, points + statystyki jak w /api/compute (bez point_details
+        i korelacji rangowych)
+    """
+    try:
+        store = _get_point_store()
+        with store.lock:
+            return _store_response(store, include_points=True)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+@app.route('/api/points/details', methods=['GET'])
+def points_details():
+    """
+    Tabela per-punkt, diagnostyka wplywu i (opcjonalnie) pasma dla zbioru klienta.
+
+    Uzupelnia szybkie statystyki z /api/points/<akcja> o dane wymagajace
+    przejscia po wszystkich punktach - frontend pobiera je z opoznieniem,
+    bez ponownego wysylania listy punktow.
+
+    Query params:
+        details: 'none' | 'first_k' (domyslnie) | 'all' - zakres tabeli per-punkt
+        details_k: rozmiar strony dla 'first_k' (domyslnie 100)
+        details_offset: poczatek strony dla 'first_k' (domyslnie 0)
+        n_grid, confidence, x_min, x_max: jak w /api/points/bands
+            (pasma dolaczane, gdy podano n_grid)
+
+    Response JSON:
+        version + wynik jak w /api/compute z influence=true (kolumny wplywu
+        i point_details w zakresie wybranej strony)
+    """
+    try:
+        mode, k, offset = _validate_details_params(request.args)
+        store = _get_point_store()
+        with store.lock:
+            summary = store.summary()
+            if not summary['ready']:
+                raise ValueError(summary['reason'])
+            x_arr = np.asarray(store.xs, dtype=float)
+            y_arr = np.asarray(store.ys, dtype=float)
+            bands = None
+            if 'n_grid' in request.args:
+                bands = store.bands(*_validate_bands_params(request.args, store.xs))
+        result = _coalescer.run(
+            client_id_from_request(), 'points_details',
+            lambda: _compute_pearson(x_arr, y_arr, mode, k, offset, influence=True))
+        if result is SUPERSEDED:
+            return superseded_response()
+        result['version'] = summary['version']
+        if bands is not None:
+            result['bands'] = bands
+        result['success'] = True
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+@app.route('/api/points/bands', methods=['GET'])
+def points_bands():
+    """
+    Pasma ufnosci i predykcji regresji dla zbioru punktow klienta.
+
+    Liczone z sum biegnacych i zapamietywane dla wersji zbioru - kolejne
+    zapytania bez zmian punktow (np. przy zmianie rozmiaru wykresu) zwracaja
+    wynik z pamieci (cached: true).
+
+    Query params:
+        n_grid: liczba punktow siatki x (domyslnie 50, max 1000)
+        confidence: poziom ufnosci (domyslnie 0.95)
+        x_min, x_max: zakres siatki (domyslnie zakres danych +/- 20%)
+
+    Response JSON:
+        version, x, fit, ci_lower, ci_upper, pi_lower, pi_upper,
+        confidence, t_critical, cached
+    """
+    try:
+        store = _get_point_store()
+        with store.lock:
+            if len(store.xs) < 3:
+                raise ValueError("Potrzeba co najmniej 3 punktow do obliczenia korelacji")
+            params = _validate_bands_params(request.args, store.xs)
+            result = store.bands(*params)
+            if result is None:
+                raise ValueError("Zerowa wariancja x lub y - regresja niezdefiniowana")
+        result['success'] = True
+        return jsonify(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
+@app.route('/api/points/<action>', methods=['POST'])
+def points_update(action):
+    """
+    Zmienia zbior punktow klienta i zwraca statystyki zaktualizowane w O(1).
+
+    Zbior jest przypisany do klienta przez wymagany naglowek X-Client-Id
+    (bez naglowka: 400).
+
+    Akcje (Request JSON):
+        reset:  {points: [{x, y}, ...] lub {x: [...], y: [...]}}  - zastepuje caly zbior
+        add:    {x, y}
+        move:   {index, x, y}
+        remove: {index}
+
+    Response JSON:
+        version, n, ready (false gdy < 3 punktow lub zerowa wariancja, z polem reason),
+        statystyki jak w /api/compute (bez point_details i korelacji rangowych) gdy ready
+    """
+    try:
+        data = _validate_request_json()
+        store = _get_point_store()
+
+        with store.lock:
+            if action == 'reset':
+                store.reset(*_points_to_arrays(data.get('points', []), min_points=0))
+            elif action == 'add':
+                store.add(*_parse_point(data, "Punkt"))
+            elif action == 'move':
+                x, y = _parse_point(data, "Punkt")
+                store.move(data.get('index'), x, y)
+            elif action == 'remove':
+                store.remove(data.get('index'))
+            else:
+                raise ValueError(f"Nieznana operacja: '{action}'")
+
+            return _store_response(store)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        return jsonify({
+            'success': False,
+            'error': 'Nieoczekiwany blad serwera'
+        }), 500
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5004)
@@ -0,0 +1,127 @@
+"""
+Benchmarki zabawki korelacji Pearsona.
+
+Walidacja punktow: dawna petla po slownikach [{x, y}, ...] (float() i
+sprawdzenie NaN dla kazdej wspolrzednej) vs walidacja wektorowa
+(_validate_points) dla listy slownikow i postaci kolumnowej {x: [...], y: [...]}.
+
+Bootstrap r: petla po pearsonr vs paczki macierzy indeksow z sumami
+wystarczajacymi (_bootstrap_correlation).
+
+Macierz korelacji: petla po parach z pearsonr vs blokowy iloczyn macierzowy
+(_correlation_matrix) i np.corrcoef jako punkt odniesienia.
+
+Użycie:
+    python benchmark.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+_TOY_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_TOY_DIR, '..'))
+sys.path.insert(0, _TOY_DIR)
+
+from scipy import stats  # noqa: E402
+
+from app import (_bootstrap_correlation, _cluster_order, _correlation_matrix,  # noqa: E402
+                 _validate_points)
+
+
+def _validate_points_loop(points_raw):
+    """Dawna walidacja: petla Pythona po punktach."""
+    xs = []
+    ys = []
+    for i, pt in enumerate(points_raw):
+        if not isinstance(pt, dict) or 'x' not in pt or 'y' not in pt:
+            raise ValueError(f"Punkt {i+1}: wymagane pola 'x' i 'y'")
+        x = float(pt['x'])
+        y = float(pt['y'])
+        if np.isnan(x) or np.isinf(x):
+            raise ValueError(f"Punkt {i+1}: wspolrzedna x musi byc liczba skonczona")
+        if np.isnan(y) or np.isinf(y):
+            raise ValueError(f"Punkt {i+1}: wspolrzedna y musi byc liczba skonczona")
+        xs.append(x)
+        ys.append(y)
+    return np.array(xs), np.array(ys)
+
+
+def _timeit(func, arg):
+    number = max(1, 20000 // len(arg['x'] if isinstance(arg, dict) else arg))
+    return min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number
+
+
+def bench_validation():
+    rng = np.random.default_rng(0)
+    print(f"{'n':>8} {'petla [ms]':>12} {'slowniki [ms]':>14} {'kolumny [ms]':>13}")
+    for n in [100, 1000, 10000, 100000]:
+        x = rng.normal(size=n).tolist()
+        y = rng.normal(size=n).tolist()
+        dicts = [{'x': a, 'y': b} for a, b in zip(x, y)]
+        columns = {'x': x, 'y': y}
+        t_loop = _timeit(_validate_points_loop, dicts)
+        t_dicts = _timeit(_validate_points, dicts)
+        t_columns = _timeit(_validate_points, columns)
+        print(f"{n:>8} {t_loop * 1e3:12.3f} {t_dicts * 1e3:14.3f} {t_columns * 1e3:13.3f}")
+
+
+def _bootstrap_loop(x, y, n_resamples, seed):
+    """Naiwny bootstrap: petla Pythona z pearsonr dla kazdej proby."""
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    out = np.empty(n_resamples)
+    for b in range(n_resamples):
+        idx = rng.integers(0, n, size=n)
+        out[b] = stats.pearsonr(x[idx], y[idx])[0]
+    return out
+
+
+def bench_bootstrap():
+    rng = np.random.default_rng(0)
+    print(f"\n{'n':>8} {'B':>8} {'petla [s]':>10} {'wektorowo [s]':>14}")
+    for n, b in [(100, 10000), (1000, 10000), (10000, 2000)]:
+        x = rng.normal(size=n)
+        y = 0.5 * x + rng.normal(size=n)
+        t_loop = min(timeit.repeat(lambda: _bootstrap_loop(x, y, 1000, 0), number=1, repeat=3))
+        t_loop *= b / 1000
+        t_vec = min(timeit.repeat(lambda: _bootstrap_correlation(x, y, b, seed=0, workers=1),
+                                  number=1, repeat=3))
+        print(f"{n:>8} {b:>8} {t_loop:10.3f} {t_vec:14.3f}")
+
+
+def _matrix_pairs_loop(data):
+    """Naiwna macierz: pearsonr dla kazdej pary zmiennych."""
+    p = data.shape[0]
+    r = np.eye(p)
+    for i in range(p):
+        for j in range(i + 1, p):
+            r[i, j] = r[j, i] = stats.pearsonr(data[i], data[j])[0]
+    return r
+
+
+def bench_matrix():
+    rng = np.random.default_rng(0)
+    print(f"\n{'n':>8} {'p':>5} {'pary [s]':>10} {'corrcoef [s]':>13} {'blokowo [s]':>12} "
+          f"{'+grupowanie [s]':>16}")
+    for n, p in [(1000, 50), (10000, 100), (100000, 200)]:
+        data = rng.normal(size=(p, 10)) @ rng.normal(size=(10, n)) + rng.normal(size=(p, n))
+        t_pairs = float('nan')
+        if n * p * p <= 1e8:
+            t_pairs = min(timeit.repeat(lambda: _matrix_pairs_loop(data), number=1, repeat=3))
+        t_corrcoef = min(timeit.repeat(lambda: np.corrcoef(data), number=1, repeat=3))
+        t_block = min(timeit.repeat(lambda: _correlation_matrix(data), number=1, repeat=3))
+        t_cluster = min(timeit.repeat(
+            lambda: _cluster_order(_correlation_matrix(data)[0], 'average'), number=1, repeat=3))
+        print(f"{n:>8} {p:>5} {t_pairs:10.3f} {t_corrcoef:13.3f} {t_block:12.3f} {t_cluster:16.3f}")
+
+
+def main():
+    bench_validation()
+    bench_bootstrap()
+    bench_matrix()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ PyWebView wrapper dla aplikacji Korelacja Pearsona.
 Uruchamia Flask server w tle i otwiera natywne okno aplikacji.
 """
 
+import multiprocessing
 import webview
 from threading import Thread
 import time
@@ -37,4 +38,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # Wymagane w .exe dla puli procesow (bootstrap)
+    multiprocessing.freeze_support()
     main()
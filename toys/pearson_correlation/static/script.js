@@ -8,11 +8,22 @@ const state = {
 // Debouncing
 let debounceTimer = null;
 
+// Kolejka zmian punktow - operacje na zbiorze serwera wysylane po kolei
+let pointOps = Promise.resolve();
+
+// Identyfikator klienta - serwer trzyma zbior punktow klienta
+// i liczy tylko jego najnowsze zapytanie
+const CLIENT_ID = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : Math.random().toString(36).slice(2) + Date.now().toString(36);
+
 // Kolory
 const COLORS = {
     point: '#6366f1',
     pointHover: '#4f46e5',
     regression: '#ef4444',
+    confidenceBand: 'rgba(239, 68, 68, 0.12)',
+    predictionBand: 'rgba(239, 68, 68, 0.45)',
     meanLineX: 'rgba(99, 102, 241, 0.3)',
     meanLineY: 'rgba(99, 102, 241, 0.3)',
     deviationPos: 'rgba(34, 197, 94, 0.25)',
@@ -65,6 +76,28 @@ function setupPlot() {
                 dash: 'solid'
             },
             hoverinfo: 'skip'
+        },
+        // Pasmo ufnosci sredniej odpowiedzi (wielokat: gorna krawedz + dolna od konca)
+        {
+            x: [],
+            y: [],
+            mode: 'lines',
+            type: 'scatter',
+            name: 'Pasmo ufnosci 95%',
+            fill: 'toself',
+            fillcolor: COLORS.confidenceBand,
+            line: { width: 0 },
+            hoverinfo: 'skip'
+        },
+        // Pasmo predykcji (dwie linie przerywane rozdzielone null)
+        {
+            x: [],
+            y: [],
+            mode: 'lines',
+            type: 'scatter',
+            name: 'Pasmo predykcji 95%',
+            line: { color: COLORS.predictionBand, width: 1.5, dash: 'dot' },
+            hoverinfo: 'skip'
         }
     ];
 
@@ -119,7 +152,7 @@ function setupPlot() {
             var idx = clickedPoint.pointIndex;
             if (idx >= 0 && idx < state.points.length) {
                 state.points.splice(idx, 1);
-                onPointsChanged();
+                onPointsChanged('remove', { index: idx });
             }
         }
     });
@@ -169,27 +202,75 @@ function setupPlot() {
         // Sprawdz limit punktow
         if (state.points.length >= 100) return;
 
-        state.points.push({
+        const point = {
             x: Math.round(x * 100) / 100,
             y: Math.round(y * 100) / 100
-        });
-        onPointsChanged();
+        };
+        state.points.push(point);
+        onPointsChanged('add', point);
     });
 }
 
 
-function onPointsChanged() {
+// Zmiana jest wysylana jako operacja na zbiorze serwera (/api/points/<akcja>),
+// nie jako cala lista punktow - odpowiedz niesie statystyki po zmianie
+function onPointsChanged(action, payload) {
     updatePlotPoints();
 
-    if (state.points.length >= 3) {
-        scheduleComputation();
-    } else {
+    const snapshot = state.points.slice();
+    pointOps = pointOps.then(() => sendPointOp(action, payload, snapshot));
+
+    if (state.points.length < 3) {
         // Za malo punktow - wyczysc wyniki
-        state.results = null;
-        clearResults();
-        clearRegressionLine();
-        clearDeviationShapes();
-        updateDataTable();
+        clearTimeout(debounceTimer);
+        showNoResults();
+    }
+}
+
+function showNoResults() {
+    state.results = null;
+    clearResults();
+    clearRegressionLine();
+    updateBands();
+    clearDeviationShapes();
+    updateDataTable();
+}
+
+async function postPointOp(action, payload) {
+    const response = await fetch(`/api/points/${action}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-Client-Id': CLIENT_ID },
+        body: JSON.stringify(payload)
+    });
+    const data = await response.json();
+    if (!response.ok || !data.success) {
+        throw new Error(data.error || `HTTP ${response.status}`);
+    }
+    return data;
+}
+
+async function sendPointOp(action, payload, snapshot) {
+    try {
+        let data = await postPointOp(action, payload);
+        // Serwer mogl zgubic zbior (restart, wypchniecie z pamieci) - wyslij go ponownie
+        if (data.n !== snapshot.length) {
+            data = await postPointOp('reset', { points: snapshot });
+        }
+        // Wynik starszej zmiany - nowsza jest juz w kolejce
+        if (snapshot.length !== state.points.length) return;
+
+        if (data.ready) {
+            // Statystyki od razu; tabela, odchylenia i pasma po debounce
+            state.results = data;
+            updateStats();
+            updateRegressionLine();
+            updateFormula();
+            scheduleComputation();
+        } else {
+            showNoResults();
+        }
+    } catch (error) {
+        console.error('Blad aktualizacji punktow:', error.message);
     }
 }
 
@@ -231,19 +312,22 @@ function updatePlotRange() {
     });
 }
 
+// Zakres linii regresji i pasm: zakres danych +/- 20%
+function regressionRange() {
+    const xs = state.points.map(p => p.x);
+    const minX = Math.min(...xs);
+    const maxX = Math.max(...xs);
+    const padX = (maxX - minX) * 0.2;
+    return [minX - padX, maxX + padX];
+}
+
 function updateRegressionLine() {
     if (!state.results) {
         clearRegressionLine();
         return;
     }
 
-    const xs = state.points.map(p => p.x);
-    const minX = Math.min(...xs);
-    const maxX = Math.max(...xs);
-    const padX = (maxX - minX) * 0.2;
-
-    const x1 = minX - padX;
-    const x2 = maxX + padX;
+    const [x1, x2] = regressionRange();
     const slope = state.results.slope;
     const intercept = state.results.intercept;
     const y1 = slope * x1 + intercept;
@@ -257,9 +341,29 @@ function updateRegressionLine() {
 
 function clearRegressionLine() {
     Plotly.restyle('plot', {
-        x: [[]],
-        y: [[]]
-    }, [1]);
+        x: [[], [], []],
+        y: [[], [], []]
+    }, [1, 2, 3]);
+}
+
+function updateBands() {
+    const bands = state.results ? state.results.bands : null;
+    if (!bands) {
+        Plotly.restyle('plot', { x: [[], []], y: [[], []] }, [2, 3]);
+        return;
+    }
+
+    const xBack = bands.x.slice().reverse();
+    Plotly.restyle('plot', {
+        x: [
+            bands.x.concat(xBack),
+            bands.x.concat([null], bands.x)
+        ],
+        y: [
+            bands.ci_upper.concat(bands.ci_lower.slice().reverse()),
+            bands.pi_upper.concat([null], bands.pi_lower)
+        ]
+    }, [2, 3]);
 }
 
 function updateDeviationShapes() {
@@ -272,6 +376,7 @@ function updateDeviationShapes() {
     const meanX = state.results.mean_x;
     const meanY = state.results.mean_y;
     const details = state.results.point_details;
+    const count = details ? details.x.length : 0;
 
     // Linie srednich (x_bar i y_bar)
     shapes.push({
@@ -290,8 +395,8 @@ function updateDeviationShapes() {
     });
 
     // Prostokaty odchylen dla kazdego punktu
-    for (let i = 0; i < details.length; i++) {
-        const pt = details[i];
+    for (let i = 0; i < count; i++) {
+        const pt = pointDetail(details, i);
         if (pt.dx === null || pt.dy === null) continue;
 
         const product = pt.product;
@@ -313,6 +418,20 @@ function updateDeviationShapes() {
     Plotly.relayout('plot', { shapes: shapes });
 }
 
+// point_details przychodzi kolumnowo: {x: [...], dx: [...], ...}
+function pointDetail(details, i) {
+    if (!details || i >= details.x.length) return null;
+    return {
+        x: details.x[i],
+        y: details.y[i],
+        dx: details.dx[i],
+        dy: details.dy[i],
+        product: details.product[i],
+        dx_sq: details.dx_sq[i],
+        dy_sq: details.dy_sq[i]
+    };
+}
+
 function clearDeviationShapes() {
     Plotly.relayout('plot', { shapes: [] });
 }
@@ -324,12 +443,7 @@ function setupPresets() {
             const type = this.dataset.type;
             if (type === 'clear') {
                 state.points = [];
-                state.results = null;
-                clearResults();
-                clearRegressionLine();
-                clearDeviationShapes();
-                updatePlotPoints();
-                updateDataTable();
+                onPointsChanged('reset', { points: [] });
                 return;
             }
             loadDataset(type);
@@ -353,7 +467,7 @@ async function loadDataset(type) {
         const data = await response.json();
         if (data.success && data.points) {
             state.points = data.points;
-            onPointsChanged();
+            onPointsChanged('reset', { points: data.points });
         }
     } catch (error) {
         console.error('Blad ladowania danych:', error.message);
@@ -388,10 +502,15 @@ async function triggerComputation() {
     try {
         loadingEl.classList.add('st-loading--active');
 
-        const response = await fetch('/api/compute', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ points: state.points })
+        // Punkty sa juz na serwerze - pobierz tylko dane per-punkt i pasma
+        // (strona 100 wierszy obejmuje wszystkie punkty przy limicie frontendu)
+        const [bandMin, bandMax] = regressionRange();
+        const query = new URLSearchParams({
+            details: 'first_k', details_k: 100,
+            n_grid: 50, x_min: bandMin, x_max: bandMax
+        });
+        const response = await fetch(`/api/points/details?${query}`, {
+            headers: { 'X-Client-Id': CLIENT_ID }
         });
 
         if (!response.ok) {
@@ -401,10 +520,16 @@ async function triggerComputation() {
 
         const data = await response.json();
 
+        // Nowsze zapytanie jest juz liczone - jego wynik zaktualizuje widok
+        if (data.status === 'superseded') return;
+        // Zbior zmienil sie w trakcie - wynik dla nowej wersji przyjdzie po debounce
+        if (data.success && data.n !== state.points.length) return;
+
         if (data.success) {
             state.results = data;
             updateStats();
             updateRegressionLine();
+            updateBands();
             updateDeviationShapes();
             updateDataTable();
             updateFormula();
@@ -466,6 +591,15 @@ function updateStats() {
     // df
     document.getElementById('stat-df').textContent = res.df;
 
+    // Korelacje rangowe (null gdy nieokreslone, np. same remisy); odpowiedz
+    // operacji na punktach ich nie zawiera - przychodza z /api/points/details
+    if ('spearman' in res) {
+        const rho = res.spearman && res.spearman.rho;
+        const tau = res.kendall && res.kendall.tau;
+        document.getElementById('stat-spearman').textContent = rho == null ? '-' : rho.toFixed(4);
+        document.getElementById('stat-kendall').textContent = tau == null ? '-' : tau.toFixed(4);
+    }
+
     // Interpretacja
     const interpEl = document.getElementById('stat-interpretation');
     const interpBox = document.getElementById('interpretation-box');
@@ -551,6 +685,8 @@ function clearResults() {
     document.getElementById('stat-pvalue').textContent = '-';
     document.getElementById('stat-n').textContent = state.points.length;
     document.getElementById('stat-df').textContent = '-';
+    document.getElementById('stat-spearman').textContent = '-';
+    document.getElementById('stat-kendall').textContent = '-';
     document.getElementById('stat-interpretation').textContent = 'Dodaj co najmniej 3 punkty';
     document.getElementById('stat-regression').textContent = '-';
     document.getElementById('stat-mean-x').textContent = '-';
@@ -579,12 +715,13 @@ function updateDataTable() {
 
     const res = state.results;
     const details = res ? res.point_details : null;
+    const influence = res && res.influence ? res.influence : null;
 
     let html = '';
 
     for (let i = 0; i < state.points.length; i++) {
         const pt = state.points[i];
-        const d = details ? details[i] : null;
+        const d = pointDetail(details, i);
 
         const productClass = d && d.product !== null
             ? (d.product >= 0 ? 'pc-table__product--positive' : 'pc-table__product--negative')
@@ -605,6 +742,18 @@ function updateDataTable() {
             html += '<td>-</td><td>-</td><td>-</td><td>-</td><td>-</td>';
         }
 
+        if (influence && i < influence.columns.loo_r.length) {
+            // Punkt wplywowy: D Cooka powyzej 4/n
+            const loo = influence.columns.loo_r[i];
+            const cook = influence.columns.cooks_d[i];
+            const cookClass = cook !== null && cook > influence.thresholds.cooks_d
+                ? 'pc-table__influential' : '';
+            html += `<td>${loo !== null ? loo.toFixed(4) : '-'}</td>`;
+            html += `<td class="${cookClass}">${cook !== null ? cook.toFixed(4) : '-'}</td>`;
+        } else {
+            html += '<td>-</td><td>-</td>';
+        }
+
         html += '</tr>';
     }
 
@@ -623,6 +772,8 @@ function updateDataTable() {
             `<td class="${sumProductClass}"><strong>${res.sum_products.toFixed(4)}</strong></td>` +
             `<td><strong>${res.sum_dx_sq.toFixed(4)}</strong></td>` +
             `<td><strong>${res.sum_dy_sq.toFixed(4)}</strong></td>` +
+            '<td>-</td>' +
+            '<td>-</td>' +
             '</tr>';
     } else {
         tfoot.innerHTML = '';